@@ -0,0 +1,233 @@
+"""
+Offline end-to-end benchmark.
+
+For each scale factor: generate a synthetic campus (synth_campus.py), build the
+graph (build_graph.py), load it into GraphAgent with the deterministic StubBackend,
+then replay docs/competency_questions.md plus a generated question set and report
+per-stage latency percentiles:
+
+    build, graph_load (ttl / snapshot), schema_summary, template, route, timetable, nearest,
+    sparql_generation, sparql_execution, answer_rendering,
+    visualization (cold build + overview page), visualization_focus (2-hop page),
+    visualization_toggle (facility toggle, patched view)
+
+Usage:
+    python benchmarks/bench_e2e.py --scales 1,10,100 --questions 200 --json results.jsonl
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, HERE)
+
+from build_graph import build_knowledge_graph
+from graph_agent import GraphAgent, NS
+from llm_backend import StubBackend
+from query_cache import QueryCache
+from schema import introspect
+from snapshot import snapshot_path
+from templates import render_answer
+from synth_campus import generate
+
+COMPETENCY_PATH = os.path.join(HERE, "..", "docs", "competency_questions.md")
+
+
+def competency_questions():
+    with open(COMPETENCY_PATH, encoding="utf-8") as f:
+        text = f.read()
+    return re.findall(r'^\d+\.\s.*?"(.+)"\s*$', text, re.M)
+
+
+def generated_questions(agent, n, seed=0):
+    """Mix of template-shaped and free-form (LLM-bound) questions over the graph's labels."""
+    rng = random.Random(seed)
+    matcher = agent.get_templates()
+    buildings = sorted(matcher.building_labels)
+    titles = sorted(set(matcher.course_aliases.values()))
+    shapes = [
+        lambda: f"{rng.choice(buildings)}에 엘리베이터 있어?",
+        lambda: f"{rng.choice(buildings)}에 장애인 화장실 있어?",
+        lambda: f"{rng.randint(9, 17)}시 전에 끝나는 '{rng.choice(titles)}' 수업 있어?",
+        lambda: f"휠체어 타는데 '{rng.choice(titles)}' 어디서 들어야 해?",
+        lambda: f"{rng.choice(buildings)}에서 {rng.choice(buildings)} 어떻게 가?",
+        lambda: f"{rng.choice(buildings)} 주변 시설 알려줘",
+        lambda: f"{rng.choice(buildings)} 근처에 장애인 화장실 있는 건물 어디야?",
+        lambda: f"{rng.choice('월화수목금')}요일 공강 때 휠체어로 갈 수 있는 건물 내의 다른 수업은?",
+        lambda: f"'{rng.choice(titles)}' 담당 교수님 누구야?",
+        lambda: f"'{rng.choice(titles)}'과 '{rng.choice(titles)}' 둘 다 들어야 해. 시간 안 겹치는 조합 추천해줘",
+    ]
+    return [rng.choice(shapes)() for _ in range(n)]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return float("nan")
+    k = (len(values) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+class Timings:
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    @contextlib.contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[stage].append((time.perf_counter() - start) * 1000)
+
+    def summary(self):
+        return {
+            stage: {
+                "n": len(v),
+                "p50_ms": percentile(v, 0.50),
+                "p95_ms": percentile(v, 0.95),
+                "p99_ms": percentile(v, 0.99),
+                "max_ms": max(v),
+            }
+            for stage, v in self.samples.items()
+        }
+
+
+def run_question(agent, question, timings):
+    with timings.span("schema_summary"):
+        agent.get_schema_summary()
+        agent.get_sample_labels()
+
+    with timings.span("template"):
+        match = agent.get_templates().match(question)
+
+    if match is not None and match["intent"] in ("route", "timetable", "nearest_facility"):
+        with timings.span(match["intent"].split("_")[0]):
+            if match["intent"] == "route":
+                df = agent.route_frame(match["slots"]["from"], match["slots"]["to"])
+            elif match["intent"] == "nearest_facility":
+                df = agent.nearest_frame(match["slots"]["building"], [match["slots"]["facility"]])
+            else:
+                df = agent.timetable_frame(match["slots"]["titles"])
+        with timings.span("answer_rendering"):
+            render_answer(match, df)
+        return "template"
+
+    if match is not None:
+        with timings.span("sparql_execution"):
+            # Schedule/accessibility index hits spliced into the template's VALUES slot
+            match = agent._prefilter(match)
+            df = agent.execute_query(match["sparql"], bindings=match["bindings"])
+        with timings.span("answer_rendering"):
+            render_answer(match, df)
+        return "template"
+
+    with timings.span("sparql_generation"):
+        step1 = agent.generate_sparql(question)
+    with timings.span("sparql_execution"):
+        df = agent.execute_query(step1.get("sparql", ""))
+    with timings.span("answer_rendering"):
+        agent.generate_answer(question, step1.get("sparql", ""), df, step1.get("reasoning", ""))
+    return "llm"
+
+
+def bench_scale(scale, args):
+    timings = Timings()
+    viz_nodes = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        info = generate(scale, tmp, seed=args.seed)
+        ttl_path = os.path.join(tmp, "knowledge_graph.ttl")
+        quiet = contextlib.redirect_stdout(io.StringIO())
+
+        with quiet, timings.span("build"):
+            build_knowledge_graph(tmp, ttl_path, force=True)
+
+        # Cold start: no snapshot -> Turtle parse (this also rewrites the snapshot)
+        os.remove(snapshot_path(ttl_path))
+        backend = StubBackend(latency=args.llm_latency)
+        cache_path = os.path.join(tmp, "sparql_cache.sqlite")
+        with contextlib.redirect_stdout(io.StringIO()), timings.span("graph_load_ttl"):
+            GraphAgent(graph_path=ttl_path, sparql_cache_path=cache_path, backend=backend)
+        with contextlib.redirect_stdout(io.StringIO()), timings.span("graph_load_snapshot"):
+            agent = GraphAgent(graph_path=ttl_path, sparql_cache_path=cache_path, backend=backend)
+        agent.metrics.emit_logs = False
+        if args.no_cache:
+            agent.query_cache = QueryCache(max_results=0)
+
+        with timings.span("schema_summary_cold"):
+            introspect(agent.g)
+
+        questions = competency_questions() + generated_questions(agent, args.questions, args.seed)
+        paths = defaultdict(int)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for q in questions:
+                paths[run_question(agent, q, timings)] += 1
+
+            try:
+                from visualization import NetworkView
+                for _ in range(args.viz_repeat):
+                    with timings.span("visualization"):
+                        view = NetworkView(agent.g)
+                        page = view.page()
+                    center = next(n for n, kind in view.kind.items() if kind == "building")
+                    with timings.span("visualization_focus"):
+                        view.page(focus=center, hops=2)
+                viz_nodes = {"total": len(view.nodes), "page": page["nodes"], "hidden": page["hidden"]}
+                # Maintenance toggle: off then on again, re-rendering the patched view each time
+                agent.network_html()
+                bldg, fac = next(agent.g.subject_objects(NS.hasFacility))
+                for i in range(2 * args.viz_repeat):
+                    with timings.span("visualization_toggle"):
+                        agent.set_facility(bldg, fac, i % 2 == 1)
+                        agent.network_html()
+            except ImportError:
+                pass
+
+        triples = len(agent.g)
+    return {"scale": scale, "triples": triples, "questions": len(questions),
+            "paths": dict(paths), "dataset": info, "stages": timings.summary(), "viz_nodes": viz_nodes}
+
+
+def print_report(result):
+    print(f"\n=== scale x{result['scale']}: {result['triples']} triples, "
+          f"{result['questions']} questions {result['paths']} ===")
+    print(f"{'stage':<22}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for stage, s in result["stages"].items():
+        print(f"{stage:<22}{s['n']:>6}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['max_ms']:>10.2f}")
+    viz = result.get("viz_nodes")
+    if viz:
+        print(f"visualization payload: {viz['page']} of {viz['total']} nodes ({viz['hidden']} over the page limit)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", default="1,10", help="Comma-separated scale factors (e.g. 1,10,100,1000)")
+    parser.add_argument("--questions", type=int, default=100, help="Generated questions per scale")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated stub LLM latency (s)")
+    parser.add_argument("--viz-repeat", type=int, default=3)
+    parser.add_argument("--no-cache", action="store_true", help="Disable the query result cache")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Append results as JSON lines (track scaling over time)")
+    args = parser.parse_args()
+
+    for scale in [int(s) for s in args.scales.split(",")]:
+        result = bench_scale(scale, args)
+        result["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        print_report(result)
+        if args.json:
+            with open(args.json, "a", encoding="utf-8") as f:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Startup benchmark: cold TTL parse vs. snapshot load.
+
+The real knowledge graph is small, so it is enlarged synthetically by
+replicating every resource N times (URIs get a _<i> suffix).
+
+Usage:
+    python benchmarks/bench_startup.py --scale 100
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from rdflib import Graph, URIRef
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from overlay import overlay_graph
+from snapshot import load_snapshot, write_snapshot
+
+GRAPH_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "knowledge_graph.ttl")
+
+
+def enlarge(g, scale):
+    big = Graph()
+    for prefix, ns in g.namespaces():
+        big.bind(prefix, ns)
+    for i in range(scale):
+        for s, p, o in g:
+            s2 = URIRef(f"{s}_{i}") if isinstance(s, URIRef) else s
+            o2 = URIRef(f"{o}_{i}") if isinstance(o, URIRef) else o
+            big.add((s2, p, o2))
+    return big
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    base = Graph()
+    base.parse(GRAPH_PATH, format="turtle")
+    big = enlarge(base, args.scale)
+    print(f"Synthetic graph: {len(big)} triples (scale x{args.scale})")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ttl_path = os.path.join(tmp, "knowledge_graph.ttl")
+        big.serialize(destination=ttl_path, format="turtle")
+        _, t_write = timed(lambda: write_snapshot(big, ttl_path))
+        print(f"Snapshot write: {t_write:.3f}s")
+
+        def old_startup():
+            # Previous GraphAgent.load_graph: two full Turtle parses (g + base_g)
+            g = Graph()
+            g.parse(ttl_path, format="turtle")
+            base_g = Graph()
+            base_g.parse(ttl_path, format="turtle")
+            return g
+
+        def ttl_parse():
+            g = Graph()
+            g.parse(ttl_path, format="turtle")
+            return g
+
+        def snapshot_startup():
+            # Current GraphAgent.load_graph: one snapshot load, maintenance delta overlaid on it
+            base, _ = load_snapshot(ttl_path)
+            g, _ = overlay_graph(base)
+            return g
+
+        for name, fn in [("ttl x2 (old)", old_startup), ("ttl x1", ttl_parse), ("snapshot", snapshot_startup)]:
+            times = []
+            for _ in range(args.repeat):
+                g, t = timed(fn)
+                assert len(g) == len(big)
+                times.append(t)
+            print(f"{name:>14}: best {min(times):.3f}s  mean {sum(times) / len(times):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Synthetic campus generator.
+
+Writes Nodes / Edges / 교과목 CSVs in the same layout as data/csv, scaled by a
+factor of the current data set (5 buildings, ~19 rooms, ~62 course sections),
+so build_graph.py and query scaling can be measured at 10x/100x/1000x.
+
+Usage:
+    python benchmarks/synth_campus.py --scale 100 --out /tmp/campus_x100
+    python src/build_graph.py --data-dir /tmp/campus_x100 --output /tmp/campus_x100/knowledge_graph.ttl
+"""
+import argparse
+import csv
+import math
+import os
+import random
+
+NODES_FILE = "안성재팀 - 온톨로지 - Nodes.csv"
+EDGES_FILE = "안성재팀 - 온톨로지 - Edges.csv"
+COURSES_FILE = "안성재팀 - 온톨로지 - 교과목.csv"
+
+# Per 1x: the size of the real data set
+BUILDINGS_PER_SCALE = 5
+ROOMS_PER_BUILDING = 4
+SECTIONS_PER_SCALE = 62
+TITLES_PER_SCALE = 4
+ROUTES_PER_BUILDING = 2  # nearest neighbours each building is connected to
+
+CAMPUS_CENTER = (37.4590, 126.9500)
+BASE_TITLES = ["수학1", "수학연습1", "대학글쓰기1", "베리타스 실천: 평등의 물리학"]
+FACILITIES = [("F_001", "WC", "장애인화장실"), ("F_002", "lift", "엘리베이터"),
+              ("F_003", "Ramp", "경사로"), ("F_004", "AutoDoor", "자동문 유무")]
+HAZARDS = [("H_001", "Curb", "턱"), ("H_002", "Crosswalk", "횡단보도"),
+           ("H_003", "Bollard", "볼라드"), ("H_004", "Steep", "급경사")]
+CLASSES = [("C001", "Building"), ("C003", "Room"), ("C004", "Route"), ("C005", "Course"),
+           ("C006", "Facility"), ("C007", "Hazard"), ("C008", "TimePoint")]
+DAY_SETS = ["월,수", "화,목", "금", "월", "수", "목"]
+SLOTS = [("9:00", "9:50"), ("10:00", "10:50"), ("11:00", "11:50"), ("12:00", "12:50"),
+         ("13:00", "13:50"), ("14:00", "14:50"), ("15:00", "16:50"), ("19:00", "20:50")]
+
+
+def haversine_m(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371000 * math.asin(math.sqrt(h))
+
+
+def generate(scale, out_dir, seed=42):
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    nodes, edges, courses = [], [], []
+
+    for cid, label in CLASSES:
+        nodes.append(["Class", cid, label, label])
+    for fid, label, desc in FACILITIES:
+        nodes.append(["Instance", fid, label, desc])
+        edges.append([fid, "C006", "instanceOf"])
+    for hid, label, desc in HAZARDS:
+        nodes.append(["Instance", hid, label, desc])
+        edges.append([hid, "C007", "instanceOf"])
+
+    # Buildings spread over ~1.5 km around the campus center
+    n_bldg = BUILDINGS_PER_SCALE * scale
+    spread = 0.007 * math.sqrt(scale)
+    buildings = []
+    for i in range(n_bldg):
+        bid = f"N{i + 1:05d}"
+        label = f"{i + 1}동"
+        coord = (CAMPUS_CENTER[0] + rng.uniform(-spread, spread), CAMPUS_CENTER[1] + rng.uniform(-spread, spread))
+        buildings.append((bid, label, coord))
+        nodes.append(["Instance", bid, label, f"관악캠퍼스 {label}"])
+        edges.append([bid, "C001", "instanceOf"])
+        edges.append([bid, f'"{coord[0]:.7f}"^^xsd:float', "getLat"])
+        edges.append([bid, f'"{coord[1]:.7f}"^^xsd:float', "getLong"])
+        for fid, _, _ in FACILITIES:
+            if rng.random() < 0.75:
+                edges.append([bid, fid, "hasFacility"])
+
+    # Rooms
+    rooms = []
+    for bid, blabel, _ in buildings:
+        for r in range(ROOMS_PER_BUILDING):
+            room_no = f"{rng.randint(1, 5)}{r:02d}"
+            rid = f"{blabel[:-1]}_{room_no}"
+            rlabel = f"{blabel} {room_no}호"
+            rooms.append((rid, rlabel, blabel, room_no))
+            nodes.append(["Instance", rid, rlabel, rlabel])
+            edges.append([rid, "C003", "instanceOf"])
+            edges.append([rid, bid, "isLocatedIn"])
+
+    # Routes: connect each building to its nearest neighbours
+    route_pairs = set()
+    for i, (_, _, coord) in enumerate(buildings):
+        order = sorted(range(n_bldg), key=lambda j: haversine_m(coord, buildings[j][2]))
+        for j in order[1:ROUTES_PER_BUILDING + 1]:
+            route_pairs.add((min(i, j), max(i, j)))
+    for k, (i, j) in enumerate(sorted(route_pairs)):
+        a, b = buildings[i], buildings[j]
+        rid = f"R_{k + 1:05d}"
+        dist = haversine_m(a[2], b[2]) * rng.uniform(1.1, 1.5)
+        nodes.append(["Instance", rid, f"{a[1]}과 {b[1]} 사이 경로", f"{a[0]}-{b[0]}"])
+        edges.append([rid, "C004", "instanceOf"])
+        edges.append([rid, f'"{dist:.2f}"^^xsd:float', "distance"])
+        edges.append([a[0], rid, "isEndpointOf"])
+        edges.append([b[0], rid, "isEndpointOf"])
+        for hid, _, _ in HAZARDS:
+            if rng.random() < 0.15:
+                edges.append([rid, hid, "hasHazard"])
+
+    # Course sections
+    titles = BASE_TITLES + [f"과목{t + 1}" for t in range(TITLES_PER_SCALE * scale - len(BASE_TITLES))]
+    n_sections = SECTIONS_PER_SCALE * scale
+    for s in range(n_sections):
+        cid = str(100000 + s)
+        title = titles[s % len(titles)]
+        rid, rlabel, blabel, room_no = rooms[rng.randrange(len(rooms))]
+        start, end = SLOTS[rng.randrange(len(SLOTS))]
+        days = DAY_SETS[rng.randrange(len(DAY_SETS))]
+        nodes.append(["Instance", cid, title, "과목명"])
+        edges.append([cid, "C005", "instanceOf"])
+        edges.append([cid, rid, "isHeldAt"])
+        for day in days.split(","):
+            edges.append([cid, f'"{day}"^^xsd:str', "dayOfWeek"])
+        courses.append([cid, title, blabel, f"{room_no}호", start, end, days, "o", f"교수{s % 97}", ""])
+
+    with open(os.path.join(out_dir, NODES_FILE), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["sort", "id", "label", "description"])
+        writer.writerows(nodes)
+    with open(os.path.join(out_dir, EDGES_FILE), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["sourceID", "targetID", "relation"])
+        writer.writerows(edges)
+    with open(os.path.join(out_dir, COURSES_FILE), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ID", "과목명", "강의동", "강의실", "수업 시작 시간", "수업 종료 시간",
+                         "수업 요일", "지원 사항", "대표교수", "비고"])
+        writer.writerows(courses)
+
+    return {"buildings": n_bldg, "rooms": len(rooms), "routes": len(route_pairs),
+            "sections": n_sections, "titles": len(titles)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=10)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    print(generate(args.scale, args.out, args.seed))
@@ -0,0 +1,124 @@
+"""
+Wheelchair accessibility of every course section as NumPy arrays.
+
+Each building gets a facility bitmask and a hazard bitmask (one bit per F_00x / H_00x),
+and a score derived from them with table lookups:
+
+    accessible  Lift or Ramp, and no Curb / Steep hazard (same rule as RouteGraph.building_ok)
+    score       0 if not accessible, else the facility weights (Lift .4, Ramp .3, WC .2,
+                AutoDoor .1) minus HAZARD_PENALTY per minor hazard (Crosswalk, Bollard)
+
+Sections are aligned to one array (section_building = index of the building they are
+held in), so "which sections can a wheelchair user attend" is
+`section_score[positions] > 0` and ranking is one argsort. A facility toggle
+rescores one building and patches the sections held there.
+"""
+import copy
+
+import numpy as np
+from rdflib import Namespace
+
+from routing import ACCESS_FACILITIES, BLOCKING_HAZARDS, local_name
+
+BASE_URI = "http://snu.ac.kr/barrier-free/"
+NS = Namespace(BASE_URI)
+
+FACILITY_BITS = {"F_001": 1, "F_002": 2, "F_003": 4, "F_004": 8}  # WC, Lift, Ramp, AutoDoor
+HAZARD_BITS = {"H_001": 1, "H_002": 2, "H_003": 4, "H_004": 8}    # Curb, Crosswalk, Bollard, Steep
+FACILITY_WEIGHTS = {"F_001": 0.2, "F_002": 0.4, "F_003": 0.3, "F_004": 0.1}
+HAZARD_PENALTY = 0.05
+
+ACCESS_MASK = sum(FACILITY_BITS[local_name(f)] for f in ACCESS_FACILITIES)
+BLOCK_MASK = sum(HAZARD_BITS[local_name(h)] for h in BLOCKING_HAZARDS)
+
+# bitmask -> summed facility weight / minor hazard penalty
+_FACILITY_TABLE = np.array([sum(w for f, w in FACILITY_WEIGHTS.items() if mask & FACILITY_BITS[f])
+                            for mask in range(16)])
+_PENALTY_TABLE = np.array([HAZARD_PENALTY * bin(mask & ~BLOCK_MASK).count("1") for mask in range(16)])
+
+
+def building_scores(facilities, hazards):
+    """Vectorized: facility/hazard bitmask arrays -> (score, accessible) arrays."""
+    accessible = ((facilities & ACCESS_MASK) != 0) & ((hazards & BLOCK_MASK) == 0)
+    score = np.clip(_FACILITY_TABLE[facilities] - _PENALTY_TABLE[hazards], 0.01, 1.0)
+    return np.where(accessible, score, 0.0), accessible
+
+
+class AccessibilityIndex:
+    """
+    sections_by_title: {title: [Section]} (see timetable.load_sections).
+        buildings / facilities / hazards / building_score   one entry per building
+        uris / section_building / section_score             one entry per section
+    """
+
+    def __init__(self, g, sections_by_title):
+        sections = sorted((s for group in sections_by_title.values() for s in group), key=lambda s: str(s.uri))
+        buildings = set(g.subjects(NS.instanceOf, NS.C001))
+        buildings.update(s.building for s in sections if s.building is not None)
+        self.buildings = sorted(buildings, key=str)
+        self.bindex = {b: i for i, b in enumerate(self.buildings)}
+        self.facilities = np.zeros(len(self.buildings), dtype=np.uint8)
+        self.hazards = np.zeros(len(self.buildings), dtype=np.uint8)
+        for predicate, bits, array in ((NS.hasFacility, FACILITY_BITS, self.facilities),
+                                       (NS.hasHazard, HAZARD_BITS, self.hazards)):
+            for s, o in g.subject_objects(predicate):
+                i = self.bindex.get(s)
+                if i is not None:
+                    array[i] |= bits.get(local_name(o), 0)
+        self.building_score, self.building_ok = building_scores(self.facilities, self.hazards)
+
+        self.uris = [s.uri for s in sections]
+        self.position = {uri: i for i, uri in enumerate(self.uris)}
+        self.positions_by_title = {}
+        for i, s in enumerate(sections):
+            self.positions_by_title.setdefault(s.title, []).append(i)
+        self.section_building = np.array([self.bindex.get(s.building, -1) for s in sections], dtype=np.int32)
+        self.section_score = self._section_scores()
+
+    def _section_scores(self):
+        held = self.section_building >= 0
+        return np.where(held, self.building_score[np.where(held, self.section_building, 0)], 0.0)
+
+    # --- incremental updates (GraphAgent._on_mutation) ---
+
+    def copy(self):
+        """Shares the section layout; copies the arrays update() writes."""
+        new = copy.copy(self)
+        for name in ("facilities", "hazards", "building_score", "building_ok", "section_score"):
+            setattr(new, name, getattr(self, name).copy())
+        return new
+
+    def update(self, bldg, predicate, value, present):
+        """(bldg :hasFacility/:hasHazard value) was added (present=True) or removed."""
+        i = self.bindex.get(bldg)
+        if predicate == NS.hasFacility:
+            bit, array = FACILITY_BITS.get(local_name(value), 0), self.facilities
+        else:
+            bit, array = HAZARD_BITS.get(local_name(value), 0), self.hazards
+        if i is None or not bit:
+            return
+        array[i] = array[i] | bit if present else array[i] & ~np.uint8(bit)
+        score, ok = building_scores(self.facilities[i:i + 1], self.hazards[i:i + 1])
+        self.building_score[i], self.building_ok[i] = score[0], ok[0]
+        self.section_score[self.section_building == i] = score[0]
+
+    # --- lookups ---
+
+    def positions(self, uris=None, title=None):
+        if title is not None:
+            return np.array(self.positions_by_title.get(title, []), dtype=np.int64)
+        if uris is None:
+            return np.arange(len(self.uris))
+        return np.array([self.position[u] for u in uris if u in self.position], dtype=np.int64)
+
+    def scores(self, uris):
+        """{section uri: score} for the given sections."""
+        pos = self.positions(uris)
+        return dict(zip((self.uris[i] for i in pos), self.section_score[pos].tolist()))
+
+    def accessible(self, uris=None, title=None):
+        """Section URIs held in wheelchair-accessible buildings, best score first."""
+        pos = self.positions(uris, title)
+        pos = pos[self.section_score[pos] > 0]
+        order = np.argsort(-self.section_score[pos], kind="stable")
+        return [self.uris[i] for i in pos[order]]
@@ -2,12 +2,16 @@ import streamlit as st
 import pandas as pd
 from rdflib import URIRef, Literal, Namespace
 from graph_agent import GraphAgent
-from pyvis.network import Network
+from query_cache import run_sparql
 import streamlit.components.v1 as components
-import tempfile
+import logging
 import os
 import re
 
+# Warnings on stderr, plus one JSON line per query from graph_agent.metrics
+logging.basicConfig(level=logging.WARNING, format="%(message)s")
+logging.getLogger("graph_agent.metrics").setLevel(logging.INFO)
+
 # Page Config
 st.set_page_config(
     page_title="SNU Barrier-Free Course Helper",
@@ -36,12 +40,10 @@ NS = Namespace("http://snu.ac.kr/barrier-free/")
 # Initialize Session State
 if "messages" not in st.session_state:
     st.session_state.messages = []
-if "reports" not in st.session_state:
-    st.session_state.reports = [] 
 
 # --- Navigation ---
 st.sidebar.title("메뉴")
-page = st.sidebar.radio("이동", ["🔍 수강신청 도우미 (Chat)", "🛠️ 시설 관리 (Maintenance)", "📊 지식 그래프 시각화 (Visualization)"])
+page = st.sidebar.radio("이동", ["🔍 수강신청 도우미 (Chat)", "🛠️ 시설 관리 (Maintenance)", "📊 지식 그래프 시각화 (Visualization)", "📈 성능 대시보드 (Performance)"])
 
 # --- Page 1: Chat ---
 if page == "🔍 수강신청 도우미 (Chat)":
@@ -72,49 +74,62 @@ if page == "🔍 수강신청 도우미 (Chat)":
 
         # Generate response
         with st.chat_message("assistant"):
-            with st.spinner("지식 그래프 검색 중..."):
-                try:
-                    result = agent.process_query(prompt)
-                    response_text = result["answer"]
-                    
-                    st.markdown(response_text)
-                    
-                    # Show details
-                    with st.expander("🔍 근거 데이터 & SPARQL 확인"):
-                        st.markdown(f"**Reasoning:**\n{result['reasoning']}")
-                        st.code(result['sparql'], language='sparql')
-                        st.dataframe(result['data'])
-                    
-                    # Dynamic Image Display
-                    found_routes = []
-                    if result.get("data") is not None and not result["data"].empty:
-                        for col in result["data"].columns:
-                            for val in result["data"][col]:
-                                val_str = str(val)
-                                match = re.search(r'(R_\d+)', val_str)
-                                if match:
-                                    found_routes.append(match.group(1))
-                    
-                    found_routes = list(set(found_routes))
-                    if found_routes:
-                        img_dir = os.path.join(os.path.dirname(__file__), "..", "assets", "images")
-                        for route_id in found_routes:
-                            for ext in [".png", ".jpg", ".jpeg"]:
-                                img_path = os.path.join(img_dir, route_id + ext)
-                                if os.path.exists(img_path):
-                                    st.image(img_path, caption=f"🗺️ 경로 지도: {route_id}")
-                                    break
-                    
-                    # Save to history
-                    st.session_state.messages.append({
-                        "role": "assistant", 
-                        "content": response_text,
-                        "data": result["data"],
-                        "sparql": result["sparql"],
-                        "reasoning": result["reasoning"]
-                    })
-                except Exception as e:
-                    st.error(f"Error processing query: {e}")
+            status = st.empty()
+            status.caption("🔎 질문 분석 중...")
+            result = {}
+            
+            # Render pipeline events as they arrive; answer chunks stream into the message
+            def answer_stream():
+                for event in agent.process_query_stream(prompt):
+                    if event["type"] == "sparql":
+                        status.caption("📚 지식 그래프 검색 중...")
+                    elif event["type"] == "data":
+                        status.caption(f"✍️ 답변 작성 중... (검색 결과 {len(event['data'])}건)")
+                    elif event["type"] == "answer":
+                        yield event["text"]
+                    elif event["type"] == "done":
+                        result.update(event["result"])
+            
+            try:
+                response_text = st.write_stream(answer_stream())
+                status.empty()
+                
+                # Show details
+                with st.expander("🔍 근거 데이터 & SPARQL 확인"):
+                    st.markdown(f"**Reasoning:**\n{result['reasoning']}")
+                    st.code(result['sparql'], language='sparql')
+                    st.dataframe(result['data'])
+                
+                # Dynamic Image Display
+                found_routes = []
+                if result.get("data") is not None and not result["data"].empty:
+                    for col in result["data"].columns:
+                        for val in result["data"][col]:
+                            val_str = str(val)
+                            match = re.search(r'(R_\d+)', val_str)
+                            if match:
+                                found_routes.append(match.group(1))
+                
+                found_routes = list(set(found_routes))
+                if found_routes:
+                    img_dir = os.path.join(os.path.dirname(__file__), "..", "assets", "images")
+                    for route_id in found_routes:
+                        for ext in [".png", ".jpg", ".jpeg"]:
+                            img_path = os.path.join(img_dir, route_id + ext)
+                            if os.path.exists(img_path):
+                                st.image(img_path, caption=f"🗺️ 경로 지도: {route_id}")
+                                break
+                
+                # Save to history
+                st.session_state.messages.append({
+                    "role": "assistant", 
+                    "content": response_text,
+                    "data": result["data"],
+                    "sparql": result["sparql"],
+                    "reasoning": result["reasoning"]
+                })
+            except Exception as e:
+                st.error(f"Error processing query: {e}")
 
 # --- Page 2: Maintenance ---
 elif page == "🛠️ 시설 관리 (Maintenance)":
@@ -127,13 +142,14 @@ elif page == "🛠️ 시설 관리 (Maintenance)":
         report_text = st.text_input("신고 내용", placeholder="예: 25동 엘리베이터가 고장났어요.")
         submitted = st.form_submit_button("신고하기")
         if submitted and report_text:
-            st.session_state.reports.append(report_text)
+            # Journaled on the shared agent: visible to every session, survives restarts
+            agent.report(report_text)
             st.success("신고가 접수되었습니다.")
     
-    if st.session_state.reports:
+    if agent.reports:
         st.write("### 최근 신고 목록")
-        for idx, report in enumerate(reversed(st.session_state.reports[-5:])):
-            st.info(f"{idx+1}. {report}")
+        for idx, report in enumerate(reversed(agent.reports[-5:])):
+            st.info(f"{idx+1}. {report['text']}")
 
     st.divider()
 
@@ -150,7 +166,7 @@ elif page == "🛠️ 시설 관리 (Maintenance)":
     }}
     ORDER BY ?label
     """
-    res_bldgs = agent.g.query(q_bldgs)
+    res_bldgs = run_sparql(agent.g, q_bldgs)
     
     # Create mapping: "Name (ID)" -> URI
     bldg_map = {}
@@ -194,12 +210,8 @@ elif page == "🛠️ 시설 관리 (Maintenance)":
         # Helper to toggle
         def toggle_facility(bldg_uri, fac_id, is_active):
             fac_uri = URIRef(NS + fac_id)
-            if is_active:
-                # Add triple: bldg :hasFacility fac
-                agent.g.add((bldg_uri, NS.hasFacility, fac_uri))
-            else:
-                # Remove triple
-                agent.g.remove((bldg_uri, NS.hasFacility, fac_uri))
+            # Add/remove triple: bldg :hasFacility fac (bumps the agent's graph version)
+            agent.set_facility(bldg_uri, fac_uri, is_active)
         
         for label, fac_id in standard_facilities.items():
             fac_uri = URIRef(NS + fac_id)
@@ -226,174 +238,107 @@ elif page == "🛠️ 시설 관리 (Maintenance)":
 
         st.caption("※ 시설을 끄면(OFF) 지식 그래프에서 연결이 끊어지며, AI가 해당 시설이 없다고 판단합니다.")
 
+        # Maintenance changes are a delta over the loaded graph; resetting drops it
+        changes = agent.changes()
+        n_changes = len(changes["added"]) + len(changes["removed"])
+        if st.button(f"모든 변경 초기화 ({n_changes}건)", disabled=n_changes == 0):
+            agent.reset_changes()
+            st.rerun()
+
 # --- Page 3: Visualization ---
 elif page == "📊 지식 그래프 시각화 (Visualization)":
     st.title("📊 온톨로지 지식 그래프 시각화")
     st.markdown("현재 메모리에 로드된 **지식 그래프(Ontology)**의 상태를 실시간으로 시각화합니다.")
     
-    # Initialize Network
-    net = Network(height="600px", width="100%", bgcolor="#ffffff", font_color="black", notebook=False)
-    # net.force_atlas_2based()
-    
-    # --- Build Graph from RDF ---
-    # 1. Buildings (Red)
-    # Query: ?b :instanceOf :C001
-    # Helper to get Detailed Title (Hover)
-    def get_hover_info(g, uri):
-        try:
-            # Query all properties
-            q_props = f"""
-            SELECT ?p ?o WHERE {{ <{uri}> ?p ?o }}
-            """
-            rows = g.query(q_props)
-            info = []
-            
-            def clean_uri(s):
-                if not isinstance(s, str): return str(s)
-                if "#" in s: return s.split("#")[-1]
-                if "/" in s: return s.split("/")[-1]
-                return s
-
-            for r in rows:
-                p_str = str(r.p)
-                o_str = str(r.o)
-                
-                p_base = clean_uri(p_str)
-                
-                # 1. Hide instanceOf / type
-                if "instanceof" in p_base.lower() or "type" in p_base.lower():
-                    continue
-
-                # 2. Special handling for Lat/Long (which seem to be URIs with encoded values)
-                if "Lat" in p_base or "Long" in p_base:
-                     label = "위도" if "Lat" in p_base else "경도"
-                     
-                     if "http" in o_str:
-                         parts = o_str.split("/")[-1] 
-                         # Remove URI encoding chars roughly
-                         val = parts.replace("%22", "").replace("%5E", "")
-                         # Remove xsd suffix
-                         val = val.split("xsd")[0]
-                         info.append(f"{label}: {val}")
-                         continue
-                     else:
-                         info.append(f"{label}: {o_str}")
-                         continue
-
-                # 3. Filter other Relations
-                if o_str.startswith("http"):
-                    continue # Skip other relations
-                
-                # Literal values
-                o_display = o_str
-                
-                # Wrap long text
-                if len(o_display) > 50:
-                    o_display = o_display[:50] + "..."
-                
-                info.append(f"{p_base}: {o_display}")
-            
-            return "\n".join(info)
-        except Exception as e:
-            return str(uri)
-
-    # --- Build Graph from RDF ---
-    # 1. Buildings (Red)
-    # Query: ?b :instanceOf :C001
-    q_bldgs = f"""
-    PREFIX : <{NS}>
-    SELECT ?b ?label WHERE {{ 
-        ?b :instanceOf :C001 . 
-        OPTIONAL {{ ?b rdfs:label ?label }}
-    }}
-    """
-    for row in agent.g.query(q_bldgs):
-        b_uri = str(row.b)
-        # Use Label if available, else ID
-        if row.label:
-            b_name = str(row.label)
+    # Only a bounded page of the graph is sent to the browser: the campus overview
+    # (rooms/courses folded into their building/room) or the neighbourhood of one node
+    view = agent.get_network_view()
+    mode = st.radio("보기 방식", ["캠퍼스 개요", "중심 보기"], horizontal=True)
+    # Nodes are picked by name (label index), not from option lists that grow with the graph
+    if mode == "캠퍼스 개요":
+        names = st.text_input("펼칠 건물/강의실 이름 (쉼표로 구분, +N: 접힌 강의실·수업 수)", placeholder="25동, 43-1동")
+        expanded, missing = [], []
+        for name in (n.strip() for n in names.split(",")):
+            if not name:
+                continue
+            found = view.matching(agent.resolve_label(name), expandable=True)
+            expanded += [n for n, _ in found]
+            if not found:
+                missing.append(name)
+        if missing:
+            st.warning(f"펼칠 수 있는 건물/강의실을 찾지 못했습니다: {', '.join(missing)}")
+        page_args = {"expanded": expanded}
+    else:
+        name = st.text_input("중심 노드 이름 (건물/강의실/수업)", value="25동")
+        candidates = dict(view.matching(agent.resolve_label(name), kinds=("building", "room", "course")))
+        if not candidates:
+            st.warning(f"'{name}'에 해당하는 건물/강의실/수업이 없습니다.")
+        if len(candidates) > 1:
+            focus = st.selectbox("중심 노드", options=list(candidates), format_func=lambda n: candidates[n])
         else:
-            b_name = b_uri.split('/')[-1]
-        
-        hover_text = get_hover_info(agent.g, b_uri)
-        net.add_node(b_uri, label=b_name, title=hover_text, color="#FF6B6B", shape="dot", size=25) 
-
-    # 2. Rooms (Blue)
-    q_rooms = f"""
-    PREFIX : <{NS}>
-    SELECT ?r ?b ?label WHERE {{ 
-        ?r :instanceOf :C003 .
-        ?r :isLocatedIn ?b .
-        OPTIONAL {{ ?r rdfs:label ?label }}
-    }}
-    """
-    for row in agent.g.query(q_rooms):
-        r_uri = str(row.r)
-        b_uri = str(row.b)
-        
-        if row.label:
-            r_name = str(row.label)
-        else:
-            r_name = r_uri.split('/')[-1]
-            
-        hover_text = get_hover_info(agent.g, r_uri)
-        
-        # Add Room node
-        net.add_node(r_uri, label=r_name, title=hover_text, color="#4ECDC4", shape="dot", size=15)
-        # Add Edge
-        net.add_edge(r_uri, b_uri, title="isLocatedIn")
-
-    # 3. Facilities (Yellow)
-    q_facs = f"""
-    PREFIX : <{NS}>
-    SELECT ?b ?f ?label
-    WHERE {{
-        ?b :hasFacility ?f .
-        ?f rdfs:label ?label .
-    }}
-    """
-    for row in agent.g.query(q_facs):
-        b_uri = str(row.b)
-        f_uri = str(row.f)
-        f_name = str(row.label) if row.label else f_uri.split('/')[-1]
-        
-        hover_text = get_hover_info(agent.g, f_uri)
-        
-        net.add_node(f_uri, label=f_name, title=hover_text, color="#FFE66D", shape="diamond", size=20) 
-        net.add_edge(b_uri, f_uri, title="hasFacility", color="#FFE66D")
-
-    # 4. Routes (Gray)
-    q_routes = f"""
-    PREFIX : <{NS}>
-    SELECT ?b ?r ?label
-    WHERE {{
-        ?b :isEndpointOf ?r .
-        ?r :instanceOf :C004 .
-        OPTIONAL {{ ?r rdfs:label ?label }}
-    }}
-    """
-    for row in agent.g.query(q_routes):
-        b_uri = str(row.b)
-        r_uri = str(row.r)
-        r_name = str(row.label) if row.label else r_uri.split('/')[-1]
-        
-        hover_text = get_hover_info(agent.g, r_uri)
-        
-        net.add_node(r_uri, label=r_name, title=hover_text, color="#95A5A6", shape="triangle", size=15)
-        net.add_edge(b_uri, r_uri, title="isEndpointOf")
+            focus = next(iter(candidates), None)  # None: the overview is shown
+        hops = st.slider("이웃 단계 (k-hop)", 1, 4, 2)
+        page_args = {"focus": focus, "hops": hops}
 
     # --- Render ---
     try:
-        # Save to temporary file
-        # pyvis generates html
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".html") as tmp:
-            net.save_graph(tmp.name)
-            tmp.seek(0)
-            html_content = tmp.read().decode("utf-8")
+        # Rendered once per graph version and view (facility toggles only patch the changed edges)
+        net_page = agent.network_page(**page_args)
         
-        st.caption("🔴 건물 | 🔵 강의실 | 🟡 편의시설 | ⚪ 경로")
-        components.html(html_content, height=620)
+        st.caption("🔴 건물 | 🔵 강의실 | 🟡 편의시설 | ⚪ 경로 | 🟣 수업")
+        st.caption(f"노드 {net_page['nodes']}개 · 엣지 {net_page['edges']}개"
+                   + (f" (표시 한도로 {net_page['hidden']}개 생략)" if net_page["hidden"] else ""))
+        components.html(net_page["html"], height=620)
         st.info("💡 마우스 휠로 확대/축소하거나 노드를 드래그하여 구조를 살펴볼 수 있습니다.")
         
     except Exception as e:
         st.error(f"Visualization Error: {e}")
+
+# --- Page 4: Performance ---
+elif page == "📈 성능 대시보드 (Performance)":
+    st.title("📈 성능 대시보드")
+    st.markdown("질의 처리 단계별 소요 시간(최근 질의 기준 p50/p95)과 캐시 적중률을 보여줍니다.")
+
+    stats = pd.DataFrame(agent.metrics.stage_stats())
+    counters = agent.metrics.counters()
+    if stats.empty:
+        st.info("아직 처리된 질의가 없습니다. 도우미 페이지에서 질문을 입력해 보세요.")
+    else:
+        cols = st.columns(4)
+        cols[0].metric("처리한 질의", counters.get("queries", 0))
+        cols[1].metric("LLM 호출", counters.get("llm_calls", 0))
+        cols[2].metric("오류", counters.get("errors", 0) + counters.get("query_errors", 0))
+        total = stats[stats["stage"] == "total"]
+        cols[3].metric("p95 전체 (ms)", f"{total['p95_ms'].iloc[0]:.0f}" if not total.empty else "-")
+
+        st.subheader("단계별 소요 시간 (ms)")
+        stats = stats.set_index("stage").round(2)
+        st.bar_chart(stats[["p50_ms", "p95_ms"]])
+        st.dataframe(stats)
+
+    st.subheader("캐시")
+    cache = agent.cache_stats()
+    st.json({"counters": counters, **cache})
+
+    def records_frame(records):
+        rows = []
+        for r in records:
+            row = {"question": r["question"], "kind": r["kind"], "total_ms": round(r["total_ms"], 1)}
+            row.update({f"{stage}_ms": round(ms, 1) for stage, ms in r["stages"].items()})
+            for field in ("rows", "template", "sparql_cache_hit", "result_cache_hit",
+                          "sparql_context", "sparql_prompt_tokens", "sparql_prompt_full_tokens",
+                          "sparql_valid", "sparql_fixes", "repair_prompt_tokens",
+                          "answer_prompt_tokens", "answer_rows_truncated", "error"):
+                if field in r:
+                    row[field] = ", ".join(r[field]) if isinstance(r[field], list) else r[field]
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    st.subheader("🐢 가장 느린 질의")
+    st.dataframe(records_frame(agent.metrics.slowest(10)))
+    st.subheader("🕒 최근 질의")
+    st.dataframe(records_frame(agent.metrics.recent(20)))
+
+    if st.button("통계 초기화"):
+        agent.metrics.reset()
+        st.rerun()
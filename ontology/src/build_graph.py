@@ -1,12 +1,42 @@
 import pandas as pd
 from rdflib import Graph, Literal, RDF, RDFS, URIRef, Namespace, XSD
+import argparse
+import hashlib
+import json
 import os
+import re
+import shutil
 import urllib.parse
+from snapshot import is_current, write_snapshot
+from schema import introspect
+from routing import RouteGraph, TravelMatrix
+from schedule import WEEKDAYS
 
 # Define Namespace
 BASE_URI = "http://snu.ac.kr/barrier-free/"
 NS = Namespace(BASE_URI)
 
+# Bump when the triple generation below changes, so cached partitions are rebuilt
+BUILDER_VERSION = "4"
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+
+# Partition name -> source CSV (one N-Triples partition per CSV)
+PARTITION_FILES = {
+    "nodes": "안성재팀 - 온톨로지 - Nodes.csv",
+    "edges": "안성재팀 - 온톨로지 - Edges.csv",
+    "courses": "안성재팀 - 온톨로지 - 교과목.csv",
+}
+
+# Map Korean column names of 교과목.csv to clean predicates
+COURSE_COL_MAP = {
+    "수업 시작 시간": "StartTime",
+    "수업 종료 시간": "EndTime",
+    "과목명": "title",
+    "강의동": "isHeldAt_BuildingLabel", # Temporary, usually mapped to node
+    "강의실": "isHeldAt_RoomLabel"
+}
+
 def sanitize_id(id_str):
     """Encodes string to be safe for URI"""
     if pd.isna(id_str):
@@ -15,145 +45,258 @@ def sanitize_id(id_str):
     id_str = str(id_str).strip()
     return urllib.parse.quote(id_str)
 
-def build_knowledge_graph():
-    print("Initializing Graph...")
-    g = Graph()
-    g.bind("", NS)  # Default prefix
+def sanitize_ids(series):
+    """Column-wise sanitize_id: quotes each distinct value only once."""
+    series = series.astype(object)
+    uniques = series.dropna().unique()
+    mapping = {v: urllib.parse.quote(str(v).strip()) for v in uniques}
+    return series.map(mapping).fillna("Unknown")
 
-    # File Paths
-    data_dir = os.path.join(os.path.dirname(__file__), "..", "data", "csv")
-    nodes_file = os.path.join(data_dir, "안성재팀 - 온톨로지 - Nodes.csv")
-    edges_file = os.path.join(data_dir, "안성재팀 - 온톨로지 - Edges.csv")
-    courses_file = os.path.join(data_dir, "안성재팀 - 온톨로지 - 교과목.csv")
+# --- N-Triples term formatting (vectorized) ---
 
-    # 1. Process Nodes
-    print(f"Loading Nodes from {nodes_file}...")
-    try:
-        nodes_df = pd.read_csv(nodes_file)
-        for _, row in nodes_df.iterrows():
-            node_id = sanitize_id(row['id'])
-            node_uri = NS[node_id]
-            
-            # Label
-            if 'label' in row and not pd.isna(row['label']):
-                g.add((node_uri, RDFS.label, Literal(row['label'])))
-            
-            # Sort (Class vs Instance)
-            sort_val = row.get('sort', '').strip()
-            if sort_val == 'Class':
-                g.add((node_uri, RDF.type, RDFS.Class))
-            elif sort_val == 'Instance':
-                # If there's a specific class it belongs to, it might be defined in Edges,
-                # but for now we basically treat them as instances.
-                # If 'subSort' or similar existed, we'd use it.
-                # The milestone says: "Instance" -> a :ClassName (referencing label or implied class)
-                # However, usually the Class of an Instance is defined via a relation or implied.
-                # Let's see if Edges define "isA" or "type".
-                # For now, let's assume it's a NamedIndividual or just a generic Resource if class isn't known yet.
-                pass 
-            
-    except Exception as e:
-        print(f"Error processing Nodes: {e}")
-
-    # 2. Process Edges (Relationships)
-    print(f"Loading Edges from {edges_file}...")
-    try:
-        edges_df = pd.read_csv(edges_file)
-        for _, row in edges_df.iterrows():
-            src_id = sanitize_id(row['sourceID'])
-            target_raw = str(row['targetID']).strip()
-            relation = sanitize_id(row['relation'])
-            
-            src_uri = NS[src_id]
-            rel_uri = NS[relation]
-            
-            # Skip time relations in Edges.csv as they are better handled in Courses.csv processing
-            # This prevents creating URIs like :1000 where Literals "10:00" are expected
-            if relation in ['StartTime', 'EndTime']:
-                continue
-            
-            # Check if target is a Literal (e.g., """value"""^^type)
-            if target_raw.startswith('"""'):
-                # Extract value between triple quotes
-                # Expected format: """Note"""^^xsd:string or just """Note"""
-                # Simple parsing: find the closing """
-                try:
-                    content_end = target_raw.rindex('"""')
-                    if content_end > 3:
-                        content = target_raw[3:content_end]
-                        # We could parse type here if needed, but for now just taking the string content is safer/simpler for display
-                        # If we really want typed literals, use rdflib.XSD...
-                        g.add((src_uri, rel_uri, Literal(content)))
-                    else:
-                        # Fallback
-                        g.add((src_uri, rel_uri, Literal(target_raw)))
-                except ValueError:
-                     g.add((src_uri, rel_uri, Literal(target_raw)))
-            else:
-                # It's a resource link
-                tgt_id = sanitize_id(target_raw)
-                tgt_uri = NS[tgt_id]
-                g.add((src_uri, rel_uri, tgt_uri))
-                
-                # If relation suggests Class type
-                if relation.lower() in ['type', 'rdf:type', 'a', 'instanceof']:
-                     # Ensure target is labeled as a Class (optional but good for consistency)
-                     # But we don't want to force-add type to everything if not needed
-                     pass
-
-    except Exception as e:
-        print(f"Error processing Edges: {e}")
-
-    # 3. Process Courses (Properties)
-    print(f"Loading Courses from {courses_file}...")
+def uri_terms(ids):
+    """Sanitized id column -> '<http://.../id>' column"""
+    return "<" + BASE_URI + ids + ">"
+
+def literal_terms(values):
+    """String column -> N-Triples plain literal column"""
+    escaped = (values.str.replace("\\", "\\\\", regex=False)
+                     .str.replace('"', '\\"', regex=False)
+                     .str.replace("\n", "\\n", regex=False)
+                     .str.replace("\r", "\\r", regex=False))
+    return '"' + escaped + '"'
+
+def typed_terms(values, datatype):
+    """Column of lexical values -> N-Triples typed literal column ("540"^^<...#integer>)"""
+    return '"' + values.astype(str) + f'"^^<{datatype}>'
+
+# xsd names used in Edges.csv ("406.31"^^xsd:float) -> datatype; strings stay plain literals
+EDGE_DATATYPES = {
+    "float": XSD.float,
+    "double": XSD.double,
+    "decimal": XSD.decimal,
+    "integer": XSD.integer,
+    "int": XSD.integer,
+    "str": None,
+    "string": None,
+}
+
+def triples_frame(s, p, o):
+    return pd.DataFrame({"s": s.values, "p": p.values if isinstance(p, pd.Series) else p, "o": o.values})
+
+# --- Partitions ---
+
+def nodes_triples(nodes_df):
+    node_uris = uri_terms(sanitize_ids(nodes_df["id"]))
+    parts = []
+
+    # Label
+    if "label" in nodes_df.columns:
+        has_label = nodes_df["label"].notna()
+        labels = nodes_df.loc[has_label, "label"].astype(str)
+        parts.append(triples_frame(node_uris[has_label], RDFS.label.n3(), literal_terms(labels)))
+
+    # Sort (Class vs Instance)
+    # Instances get their class via :instanceOf in Edges.csv, so only Classes are typed here.
+    sort_vals = nodes_df["sort"].fillna("").astype(str).str.strip()
+    is_class = sort_vals == "Class"
+    parts.append(triples_frame(node_uris[is_class], RDF.type.n3(),
+                               pd.Series(RDFS.Class.n3(), index=node_uris[is_class].index)))
+    return pd.concat(parts, ignore_index=True)
+
+def edges_triples(edges_df):
+    relations = sanitize_ids(edges_df["relation"])
+    # Skip time relations in Edges.csv as they are better handled in Courses.csv processing
+    # This prevents creating URIs like :1000 where Literals "10:00" are expected
+    keep = ~relations.isin(["StartTime", "EndTime"])
+    edges_df = edges_df[keep]
+    relations = relations[keep]
+
+    src_uris = uri_terms(sanitize_ids(edges_df["sourceID"]))
+    rel_uris = uri_terms(relations)
+    target_raw = edges_df["targetID"].astype(str).str.strip()
+
+    # Literal targets look like """value"""^^type; keep just the string content
+    is_literal = target_raw.str.startswith('"""')
+    lit_raw = target_raw[is_literal]
+    contents = lit_raw.str.extract(r'^"""(.*)"""', flags=re.S)[0]
+    contents = contents.where(contents.str.len() > 0, lit_raw)  # Fallback: no closing quotes
+
+    # Typed targets look like "406.31"^^xsd:float (distance, getLat/getLong, dayOfWeek)
+    typed = target_raw[~is_literal].str.extract(r'^"(.*)"\^\^xsd:(\w+)$', flags=re.S)
+    is_typed = pd.Series(False, index=edges_df.index)
+    is_typed[typed.index] = typed[0].notna()
+    typed = typed[typed[0].notna()]
+    datatypes = typed[1].map(lambda name: EDGE_DATATYPES[name] if name in EDGE_DATATYPES else XSD[name])
+
+    objects = pd.Series(index=edges_df.index, dtype=object)
+    objects[is_literal] = literal_terms(contents.astype(str))
+    typed_objects = literal_terms(typed[0].str.strip())
+    has_type = datatypes.notna()
+    typed_objects[has_type] = typed_objects[has_type] + "^^<" + datatypes[has_type].map(str) + ">"
+    objects[is_typed] = typed_objects
+    # Otherwise it's a resource link
+    is_uri = ~is_literal & ~is_typed
+    objects[is_uri] = uri_terms(sanitize_ids(target_raw[is_uri]))
+    return triples_frame(src_uris, rel_uris, objects)
+
+def courses_triples(courses_df):
+    # Every column becomes a data property of the course (ID matches Node id)
+    course_ids = sanitize_ids(courses_df["ID"])
+    values = courses_df.drop(columns=["ID"]).astype(object)
+    values.insert(0, "_course", uri_terms(course_ids))
+    long_df = values.melt(id_vars="_course", var_name="col", value_name="val").dropna(subset=["val"])
+
+    # 1. Determine Predicate URI (fallback to original column name if not mapped)
+    clean_cols = long_df["col"].map(lambda c: COURSE_COL_MAP.get(c, c))
+    prop_uris = uri_terms(sanitize_ids(clean_cols))
+
+    # 2. Format Value (Time Padding): 9:50 -> 09:50
+    val_str = long_df["val"].astype(str).str.strip()
+    is_time = clean_cols.isin(["StartTime", "EndTime"]) & val_str.str.match(r"^[^:]:")
+    val_str = val_str.where(~is_time, "0" + val_str)
+    parts = [triples_frame(long_df["_course"], prop_uris, literal_terms(val_str))]
+
+    # 3. Numeric time model: minutes since midnight + weekday bitmask (월=1, 화=2, 수=4, ...)
+    course_uris = uri_terms(course_ids)
+    for col, prop in (("수업 시작 시간", "startMinute"), ("수업 종료 시간", "endMinute")):
+        if col not in courses_df.columns:
+            continue
+        hm = courses_df[col].astype(str).str.extract(r"^\s*(\d{1,2}):(\d{2})")
+        ok = hm[0].notna()
+        minutes = hm.loc[ok, 0].astype(int) * 60 + hm.loc[ok, 1].astype(int)
+        parts.append(triples_frame(course_uris.loc[ok], f"<{NS[prop]}>", typed_terms(minutes, XSD.integer)))
+    if "수업 요일" in courses_df.columns:
+        days = courses_df["수업 요일"].dropna().astype(str)
+        masks = days.map(lambda text: sum(1 << i for i, day in enumerate(WEEKDAYS) if day in text))
+        ok = masks > 0
+        parts.append(triples_frame(course_uris.loc[days.index][ok.values], f"<{NS.dayMask}>",
+                                   typed_terms(masks[ok], XSD.integer)))
+    return pd.concat(parts, ignore_index=True)
+
+PARTITION_BUILDERS = {
+    "nodes": nodes_triples,
+    "edges": edges_triples,
+    "courses": courses_triples,
+}
+
+# --- Incremental build ---
+
+def partition_hash(csv_path):
+    """Content hash of the source CSV (+ builder version)."""
+    h = hashlib.sha256(BUILDER_VERSION.encode("utf-8"))
+    with open(csv_path, "rb") as f:
+        h.update(f.read())
+    return h.hexdigest()
+
+def write_partition(triples, path):
+    triples = triples.drop_duplicates()
+    lines = triples["s"] + " " + triples["p"] + " " + triples["o"] + " .\n"
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+    os.replace(tmp_path, path)
+    return len(triples)
+
+def load_manifest(build_dir):
+    path = os.path.join(build_dir, "manifest.json")
+    if not os.path.exists(path):
+        return {}
     try:
-        courses_df = pd.read_csv(courses_file)
-        for _, row in courses_df.iterrows():
-            # ID matches Node id
-            course_id = sanitize_id(row['ID'])
-            course_uri = NS[course_id]
-            
-            # Map columns to constraints/properties
-            # Example columns: title, startsAt, endsAt, dayOfWeek, etc.
-            # We'll just add all columns as data properties
-            # Specific Column Mapping & Formatting
-            # Map Korean column names to clean predicates
-            COL_MAP = {
-                "수업 시작 시간": "StartTime",
-                "수업 종료 시간": "EndTime",
-                "과목명": "title",
-                "강의동": "isHeldAt_BuildingLabel", # Temporary, usually mapped to node
-                "강의실": "isHeldAt_RoomLabel"
-            }
-            
-            for col in courses_df.columns:
-                if col == 'ID': continue
-                
-                val = row[col]
-                if pd.notna(val):
-                    # 1. Determine Predicate URI
-                    clean_col = COL_MAP.get(col, col) # Fallback to original if not mapped
-                    prop_uri = NS[sanitize_id(clean_col)]
-                    
-                    # 2. Format Value (Time Padding)
-                    # Check if it looks like time "9:50" or "9:00"
-                    val_str = str(val).strip()
-                    if clean_col in ["StartTime", "EndTime"]:
-                        # Pad with zero if needed (9:50 -> 09:50)
-                        if ':' in val_str and len(val_str.split(':')[0]) == 1:
-                            val_str = "0" + val_str
-                    
-                    # Add Triple
-                    g.add((course_uri, prop_uri, Literal(val_str)))
-                    
-    except Exception as e:
-        print(f"Error processing Courses: {e}")
-
-    # Serialize
-    output_path = os.path.join(os.path.dirname(__file__), "..", "data", "knowledge_graph.ttl")
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(build_dir, manifest):
+    path = os.path.join(build_dir, "manifest.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+def manifest_digest(manifest):
+    """Digest of the partition hashes/counts; stored with the snapshot it was built from."""
+    return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()
+
+def build_knowledge_graph(data_dir=None, output_path=None, force=False):
+    """
+    CSV -> N-Triples partitions (one per CSV, rebuilt only when its content hash changes)
+    -> merged knowledge_graph.ttl -> snapshot.
+    """
+    # File Paths
+    csv_dir = data_dir or os.path.join(DATA_DIR, "csv")
+    output_path = output_path or os.path.join(DATA_DIR, "knowledge_graph.ttl")
+    build_dir = os.path.join(os.path.dirname(output_path), "build")
+    os.makedirs(build_dir, exist_ok=True)
+
+    manifest = {} if force else load_manifest(build_dir)
+    partition_paths = []
+    changed = False
+    for name, file_name in PARTITION_FILES.items():
+        csv_path = os.path.join(csv_dir, file_name)
+        nt_path = os.path.join(build_dir, f"{name}.nt")
+        partition_paths.append(nt_path)
+        digest = partition_hash(csv_path)
+
+        entry = manifest.get(name)
+        if entry and entry.get("hash") == digest and os.path.exists(nt_path):
+            print(f"[{name}] unchanged, reusing {entry['triples']} triples")
+            continue
+
+        print(f"[{name}] Loading {csv_path}...")
+        try:
+            df = pd.read_csv(csv_path)
+            count = write_partition(PARTITION_BUILDERS[name](df), nt_path)
+        except Exception as e:
+            # The previous partition is stale now: drop it so it is never merged as current,
+            # keep what was rebuilt so far, and publish nothing
+            manifest.pop(name, None)
+            if os.path.exists(nt_path):
+                os.remove(nt_path)
+            save_manifest(build_dir, manifest)
+            raise RuntimeError(f"Error processing {name} ({csv_path}): {e}") from e
+        manifest[name] = {"hash": digest, "triples": count}
+        changed = True
+        print(f"[{name}] wrote {count} triples")
+
+    save_manifest(build_dir, manifest)
+    digest = manifest_digest(manifest)
+    # Nothing to merge: skip the re-parse, introspection and travel matrix when the
+    # TTL and snapshot on disk were built from exactly these partitions
+    if not changed and is_current(output_path, digest):
+        print(f"No partition changed; {output_path} and its snapshot are up to date")
+        return
+
+    # Merge: stream the partitions into the final TTL (N-Triples lines are valid Turtle)
     print(f"Saving graph to {output_path}...")
-    g.serialize(destination=output_path, format="turtle")
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        out.write(f"@prefix : <{BASE_URI}> .\n")
+        out.write(f"@prefix rdfs: <{RDFS}> .\n\n")
+        for nt_path in partition_paths:
+            if not os.path.exists(nt_path):
+                continue
+            with open(nt_path, encoding="utf-8") as f:
+                shutil.copyfileobj(f, out)
+    os.replace(tmp_path, output_path)
+
+    # Precompiled snapshot for fast GraphAgent startup
+    g = Graph()
+    g.bind("", NS)  # Default prefix
+    for nt_path in partition_paths:
+        if os.path.exists(nt_path):
+            g.parse(nt_path, format="nt")
+    # Schema/label introspection and the accessible travel matrix are stored with it,
+    # so the agent doesn't recompute them
+    meta = {"schema": introspect(g), "travel": TravelMatrix.from_router(RouteGraph(g)).to_state(),
+            "manifest": digest}
+    snap_path = write_snapshot(g, output_path, meta=meta)
+    print(f"Saved snapshot to {snap_path} ({len(g)} triples)")
     print("Done!")
 
 if __name__ == "__main__":
-    build_knowledge_graph()
+    parser = argparse.ArgumentParser(description="Build knowledge_graph.ttl from data/csv")
+    parser.add_argument("--data-dir", help="Directory with Nodes/Edges/교과목 CSVs")
+    parser.add_argument("--output", help="Output TTL path")
+    parser.add_argument("--force", action="store_true", help="Rebuild every partition")
+    args = parser.parse_args()
+    build_knowledge_graph(args.data_dir, args.output, args.force)
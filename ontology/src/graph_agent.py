@@ -1,83 +1,688 @@
 import os
-import google.generativeai as genai
-from rdflib import Graph, Namespace, URIRef, Literal
-from dotenv import load_dotenv
+import asyncio
+import contextlib
+import itertools
+import logging
+import textwrap
+import math
+import time
+import threading
+from rdflib import Graph, Namespace, URIRef, Literal, RDFS
 import pandas as pd
+from snapshot import load_graph as load_graph_snapshot
+from overlay import overlay_graph
+from mvcc import GraphVersion, DERIVED, pinned_version, pin, unpin
+from journal import Journal, journal_path as default_journal_path
+from schema import introspect, summary_items
+from sparql_cache import SparqlCache
+from query_cache import QueryCache, normalize_sparql
+from templates import (TemplateMatcher, TEMPLATES, VALUES_SLOT, FACILITY_KEYWORDS, ROUTE_WORDS, WHEELCHAIR_WORDS,
+                       display_sparql, render_answer, route_display)
+from routing import RouteGraph, TravelMatrix, ROUTING_PREDICATES, HAZARD_NAMES, local_name
+from timetable import load_sections, TimetableSolver, WHEELCHAIR_M_PER_MIN, SECTION_PREDICATES
+from accessibility import AccessibilityIndex
+from schedule import ScheduleIndex, parse_minutes, values_clause
+from label_index import LabelIndex, LABEL_PREDICATES, rewrite_label_filters
+from spatial import SpatialGrid, SPATIAL_PREDICATES
+from prompt_context import sparql_context, frame_context, MAX_ROWS
+from sparql_repair import SparqlRepairer, parse_llm_json, repair_prompt
+from llm_backend import GeminiBackend, call_with_retry, acall_with_retry
+from metrics import Metrics, estimate_tokens
 
-# Load env
-load_dotenv()
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if GOOGLE_API_KEY:
-    genai.configure(api_key=GOOGLE_API_KEY)
+logger = logging.getLogger(__name__)
 
 # Namespaces
 BASE_URI = "http://snu.ac.kr/barrier-free/"
 NS = Namespace(BASE_URI)
+DEFAULT_GRAPH_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "knowledge_graph.ttl")
+DEFAULT_SPARQL_CACHE_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "cache", "sparql_cache.sqlite")
+# Mutations of these predicates change the entity vocabulary used by the template matcher
+VOCAB_PREDICATES = {RDFS.label, NS.title, NS.instanceOf}
+# Bump when the SPARQL prompt changes so cached queries from the old prompt are not reused
+PROMPT_VERSION = "5"
+# Answer for a query that could not be generated or run (no answer LLM call)
+QUERY_ERROR_ANSWER = "질문을 그래프 검색으로 바꾸지 못했습니다. 건물명이나 과목명을 넣어 다시 질문해 주세요."
 
 class GraphAgent:
-    def __init__(self, key=None):
-        self.g = Graph()
+    def __init__(self, key=None, graph_path=None, sparql_cache_path=None, backend=None, journal_path=None):
+        self.graph_path = graph_path or DEFAULT_GRAPH_PATH
+        # Maintenance changes and fault reports, replayed on top of the loaded graph
+        self.journal = Journal(journal_path or default_journal_path(self.graph_path))
+        self.reports = []  # [{"text", "ts"}], oldest first
+        # Latest published GraphVersion: the graph, its version number (monotonically
+        # increasing, bumped by every mutation) and the indexes derived from it.
+        # g / version / the index slots below resolve to the version pinned by the
+        # current reader or writer, else to the head (see mvcc.py)
+        self._head = None
+        self._write_lock = threading.RLock()
+        self._version_numbers = itertools.count(1)  # never reused, even by unpublished forks
+        # Compiled SPARQL + results per (query, graph version)
+        self.query_cache = QueryCache()
+        self.metrics = Metrics()
+        # Per-version indexes:
+        #   _templates  TemplateMatcher, rebuilt when labels/titles change
+        #   _router     RouteGraph, rebuilt when routes/facilities/hazards change
+        #   _travel     TravelMatrix, patched on Lift/Ramp toggles
+        #   _sections   {title: [Section]}, reloaded when course/room triples change
+        #   _schedule   ScheduleIndex over _sections
+        #   _access     AccessibilityIndex, patched on facility/hazard changes
+        #   _labels     LabelIndex, updated on label/title changes
+        #   _spatial    SpatialGrid over building coordinates
+        #   _network    visualization.NetworkView (+ its HTML), patched on facility toggles
+        #   _schema     schema introspection for the prompts, redone after any change
         self.load_graph()
-        try:
-            self.model = genai.GenerativeModel('gemini-2.0-flash') 
-        except:
-            pass
+        # NL question -> {reasoning, sparql}, persisted across restarts
+        self.sparql_cache = SparqlCache(sparql_cache_path or DEFAULT_SPARQL_CACHE_PATH,
+                                        namespace=PROMPT_VERSION, vocabulary=self._question_vocabulary())
+        # LLM behind a backend interface (GeminiBackend by default, StubBackend offline)
+        self.llm_retries = 3
+        self.llm_backoff = 0.5
+        self.llm = backend
+        self.llm_error = None
+        if self.llm is None:
+            try:
+                self.llm = GeminiBackend()
+            except Exception as e:
+                self.llm_error = str(e)
+                logger.warning("LLM backend unavailable: %s", e)
 
     def load_graph(self):
-        path = os.path.join(os.path.dirname(__file__), "..", "data", "knowledge_graph.ttl")
+        path = self.graph_path
         print(f"Loading graph from {path}...")
-        self.g.parse(path, format="turtle")
-        
-        # Keep a copy of the original graph structure for UI logic (e.g. valid facilities)
-        self.base_g = Graph()
-        self.base_g.parse(path, format="turtle")
+        # Prefer the precompiled snapshot written by build_graph.py (falls back to TTL parse)
+        base, snapshot_meta, from_snapshot = load_graph_snapshot(path)
+        # Maintenance changes live in a delta on top of the loaded graph (never written),
+        # so the original triples stay available without a second copy
+        g, store = overlay_graph(base)
+        with self._write_lock:
+            self.snapshot_meta = snapshot_meta
+            # Live maintenance state from the journal becomes the initial delta
+            added, removed, self.reports = self.journal.replay()
+            for triple in removed:
+                g.remove(triple)
+            for triple in added:
+                g.add(triple)
+            with self._writing(GraphVersion(self, g, store, 0)):
+                self._reset_derived()
         
-        print(f"Graph loaded with {len(self.g)} triples.")
+        source = "snapshot" if from_snapshot else "turtle"
+        print(f"Graph loaded with {len(self.g)} triples (from {source}, "
+              f"{len(store.added) + len(store.removed)} journaled changes).")
 
-    def get_schema_summary(self):
-        """Introspects the graph to find used predicates and classes."""
-        # Get all predicates
-        q = """
-        SELECT DISTINCT ?p WHERE {
-            ?s ?p ?o .
-        }
+    @property
+    def base_g(self):
+        """The graph as loaded, without maintenance changes (for 'originally present' checks)."""
+        return self.store.base
+
+    def _reset_derived(self):
+        """Drops every index derived from the graph; the snapshot's precomputed ones are reused."""
+        self._templates = None
+        self._router = None
+        self._travel = None
+        self._labels = None
+        self._spatial = None
+        self._sections = self._schedule = self._access = None
+        self._network = None
+        self._schema = None
+        self._bump_version()
+        # Schema introspection and the travel matrix precomputed offline by build_graph.py
+        # only describe the base graph
+        if self.store.added or self.store.removed:
+            return
+        if "schema" in self.snapshot_meta:
+            self._schema = self.snapshot_meta["schema"]
+        if "travel" in self.snapshot_meta:
+            self._travel = TravelMatrix.from_state(self.snapshot_meta["travel"])
+
+    def changes(self):
+        """Maintenance delta against the base graph: {"added": [triples], "removed": [triples]}"""
+        return {"added": sorted(self.store.added), "removed": sorted(self.store.removed)}
+
+    def reset_changes(self):
+        """Reverts all maintenance changes by dropping the delta."""
+        with self._writing():
+            self.store.reset()
+            self._reset_derived()
+            self.journal.log_reset()
+
+    # --- Versions (readers pin one, writers publish a new one) ---
+
+    def _state(self):
+        return pinned_version(self) or self._head
+
+    @contextlib.contextmanager
+    def pinned(self):
+        """Every read in the block sees the graph version published when it started."""
+        if pinned_version(self) is not None:
+            yield
+            return
+        token = pin(self._head)
+        try:
+            yield
+        finally:
+            unpin(token)
+
+    @contextlib.contextmanager
+    def _writing(self, state=None):
         """
-        preds = [str(row.p).replace(BASE_URI, ":") for row in self.g.query(q) if BASE_URI in str(row.p)]
-        
-        # Get Sample classes (if 'a' or 'rdf:type' is used)
-        q_cls = """
-        SELECT DISTINCT ?type WHERE {
-            ?s a ?type .
+        Writes in the block go to a fork of the head (or to `state`), which is published
+        at the end. Writers are serialized; readers keep using the version they pinned.
+        Nothing is published if the block raises.
+        """
+        with self._write_lock:
+            state = state or self._head.fork()
+            token = pin(state)
+            try:
+                yield state
+            finally:
+                unpin(token)
+            self._head = state
+
+    def _writable(self, name):
+        """Derived index of the version being written, copied before it is patched."""
+        return self._state().writable(name)
+
+    # --- Graph mutation (every change bumps the version) ---
+
+    def _bump_version(self):
+        self.version = next(self._version_numbers)
+        # Introspected again for the new version; older versions keep theirs
+        self._schema = None
+
+    def apply_changes(self, added=(), removed=()):
+        """Adds/removes several triples; readers see all of them or none."""
+        with self._writing():
+            done_removed = [t for t in dict.fromkeys(removed) if t in self.g]
+            for triple in done_removed:
+                self.g.remove(triple)
+                self._on_mutation(triple)
+            done_added = [t for t in dict.fromkeys(added) if t not in self.g]
+            for triple in done_added:
+                self.g.add(triple)
+                self._on_mutation(triple)
+            if done_added or done_removed:
+                # Journaled before the version is published
+                self.journal.log_changes(done_added, done_removed)
+                self._maybe_compact()
+
+    def add_triple(self, triple):
+        self.apply_changes(added=[triple])
+
+    def remove_triple(self, triple):
+        self.apply_changes(removed=[triple])
+
+    def _on_mutation(self, triple):
+        self._bump_version()
+        s, p, o = triple
+        if p in VOCAB_PREDICATES:
+            self._templates = None
+        if p in SPATIAL_PREDICATES:
+            self._spatial = None
+        if p in SECTION_PREDICATES:
+            self._sections = self._schedule = self._access = None
+        elif p in (NS.hasFacility, NS.hasHazard) and self._access is not None:
+            self._writable("_access").update(s, p, o, triple in self.g)
+        if p in LABEL_PREDICATES and self._labels is not None:
+            if triple in self.g:
+                self._writable("_labels").add(s, o)
+            else:
+                self._writable("_labels").remove(s, o)
+        if p == NS.hasFacility and self._router is not None:
+            # Facility toggles are patched in place instead of rebuilding the router
+            if triple in self.g:
+                self._writable("_router").facilities[s].add(o)
+            else:
+                self._writable("_router").facilities[s].discard(o)
+        elif p in ROUTING_PREDICATES or p in VOCAB_PREDICATES:
+            self._router = None
+        if p == NS.hasFacility:
+            if self._travel is not None:
+                with self.metrics.span("travel_matrix_update"):
+                    self._writable("_travel").update_building(self.get_router(), s)
+        elif p in ROUTING_PREDICATES:
+            self._travel = None
+        if p == NS.hasFacility and self._network is not None:
+            diff = self._writable("_network").update(triple, triple in self.g)
+            self.metrics.incr("network_nodes_patched", len(diff["nodes"]["added"]) + len(diff["nodes"]["removed"]))
+            self.metrics.incr("network_edges_patched", len(diff["edges"]["added"]) + len(diff["edges"]["removed"]))
+        else:
+            self._network = None
+
+    def _maybe_compact(self):
+        if self.journal.needs_compaction:
+            with self.metrics.span("journal_compaction"):
+                self.journal.compact(self.store.added, self.store.removed, self.reports)
+
+    def report(self, text):
+        """Records a fault report (journaled, shared by every session)."""
+        entry = {"text": text, "ts": time.time()}
+        with self._write_lock:
+            self.journal.log_report(entry)
+            self.reports = self.reports + [entry]
+            self._maybe_compact()
+        return entry
+
+    def set_facility(self, bldg_uri, fac_uri, is_active):
+        """Maintenance toggle: (bldg :hasFacility fac) on/off."""
+        triple = (URIRef(bldg_uri), NS.hasFacility, URIRef(fac_uri))
+        if is_active:
+            self.add_triple(triple)
+        else:
+            self.remove_triple(triple)
+
+    # --- Template fast path ---
+
+    def get_templates(self):
+        if self._templates is None:
+            self._templates = TemplateMatcher(self.g)
+            # Pre-compile the template queries
+            init_ns = dict(self.g.namespaces())
+            for text in TEMPLATES.values():
+                self.query_cache.prepare(normalize_sparql(text), init_ns)
+        return self._templates
+
+    def answer_from_template(self, user_query):
+        """Answers known question shapes locally (no LLM). Returns None if unmatched."""
+        with self.metrics.span("template"):
+            match = self.get_templates().match(user_query)
+        if match is None:
+            return None
+        self.metrics.annotate(template=match["intent"])
+        if match["intent"] == "route":
+            df = self.route_frame(match["slots"]["from"], match["slots"]["to"])
+        elif match["intent"] == "timetable":
+            df = self.timetable_frame(match["slots"]["titles"])
+        elif match["intent"] == "nearest_facility":
+            df = self.nearest_frame(match["slots"]["building"], [match["slots"]["facility"]])
+        else:
+            match = self._prefilter(match)
+            df = self.execute_query(match["sparql"], bindings=match["bindings"])
+            if match["intent"] == "course_place" and match["slots"].get("wheelchair"):
+                df = self._score_frame(df)
+        with self.metrics.span("answer_rendering"):
+            answer = render_answer(match, df)
+        return {
+            "question": user_query,
+            "reasoning": match["reasoning"],
+            "sparql": display_sparql(match),
+            "data": df,
+            "answer": answer,
+            "template": match["intent"],
         }
+
+    # --- Label index (entity mentions -> URIs without REGEX scans) ---
+
+    def get_label_index(self):
+        if self._labels is None:
+            with self.metrics.span("label_index_build"):
+                self._labels = LabelIndex(self.g)
+        return self._labels
+
+    def _question_vocabulary(self):
         """
-        classes = [str(row.type).replace(BASE_URI, ":") for row in self.g.query(q_cls) if BASE_URI in str(row.type)]
+        Words the SPARQL cache keys keep whole: the labels of the loaded graph and the
+        template keywords, so '경사로' (ramp) and '경사' + '로' (slope) stay apart.
+        """
+        words = self.get_label_index().normalized_labels()
+        words.update(w for _, keywords in FACILITY_KEYWORDS.values() for w in keywords)
+        words.update(HAZARD_NAMES.values())
+        words.update(w for w in ROUTE_WORDS + WHEELCHAIR_WORDS if " " not in w)
+        return words
 
-        return f"Predicates: {', '.join(preds)}\nClasses: {', '.join(classes)}"
+    def resolve_label(self, mention):
+        """URIs of the entities labeled `mention` ('25 동' finds 25동; partial titles match too)."""
+        return self.get_label_index().resolve(mention)
+
+    # --- Routing (multi-hop paths over :Route) ---
+
+    def get_router(self):
+        if self._router is None:
+            self._router = RouteGraph(self.g)
+        return self._router
+
+    def find_route(self, src, dst, accessible=True):
+        """
+        Shortest path between two buildings (label like '25동' or id like 'N003').
+        accessible=True avoids Curb/Steep hazards and buildings without Lift/Ramp.
+        Returns the RouteGraph.shortest_path dict, or None.
+        """
+        router = self.get_router()
+        a, b = router.find(src), router.find(dst)
+        if a is None or b is None:
+            return None
+        with self.metrics.span("routing"):
+            return router.shortest_path(a, b, accessible=accessible)
+
+    def get_spatial_index(self):
+        if self._spatial is None:
+            with self.metrics.span("spatial_index_build"):
+                self._spatial = SpatialGrid.from_graph(self.g)
+        return self._spatial
+
+    def nearest_buildings(self, where, k=3):
+        """Straight-line closest buildings to a building (label or id): [(label, metres)]."""
+        bldg = self._find_building(where)
+        if bldg is None:
+            return []
+        return [(str(self.g.value(b, RDFS.label) or b), dist)
+                for b, dist in self.get_spatial_index().nearest(bldg, k=k)]
+
+    def get_travel_matrix(self):
+        if self._travel is None:
+            with self.metrics.span("travel_matrix_build"):
+                self._travel = TravelMatrix.from_router(self.get_router())
+        return self._travel
+
+    def transfer_distance(self, src, dst):
+        """Accessible walking distance (m) between two buildings; inf if there is no accessible path."""
+        router = self.get_router()
+        return self.get_travel_matrix().distance(router.find(src), router.find(dst))
+
+    def route_frame(self, src, dst):
+        """Accessible path if there is one, else the plain shortest path, one row per hop."""
+        path = self.find_route(src, dst, accessible=True) or self.find_route(src, dst, accessible=False)
+        columns = ["step", "fromName", "toName", "route", "routeLabel", "dist", "hazards", "accessible"]
+        if path is None:
+            return pd.DataFrame(columns=columns)
+        labels = self.get_router().labels
+        rows = [[i + 1, labels[h["from"]], labels[h["to"]], str(h["route"]), labels[h["route"]],
+                 h["distance"], ", ".join(HAZARD_NAMES.get(x, x) for x in h["hazards"]), path["accessible"]]
+                for i, h in enumerate(path["hops"])]
+        return pd.DataFrame(rows, columns=columns)
+
+    # --- Nearest facility (competency question 5) ---
+
+    def _find_building(self, where):
+        return self.get_router().find(where) or next(iter(self.resolve_label(where)), None)
+
+    def nearest(self, building, facility_kinds=("F_001",), k=3, accessible_only=True):
+        """
+        Closest buildings to `building` (label or id) that have every facility in
+        facility_kinds (ids like 'F_001'), ranked by route distance; with accessible_only
+        only buildings reachable over accessible paths count. Candidates come from the
+        spatial grid in straight-line order, and the scan stops once the next straight-line
+        distance can no longer beat the k-th route distance. Returns
+            [{"building", "label", "distance", "straight_m", "accessible", "facilities", "hazards", "path"}]
+        """
+        src = self._find_building(building)
+        if src is None:
+            return []
+        router = self.get_router()
+        kinds = {f if isinstance(f, URIRef) else NS[f] for f in facility_kinds}
+        travel = self.get_travel_matrix() if accessible_only else None
+
+        def wanted(b):
+            return kinds <= router.facilities[b]
+
+        def route_distance(b):
+            if travel is not None:
+                return travel.distance(src, b)
+            path = router.shortest_path(src, b)
+            return path["distance"] if path else math.inf
+
+        with self.metrics.span("nearest"):
+            grid = self.get_spatial_index()
+            candidates = [(src, 0.0)] if wanted(src) else []
+            # Buildings without coordinates cannot be ordered; check them up front
+            candidates += [(b, math.inf) for b in router.adj if b not in grid.coords and b != src and wanted(b)]
+            found = []
+            for b, straight in itertools.chain(candidates, grid.iter_nearest(src, accept=wanted)):
+                if len(found) >= k and found[k - 1][0] <= router.heuristic_scale * straight < math.inf:
+                    break
+                dist = route_distance(b)
+                if math.isfinite(dist):
+                    found.append((dist, str(b), b, straight))
+                    found.sort(key=lambda f: f[:2])
+            results = []
+            for dist, _, b, straight in found[:k]:
+                path = router.shortest_path(src, b, accessible=accessible_only)
+                hazards = set(router.hazards[b])
+                for hop in path["hops"]:
+                    hazards.update(router.hazards[hop["route"]])
+                results.append({
+                    "building": b,
+                    "label": router.labels.get(b, str(self.g.value(b, RDFS.label) or b)),
+                    "distance": dist,
+                    "straight_m": straight,
+                    "accessible": accessible_only,
+                    "facilities": sorted(local_name(f) for f in router.facilities[b]),
+                    "hazards": sorted(local_name(h) for h in hazards),  # at the building or on the way
+                    "path": [router.labels.get(p, str(p)) for p in path["buildings"]],
+                })
+        return results
+
+    def nearest_frame(self, building, facility_kinds=("F_001",), k=3):
+        """Accessible candidates if there are any, else by plain route distance, one row per building."""
+        found = (self.nearest(building, facility_kinds, k=k, accessible_only=True)
+                 or self.nearest(building, facility_kinds, k=k, accessible_only=False))
+        columns = ["rank", "bldgName", "building", "dist", "straight_m", "accessible", "hazards", "path"]
+        rows = [[i + 1, f["label"], str(f["building"]), round(f["distance"], 2),
+                 round(f["straight_m"], 2) if math.isfinite(f["straight_m"]) else None, f["accessible"],
+                 ", ".join(HAZARD_NAMES.get(h, h) for h in f["hazards"]), " → ".join(f["path"])]
+                for i, f in enumerate(found)]
+        return pd.DataFrame(rows, columns=columns)
+
+    # --- Timetable combinations (competency question 9) ---
+
+    def get_sections(self):
+        if self._sections is None:
+            self._sections = load_sections(self.g)
+        return self._sections
+
+    def plan_timetable(self, titles, k=3):
+        """
+        Best k conflict-free combinations of one section per title, where every transfer
+        between consecutive classes is possible by wheelchair in the break.
+        See TimetableSolver.solve for the result layout.
+        """
+        solver = TimetableSolver(self.get_sections(), self.get_travel_matrix().distance)
+        with self.metrics.span("timetable"):
+            return solver.solve(titles, k=k)
+
+    def timetable_frame(self, titles, k=3):
+        """plan_timetable as one row per (option, section)."""
+        result = self.plan_timetable(titles, k=k)
+        columns = ["option", "title", "days", "time", "room", "bldgName", "course",
+                   "transfer_m", "gap_min", "alternatives"]
+        rows = []
+        for option, combo in enumerate(result["combos"], start=1):
+            for s in combo["sections"]:
+                alts = ", ".join(a.room for a in combo["alternatives"].get(s.uri, []))
+                rows.append([option, s.title, s.days_text, s.time_text, s.room, s.building_label,
+                             str(s.uri), round(combo["transfer_m"], 2), combo["gap_min"], alts])
+        return pd.DataFrame(rows, columns=columns)
+
+    # --- Schedule index (numeric times, per-weekday interval lookups) ---
+
+    def get_schedule_index(self):
+        if self._schedule is None:
+            self._schedule = ScheduleIndex(self.get_sections())
+        return self._schedule
+
+    # --- Section accessibility (facility/hazard bitmasks, one score per section) ---
+
+    def get_accessibility(self):
+        if self._access is None:
+            with self.metrics.span("accessibility_build"):
+                self._access = AccessibilityIndex(self.g, self.get_sections())
+        return self._access
+
+    def accessible_sections(self, title=None):
+        """Sections held in wheelchair-accessible buildings (of `title`, if given), best score first."""
+        index = self.get_schedule_index()
+        return [index.by_uri[u] for u in self.get_accessibility().accessible(title=title)]
+
+    def _score_frame(self, df):
+        """Adds `score`/`accessible` columns from the section scores and ranks by score (needs a `course` column)."""
+        if df is None or df.empty or "course" not in df.columns:
+            return df
+        with self.metrics.span("accessibility"):
+            scores = self.get_accessibility().scores([URIRef(c) for c in df["course"]])
+            df = df.assign(score=[round(scores.get(URIRef(c), 0.0), 2) for c in df["course"]])
+            df["accessible"] = df["score"] > 0
+        return df.sort_values("score", ascending=False, kind="stable").reset_index(drop=True)
+
+    def sections_right_after(self, before_title, title=None, max_gap=60):
+        """
+        Sections (of `title`, if given) starting within max_gap minutes after a
+        `before_title` section ends on the same day, and reachable by wheelchair in that gap.
+        """
+        index = self.get_schedule_index()
+        travel = self.get_travel_matrix()
+        found = []
+        for b, s in index.right_after(index.by_title.get(before_title, []), max_gap=max_gap, title=title):
+            if b.building == s.building or travel.distance(b.building, s.building) <= (s.start - b.end) * WHEELCHAIR_M_PER_MIN:
+                if s not in found:
+                    found.append(s)
+        return found
+
+    def schedule_values(self, sections, var="course"):
+        """Index hits as pre-filtered SPARQL bindings: 'VALUES ?course { <...> ... }'"""
+        return values_clause(var, [s.uri for s in sections])
+
+    def _prefilter(self, match):
+        """Replaces the template's VALUES slot with the sections the schedule index selects."""
+        slots = match["slots"]
+        index = self.get_schedule_index()
+        with self.metrics.span("schedule_index"):
+            if match["intent"] == "course_end_before":
+                sections = index.ends_before(parse_minutes(slots["limit"]), title=slots["title"])
+            elif match["intent"] == "course_start_after":
+                sections = index.starts_after(parse_minutes(slots["limit"]), title=slots["title"])
+            elif match["intent"] == "course_after":
+                sections = self.sections_right_after(slots["before"], title=slots["title"])
+            elif match["intent"] == "day_accessible":
+                on_day = index.within(slots["day"])
+                sections = [index.by_uri[u] for u in self.get_accessibility().accessible([s.uri for s in on_day])]
+            else:
+                return match
+        return dict(match, sparql=match["sparql"].replace(VALUES_SLOT, self.schedule_values(sections), 1))
+
+    # --- Visualization (one pass over the graph, HTML cached per graph version) ---
+
+    def get_network_view(self):
+        if self._network is None:
+            from visualization import NetworkView  # pyvis is only needed by the Visualization page
+            with self.metrics.span("network_build"):
+                self._network = NetworkView(self.g)
+        return self._network
+
+    def network_page(self, expanded=(), focus=None, hops=2):
+        """
+        Bounded visualization page (see NetworkView.page): the campus overview with the
+        `expanded` buildings/rooms opened, or the `hops`-hop neighbourhood of `focus`.
+        """
+        with self.pinned():
+            view = self.get_network_view()
+            with self.metrics.span("network_render"):
+                return view.page(expanded=expanded, focus=focus, hops=hops)
+
+    def network_html(self, **page):
+        return self.network_page(**page)["html"]
+
+    # --- Schema introspection (cached per graph version) ---
+
+    def _introspection(self):
+        # Stored on the version itself, so a reader pinned to an older version keeps its own
+        state = self._state()
+        if state._schema is None:
+            state._schema = introspect(state.g)
+        return state._schema
+
+    def get_schema_summary(self):
+        """Introspects the graph to find used predicates and classes."""
+        return self._introspection()["summary"]
 
-        
     def get_sample_labels(self):
         """Fetches a few sample labels to help the LLM understand the data content."""
-        try:
-            q = "SELECT DISTINCT ?label WHERE { ?s rdfs:label ?label } LIMIT 10"
-            labels = [str(row.label) for row in self.g.query(q)]
-            return ", ".join(labels)
-        except:
-            return "No labels found."
+        return self._introspection()["labels"]
+
+    def _backend(self):
+        # Fails fast: without a backend there is nothing to retry
+        if self.llm is None:
+            raise RuntimeError(f"No LLM backend configured ({self.llm_error or 'backend=None'})")
+        return self.llm
+
+    def _call_llm(self, prompt):
+        llm = self._backend()
+        return call_with_retry(lambda: llm.generate(prompt), self.llm_retries, self.llm_backoff)
+
+    async def _acall_llm(self, prompt):
+        llm = self._backend()
+        return await acall_with_retry(lambda: llm.agenerate(prompt), self.llm_retries, self.llm_backoff)
 
     def generate_sparql(self, user_query):
-        schema_info = self.get_schema_summary()
-        sample_labels = self.get_sample_labels()
-        
+        with self.metrics.span("generate_sparql"):
+            # Repeated questions skip the LLM entirely
+            cached = self._cached_sparql(user_query)
+            if cached is not None:
+                return cached
+            prompt = self._sparql_prompt(user_query)
+            self._record_prompt("sparql", prompt)
+            result, problem = self._check_response(self._call_llm(prompt))
+            if problem is not None:
+                # Only what the local repairs could not fix costs a second round trip
+                prompt = self._repair_prompt(user_query, result, problem)
+                result, problem = self._check_response(self._call_llm(prompt))
+            return self._finish_sparql(user_query, result, problem)
+
+    async def agenerate_sparql(self, user_query):
+        with self.metrics.span("generate_sparql"):
+            cached = self._cached_sparql(user_query)
+            if cached is not None:
+                return cached
+            prompt = self._sparql_prompt(user_query)
+            self._record_prompt("sparql", prompt)
+            result, problem = self._check_response(await self._acall_llm(prompt))
+            if problem is not None:
+                prompt = self._repair_prompt(user_query, result, problem)
+                result, problem = self._check_response(await self._acall_llm(prompt))
+            return self._finish_sparql(user_query, result, problem)
+
+    def _cached_sparql(self, user_query):
+        cached = self.sparql_cache.get(user_query)
+        hit = cached is not None
+        self.metrics.incr("sparql_cache_hits" if hit else "sparql_cache_misses")
+        self.metrics.annotate(sparql_cache_hit=hit)
+        return cached
+
+    def _record_prompt(self, kind, prompt):
+        self.metrics.incr("llm_calls")
+        self.metrics.annotate(**{f"{kind}_prompt_chars": len(prompt),
+                                 f"{kind}_prompt_tokens": estimate_tokens(prompt)})
+
+    def _sparql_prompt(self, user_query, focused=True):
+        """SPARQL prompt with the question-specific context (prompt_context.py); focused=False: everything."""
+        with self.metrics.span("prompt_context"):
+            context = self._sparql_context(user_query, focused)
+        prompt = self._format_sparql_prompt(user_query, context)
+        if context["focused"]:
+            # What the full context would have cost, to measure the savings;
+            # questions touching every topic can end up no smaller, then the full one is sent
+            full = self._format_sparql_prompt(user_query, self._sparql_context(user_query, False))
+            full_tokens = estimate_tokens(full)
+            self.metrics.annotate(sparql_prompt_full_tokens=full_tokens)
+            if estimate_tokens(prompt) >= full_tokens:
+                prompt, context = full, dict(context, focused=False)
+        self.metrics.annotate(sparql_context="focused" if context["focused"] else "full",
+                              linked_entities=len(context["entities"]))
+        return prompt
+
+    def _sparql_context(self, user_query, focused):
+        return sparql_context(self.g, self.get_label_index(), user_query, self.get_schema_summary(),
+                              self.get_sample_labels(), focused=focused)
+
+    def _format_sparql_prompt(self, user_query, context):
         prompt = f"""
         You are an expert SPARQL generator for an RDF Knowledge Graph about SNU Barrier-Free Course Registration.
         NamespacePrefix: : <{BASE_URI}>
         Prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#>
         
-        Current Graph Schema:
-        {schema_info}
+        Current Graph Schema (relevant part):
+{textwrap.indent(context["schema"], " " * 8)}
         
-        Sample Labels in Graph (Context):
-        {sample_labels}
+        Entities mentioned in the question (or sample labels):
+{textwrap.indent(context["labels"], " " * 8)}
         
         Task:
         1. Analyze the user's natural language question.
@@ -87,80 +692,121 @@ class GraphAgent:
         ---
         ### DATA DICTIONARY & RULES ###
         
-        1. **TIME (수업 시간)**
-           - `:StartTime`, `:EndTime`: Predicates holding time as "HH:mm" strings (e.g., "09:00", "14:50").
-           - **Comparison:** Use string comparison `FILTER(?start >= "10:00")`.
-           - **Logic:** "Ends before 10" -> `?s :EndTime ?end . FILTER(?end < "10:00")`.
-           
-        2. **ACCESSIBILITY (휠체어/이동약자)**
-           - **Reference:** Wheelchair users need `Lift` (F_002) or `Ramp` (F_003).
-           - **Hazards:** `Curb` (H_001), `Steep` (H_004) are bad.
-           - **Strategy:** When asked "where to take a class" for wheelchair, check the Building's facilities using `:hasFacility`.
-           - **Pattern:** `OPTIONAL {{ ?bldg :hasFacility ?fac . ?fac rdfs:label ?facLabel }}` to show what is available.
-           
-        3. **ROUTES (경로)**
-           - **Entity:** `:Route` (Class `C004`).
-           - **Direction:** `Building` --[:isEndpointOf]--> `Route`. (e.g., `?bldg :isEndpointOf ?route`)
-           - **Strategy:** "How to go from A to B" -> Find a common `:Route` `?r` shared by both `?A` and `?B`.
-           - **Pattern:** `?bldgA :isEndpointOf ?r . ?bldgB :isEndpointOf ?r`.
-           - **Output:** MUST return the route URI `?r` (or `?route`) to display maps. Also return label and distance.
-        
-        4. **SEARCH STRATEGY**
-           - **Labels:** ALWAYS search against `rdfs:label` using `FILTER(REGEX(?label, 'keyword', 'i'))`.
-           - **URIs:** NEVER assume keywords exist in the URI.
+{textwrap.indent(context["rules"], " " * 8)}
         
         ---
         ### COMPETENCY QUESTIONS ###
         
-        Q1. "10시 전에 끝나는 '수학1' 수업 있어?"
-        -> {{
-            "reasoning": "Find '수학1' courses. Check their :EndTime. Filter where EndTime < '10:00'.",
-            "sparql": "SELECT ?courseName ?classRoom ?endTime WHERE {{ ?course :title '수학1' ; rdfs:label ?courseName ; :EndTime ?endTime ; :isHeldAt ?room . ?room rdfs:label ?classRoom . FILTER(?endTime < '10:00') }}"
-           }}
-           
-        Q2. "휠체어 타는데 '수학1' 어디서 들어야 해?"
-        -> {{
-            "reasoning": "Find '수학1' rooms and their buildings. Then OPTIONALLY retrieve facility labels to see if they have 'Lift' or 'Ramp'.",
-            "sparql": "SELECT ?bldgName ?facLabel WHERE {{ ?course :title '수학1' ; :isHeldAt ?room . ?room :locatedIn ?bldg . ?bldg rdfs:label ?bldgName . OPTIONAL {{ ?bldg :hasFacility ?fac . ?fac rdfs:label ?facLabel }} }}"
-           }}
-           
-        Q3. "25동에서 500동 어떻게 가?"
-        -> {{
-            "reasoning": "Find a Route entity ?route where both 25동 and 500동 are endpoints. RETURN ?route URI for map display.",
-            "sparql": "SELECT ?route ?routeLabel ?dist WHERE {{ ?bldgA rdfs:label '25동' . ?bldgB rdfs:label '500동' . ?bldgA :isEndpointOf ?route . ?bldgB :isEndpointOf ?route . ?route rdfs:label ?routeLabel ; :distance ?dist . }}"
-           }}
+{textwrap.indent(context["examples"], " " * 8)}
            
         User Question: "{user_query}"
         JSON:
         """
-        
-        response = self.model.generate_content(prompt)
-        text = response.text.replace("```json", "").replace("```", "").strip()
-        try:
-            import json
-            return json.loads(text)
-        except:
-            # Fallback if not valid JSON
-            return {"reasoning": "Error parsing JSON", "sparql": text}
+        return prompt
 
-    def execute_query(self, sparql):
-        print(f"Executing: {sparql}")
-        try:
-            results = self.g.query(sparql)
-            res_list = []
-            if results.vars:
-                columns = [str(v) for v in results.vars]
-                for row in results:
-                    res_list.append([str(val) for val in row])
-                return pd.DataFrame(res_list, columns=columns)
+    def get_sparql_repairer(self):
+        predicates = [p[1:] for p in summary_items(self.get_schema_summary(), "Predicates")]
+        return SparqlRepairer(self.g, self.get_label_index(), predicates, self.g.namespaces())
+
+    def _check_response(self, text):
+        """
+        The generator's reply, validated and repaired locally (sparql_repair.py).
+        Returns (result, problem); problem is None when the plan can be run as is.
+        """
+        with self.metrics.span("validate_sparql"):
+            result, fixes = parse_llm_json(text)
+            if not isinstance(result, dict):
+                return {"reasoning": "", "sparql": text}, "The reply is neither JSON nor a SPARQL query"
+            route = result.get("route")
+            if isinstance(route, dict) and route.get("from") and route.get("to"):
+                problem = None
             else:
-                # Boolean ASK output
-                return pd.DataFrame([bool(results)], columns=["Result"])
-        except Exception as e:
-            return pd.DataFrame([f"Error: {e}"], columns=["Error"])
+                sparql, query_fixes, problem = self.get_sparql_repairer().repair(str(result.get("sparql") or ""))
+                result = dict(result, sparql=sparql)
+                fixes += query_fixes
+            if fixes:
+                self.metrics.incr("sparql_local_fixes", len(fixes))
+                self.metrics.annotate(sparql_fixes=fixes)
+            return result, problem
 
-    def generate_answer(self, user_query, sparql, df, reasoning):
-        data_str = df.to_string() if df is not None and not df.empty else "No results found."
+    def _repair_prompt(self, user_query, result, problem):
+        self.metrics.incr("sparql_repair_calls")
+        predicates = [p[1:] for p in summary_items(self.get_schema_summary(), "Predicates")]
+        prompt = repair_prompt(user_query, result.get("sparql", ""), problem, predicates)
+        self._record_prompt("repair", prompt)
+        return prompt
+
+    def _finish_sparql(self, user_query, result, problem):
+        # Only validated plans are cached; a plan still broken carries the problem to _run_step
+        if problem is None:
+            self.sparql_cache.put(user_query, result)
+        else:
+            self.metrics.incr("sparql_unrepaired")
+            result = dict(result, error=problem)
+        self.metrics.annotate(sparql_valid=problem is None)
+        return result
+
+    def execute_query(self, sparql, bindings=None):
+        print(f"Executing: {sparql}")
+        key = normalize_sparql(sparql)
+        # Template queries share one prepared query; the bindings are part of the result key
+        result_key = key
+        if bindings:
+            result_key += "|" + "|".join(f"{k}={v.n3()}" for k, v in sorted(bindings.items()))
+        version = self.version
+        with self.metrics.span("execute_query"):
+            cached = self.query_cache.get_result(result_key, version)
+            self.metrics.incr("result_cache_hits" if cached is not None else "result_cache_misses")
+            if cached is not None:
+                self.metrics.annotate(result_cache_hit=True, rows=len(cached))
+                return cached.copy()
+            try:
+                # Label REGEX filters become VALUES over the labels found in the index
+                with self.metrics.span("label_index"):
+                    key, rewritten = rewrite_label_filters(key, self.get_label_index())
+                if rewritten:
+                    self.metrics.incr("label_filters_rewritten", rewritten)
+                # Reuse the parsed/algebrized query for repeated SPARQL text
+                query = self.query_cache.prepare(key, dict(self.g.namespaces()))
+                results = self.g.query(query, initBindings=bindings)
+                res_list = []
+                if results.vars:
+                    columns = [str(v) for v in results.vars]
+                    for row in results:
+                        res_list.append([str(val) for val in row])
+                    df = pd.DataFrame(res_list, columns=columns)
+                else:
+                    # Boolean ASK output
+                    df = pd.DataFrame([bool(results)], columns=["Result"])
+            except Exception as e:
+                self.metrics.incr("query_errors")
+                self.metrics.annotate(result_cache_hit=False, rows=0, query_error=str(e))
+                return pd.DataFrame([f"Error: {e}"], columns=["Error"])
+            self.metrics.annotate(result_cache_hit=False, rows=len(df))
+            self.query_cache.put_result(result_key, version, df)
+            return df.copy()
+
+    def _run_step(self, step1):
+        """Runs the LLM's plan: a SPARQL query, or a routing request. Returns (sparql_display, df)."""
+        route = step1.get("route")
+        if isinstance(route, dict) and route.get("from") and route.get("to"):
+            return route_display(route["from"], route["to"]), self.route_frame(route["from"], route["to"])
+        sparql = step1.get("sparql", "")
+        if step1.get("error"):
+            return sparql, pd.DataFrame([f"Error: {step1['error']}"], columns=["Error"])
+        return sparql, self.execute_query(sparql)
+
+    def cache_stats(self):
+        """Hit rates of the question->SPARQL and query/result caches (for sizing)."""
+        return {
+            "sparql_cache": self.sparql_cache.stats(),
+            "query_cache": self.query_cache.stats(),
+        }
+
+    def _answer_prompt(self, user_query, df, reasoning, max_rows=MAX_ROWS):
+        # Large results are cut to max_rows rows + a summary line (max_rows=None: every row)
+        data_str, truncated = frame_context(df, max_rows)
+        self.metrics.annotate(answer_rows_truncated=truncated)
         
         prompt = f"""
         You are a helpful assistant for SNU students.
@@ -180,17 +826,52 @@ class GraphAgent:
           Instead, simply say "다음과 같은 경로가 있습니다 (거리: X m)." because the system will show a map image automatically.
         - General: Be helpful and concise.
         """
-        response = self.model.generate_content(prompt)
-        return response.text
+        return prompt
+
+    def _error_answer(self, df):
+        """Answer for a plan that could not be run; an error frame is not worth an LLM call."""
+        if df is not None and list(df.columns) == ["Error"]:
+            self.metrics.incr("answer_llm_skipped")
+            return QUERY_ERROR_ANSWER
+        return None
+
+    def generate_answer(self, user_query, sparql, df, reasoning):
+        error_answer = self._error_answer(df)
+        if error_answer is not None:
+            return error_answer
+        with self.metrics.span("generate_answer"):
+            prompt = self._answer_prompt(user_query, df, reasoning)
+            self._record_prompt("answer", prompt)
+            return self._call_llm(prompt)
+
+    def generate_answer_stream(self, user_query, sparql, df, reasoning):
+        """Same as generate_answer, but yields text chunks as Gemini produces them."""
+        error_answer = self._error_answer(df)
+        if error_answer is not None:
+            yield error_answer
+            return
+        prompt = self._answer_prompt(user_query, df, reasoning)
+        self._record_prompt("answer", prompt)
+        # Includes the time the caller spends rendering chunks between yields
+        with self.metrics.span("generate_answer"):
+            yield from self._backend().stream(prompt)
 
     def process_query(self, user_query):
-        # 1. Generate SPARQL
+        with self.metrics.query(user_query), self.pinned():
+            return self._process_query(user_query)
+
+    def _process_query(self, user_query):
+        # 0. Known question shapes are answered locally (no LLM round trips)
+        fast = self.answer_from_template(user_query)
+        if fast is not None:
+            return fast
+        
+        # 1. Generate SPARQL (or a routing request)
         step1 = self.generate_sparql(user_query)
-        sparql = step1.get("sparql", "")
         reasoning = step1.get("reasoning", "")
         
         # 2. Execute
-        df = self.execute_query(sparql)
+        sparql, df = self._run_step(step1)
         
         # 3. Generate Answer
         final_answer = self.generate_answer(user_query, sparql, df, reasoning)
@@ -203,6 +884,106 @@ class GraphAgent:
             "answer": final_answer
         }
 
+    def process_query_stream(self, user_query):
+        """
+        Streaming variant of process_query. Yields pipeline events:
+            {"type": "sparql", "reasoning", "sparql"}  SPARQL ready
+            {"type": "data", "data"}                   result rows ready
+            {"type": "answer", "text"}                 answer chunk (repeated)
+            {"type": "done", "result"}                 same dict process_query returns
+        """
+        with self.metrics.query(user_query, kind="stream"), self.pinned():
+            yield from self._process_query_stream(user_query)
+
+    def _process_query_stream(self, user_query):
+        fast = self.answer_from_template(user_query)
+        if fast is not None:
+            yield {"type": "sparql", "reasoning": fast["reasoning"], "sparql": fast["sparql"]}
+            yield {"type": "data", "data": fast["data"]}
+            yield {"type": "answer", "text": fast["answer"]}
+            yield {"type": "done", "result": fast}
+            return
+        
+        step1 = self.generate_sparql(user_query)
+        sparql, df = self._run_step(step1)
+        reasoning = step1.get("reasoning", "")
+        yield {"type": "sparql", "reasoning": reasoning, "sparql": sparql}
+        yield {"type": "data", "data": df}
+        
+        chunks = []
+        for text in self.generate_answer_stream(user_query, sparql, df, reasoning):
+            chunks.append(text)
+            yield {"type": "answer", "text": text}
+        
+        yield {"type": "done", "result": {
+            "question": user_query,
+            "reasoning": reasoning,
+            "sparql": sparql,
+            "data": df,
+            "answer": "".join(chunks)
+        }}
+
+    # --- Async / batched API ---
+
+    async def aprocess_query(self, user_query):
+        """Async process_query: LLM calls are awaited (with retry/backoff), graph work runs inline."""
+        with self.metrics.query(user_query, kind="async"), self.pinned():
+            return await self._aprocess_query(user_query)
+
+    async def _aprocess_query(self, user_query):
+        fast = self.answer_from_template(user_query)
+        if fast is not None:
+            return fast
+        
+        step1 = await self.agenerate_sparql(user_query)
+        sparql, df = self._run_step(step1)
+        reasoning = step1.get("reasoning", "")
+        final_answer = self._error_answer(df)
+        if final_answer is None:
+            with self.metrics.span("generate_answer"):
+                prompt = self._answer_prompt(user_query, df, reasoning)
+                self._record_prompt("answer", prompt)
+                final_answer = await self._acall_llm(prompt)
+        
+        return {
+            "question": user_query,
+            "reasoning": reasoning,
+            "sparql": sparql,
+            "data": df,
+            "answer": final_answer
+        }
+
+    async def aprocess_batch(self, questions, concurrency=4):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_one(question):
+            async with semaphore:
+                try:
+                    return await self.aprocess_query(question)
+                except Exception as e:
+                    return {"question": question, "reasoning": "", "sparql": "",
+                            "data": None, "answer": "", "error": str(e)}
+
+        return await asyncio.gather(*(run_one(q) for q in questions))
+
+    def process_batch(self, questions, concurrency=4):
+        """
+        Runs many questions with at most `concurrency` in flight (LLM calls overlap).
+        Results are returned in input order; failures carry an "error" key.
+        Used to pre-warm the caches and for offline regression batches.
+        """
+        return asyncio.run(self.aprocess_batch(questions, concurrency))
+
+
+def _versioned(name):
+    return property(lambda self: getattr(self._state(), name),
+                    lambda self, value: setattr(self._state(), name, value))
+
+
+# Graph, version number and derived indexes belong to a GraphVersion
+for _name in ("g", "store", "version") + DERIVED:
+    setattr(GraphAgent, _name, _versioned(_name))
+
 
 if __name__ == "__main__":
     agent = GraphAgent()
@@ -0,0 +1,164 @@
+"""
+Write-ahead journal of the live maintenance state (facility toggles, fault reports).
+
+The loaded graph (TTL / snapshot) is never written at runtime. Every published change
+is appended here as one JSON line and replayed on top of it at startup:
+
+    {"op": "change", "added": [[s, p, o], ...], "removed": [...]}   terms in N3
+    {"op": "reset"}                                                  reset_changes()
+    {"op": "report", "text": "...", "ts": 1760000000.0}
+    {"op": "checkpoint", "added": [...], "removed": [...], "reports": [...]}
+
+Lines are flushed to the OS as they are written (a crash or restart of the process
+loses nothing) and fsync'ed in batches at most SYNC_INTERVAL seconds apart (a power
+loss loses at most that window). Once COMPACT_EVERY records pile up, the file is
+rewritten as a single checkpoint of the current state. A line torn by a crash
+mid-write is dropped on replay.
+"""
+import json
+import os
+import threading
+import time
+
+from rdflib.util import from_n3
+
+JOURNAL_SUFFIX = ".journal"
+SYNC_INTERVAL = 0.2
+COMPACT_EVERY = 1000
+
+
+def journal_path(ttl_path):
+    """data/knowledge_graph.ttl -> data/knowledge_graph.journal"""
+    root, _ = os.path.splitext(ttl_path)
+    return root + JOURNAL_SUFFIX
+
+
+def _encode(triples):
+    return [[term.n3() for term in triple] for triple in triples]
+
+
+def _decode(rows):
+    return [tuple(from_n3(term) for term in row) for row in rows]
+
+
+class Journal:
+    def __init__(self, path, sync_interval=SYNC_INTERVAL, compact_every=COMPACT_EVERY):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.compact_every = compact_every
+        self.records = 0  # since the last checkpoint
+        self._lock = threading.Lock()
+        self._file = None
+        self._last_sync = 0.0
+        self._timer = None  # pending batched fsync
+
+    # --- startup ---
+
+    def replay(self):
+        """
+        Folds the journal into the state it describes: (added, removed, reports).
+        Each triple ends up as its last operation left it, so applying added/removed
+        to the loaded graph is the same as replaying every record in order.
+        """
+        present, reports, self.records = {}, [], 0
+        if not os.path.exists(self.path):
+            return [], [], reports
+        good = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("unterminated line")
+                    record = json.loads(line)
+                except ValueError:
+                    print(f"Dropping torn journal tail at byte {good} of {self.path}")
+                    break
+                good += len(line)
+                self.records += 1
+                op = record["op"]
+                if op == "checkpoint":
+                    present = {}
+                    reports = list(record["reports"])
+                if op in ("change", "checkpoint"):
+                    present.update((t, False) for t in _decode(record["removed"]))
+                    present.update((t, True) for t in _decode(record["added"]))
+                elif op == "reset":
+                    present = {}
+                elif op == "report":
+                    reports.append({"text": record["text"], "ts": record["ts"]})
+        if good < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(good)
+        added = [t for t, on in present.items() if on]
+        removed = [t for t, on in present.items() if not on]
+        return added, removed, reports
+
+    # --- appends ---
+
+    def log_changes(self, added, removed):
+        self._append({"op": "change", "added": _encode(added), "removed": _encode(removed)})
+
+    def log_reset(self):
+        self._append({"op": "reset"})
+
+    def log_report(self, report):
+        self._append({"op": "report", "text": report["text"], "ts": report["ts"]})
+
+    def _append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+            self.records += 1
+            if time.monotonic() - self._last_sync >= self.sync_interval:
+                self._sync()
+            elif self._timer is None:
+                # Group commit: writes arriving within the interval share one fsync
+                self._timer = threading.Timer(self.sync_interval, self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _sync(self):
+        if self._file is not None:
+            os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        with self._lock:
+            self._timer = None
+            self._sync()
+
+    # --- compaction ---
+
+    @property
+    def needs_compaction(self):
+        return self.records >= self.compact_every
+
+    def compact(self, added, removed, reports):
+        """Replaces the journal by one checkpoint of the given state (atomic swap)."""
+        record = {"op": "checkpoint", "added": _encode(sorted(added)), "removed": _encode(sorted(removed)),
+                  "reports": list(reports)}
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            os.replace(tmp_path, self.path)
+            self.records = 1
+            self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
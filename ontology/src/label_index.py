@@ -0,0 +1,176 @@
+"""
+Inverted index over the entity labels (rdfs:label, :title).
+
+Labels are normalized for Korean text (NFKC, case-folded, spaces and punctuation
+dropped) so '25 동', '25동' and '25-동' are the same key. Besides the exact and
+normalized forms, every normalized label is posted under its character bigrams:
+a substring lookup intersects the postings of the keyword's bigrams and only
+verifies the few survivors, instead of running a REGEX over every labeled node.
+
+rewrite_label_filters turns the generator's
+    FILTER(REGEX(?label, 'keyword', 'i'))
+into `VALUES ?label { "label 1" "label 2" }`, i.e. an index probe. The index only
+narrows the candidates there; each one is checked against the filter's own
+semantics (raw substring, or case-folded with 'i'), so results don't change.
+"""
+import re
+import unicodedata
+
+from rdflib import Namespace, RDFS
+
+BASE_URI = "http://snu.ac.kr/barrier-free/"
+NS = Namespace(BASE_URI)
+LABEL_PREDICATES = frozenset([RDFS.label, NS.title])
+
+_PUNCT_RE = re.compile(r"[\W_]+")
+# FILTER(REGEX(?var, 'kw'[, 'i'])) / FILTER(REGEX(STR(?var), ...)) on its own
+_REGEX_FILTER_RE = re.compile(
+    r"FILTER\s*\(\s*REGEX\s*\(\s*(?:STR\s*\(\s*\?(\w+)\s*\)|\?(\w+))\s*,\s*"
+    r"(['\"])([^'\"]*)\3\s*(?:,\s*(['\"])i\5\s*)?\)\s*\)",
+    re.IGNORECASE)
+_REGEX_META = set(".^$*+?()[]{}|\\")
+
+
+def normalize_label(text):
+    """'25 동' -> '25동', 'Lift' -> 'lift'"""
+    return _PUNCT_RE.sub("", unicodedata.normalize("NFKC", str(text)).casefold())
+
+
+def _grams(norm):
+    return {norm[i:i + 2] for i in range(len(norm) - 1)}
+
+
+class LabelIndex:
+    def __init__(self, g):
+        self._subjects = {}  # label literal -> {subject}
+        self._exact = {}     # str(label) -> {label literal}
+        self._norm = {}      # normalized label -> {label literal}
+        self._grams = {}     # bigram -> {normalized label}
+        for p in LABEL_PREDICATES:
+            for s, label in g.subject_objects(p):
+                self.add(s, label)
+
+    def __len__(self):
+        return len(self._subjects)
+
+    # --- maintenance (GraphAgent._on_mutation) ---
+
+    def copy(self):
+        new = LabelIndex.__new__(LabelIndex)
+        new._subjects = {k: set(v) for k, v in self._subjects.items()}
+        new._exact = {k: set(v) for k, v in self._exact.items()}
+        new._norm = {k: set(v) for k, v in self._norm.items()}
+        new._grams = {k: set(v) for k, v in self._grams.items()}
+        return new
+
+    def add(self, subject, label):
+        subjects = self._subjects.setdefault(label, set())
+        subjects.add(subject)
+        if len(subjects) > 1:
+            return
+        self._exact.setdefault(str(label), set()).add(label)
+        norm = normalize_label(label)
+        self._norm.setdefault(norm, set()).add(label)
+        for gram in _grams(norm):
+            self._grams.setdefault(gram, set()).add(norm)
+
+    def remove(self, subject, label):
+        subjects = self._subjects.get(label)
+        if subjects is None:
+            return
+        subjects.discard(subject)
+        if subjects:
+            return
+        del self._subjects[label]
+        exact = self._exact.get(str(label), set())
+        exact.discard(label)
+        if not exact:
+            self._exact.pop(str(label), None)
+        norm = normalize_label(label)
+        labels = self._norm.get(norm, set())
+        labels.discard(label)
+        if labels:
+            return
+        self._norm.pop(norm, None)
+        for gram in _grams(norm):
+            posting = self._grams.get(gram)
+            if posting is not None:
+                posting.discard(norm)
+                if not posting:
+                    del self._grams[gram]
+
+    # --- lookups ---
+
+    def normalized_labels(self):
+        return set(self._norm)
+
+    def search(self, keyword):
+        """Label literals whose normalized form contains the normalized keyword."""
+        key = normalize_label(keyword)
+        if not key:
+            return []
+        if len(key) < 2:
+            candidates = [n for n in self._norm if key in n]
+        else:
+            postings = sorted((self._grams.get(gram, set()) for gram in _grams(key)), key=len)
+            candidates = set.intersection(*postings) if postings else set()
+            candidates = [n for n in candidates if key in n]
+        return sorted((label for n in candidates for label in self._norm[n]), key=str)
+
+    def mentions(self, text):
+        """
+        Label literals occurring in free text (normalized), longest first; a label inside
+        a longer mentioned one ('수학1' in '수학연습1') is left out.
+        """
+        norm = normalize_label(text)
+        candidates = {n for gram in _grams(norm) for n in self._grams.get(gram, ())}
+        found = sorted((n for n in candidates if n in norm), key=lambda n: (-len(n), n))
+        kept = []
+        for n in found:
+            if not any(n in longer for longer in kept):
+                kept.append(n)
+        return [label for n in kept for label in sorted(self._norm[n], key=str)]
+
+    def resolve(self, mention):
+        """
+        Entity URIs for a mention: exact label, else normalized label, else the
+        labels containing it.
+        """
+        labels = sorted(self._exact.get(mention, ()), key=lambda label: label.n3())
+        if not labels:
+            labels = sorted(self._norm.get(normalize_label(mention), ()), key=str)
+        if not labels:
+            labels = self.search(mention)
+        return sorted({s for label in labels for s in self._subjects[label]}, key=str)
+
+
+def _binds_label(sparql, var):
+    return re.search(rf"(?:rdfs:label|:title|<{re.escape(str(RDFS.label))}>)\s+\?{var}\b", sparql) is not None
+
+
+def rewrite_label_filters(sparql, index):
+    """
+    Replaces REGEX filters on label variables by VALUES over the matching labels.
+    Filters on other variables, with real regex syntax or with a keyword the index
+    cannot narrow (only spaces/punctuation) are left alone.
+    Returns (sparql, number of rewritten filters).
+    """
+    count = 0
+
+    def replace(m):
+        nonlocal count
+        var = m.group(1) or m.group(2)
+        keyword = m.group(4)
+        if _REGEX_META & set(keyword) or not normalize_label(keyword) or not _binds_label(sparql, var):
+            return m.group(0)
+        count += 1
+        if m.group(5):
+            key = keyword.casefold()
+            labels = [label for label in index.search(keyword) if key in str(label).casefold()]
+        else:
+            labels = [label for label in index.search(keyword) if keyword in str(label)]
+        if not labels:
+            return "FILTER(false)"
+        return f"VALUES ?{var} {{ {' '.join(label.n3() for label in labels)} }}"
+
+    return _REGEX_FILTER_RE.sub(replace, sparql), count
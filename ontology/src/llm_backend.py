@@ -0,0 +1,166 @@
+"""
+LLM backends for GraphAgent.
+
+GraphAgent only needs `generate`, `stream` and `agenerate`; GeminiBackend talks to
+Gemini, StubBackend is a deterministic offline stand-in (benchmarks, cache warm-up,
+nightly regression batches without API calls).
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+
+from dotenv import load_dotenv
+
+# Load env
+load_dotenv()
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+DEFAULT_MODEL_NAME = "gemini-2.0-flash"
+
+logger = logging.getLogger(__name__)
+
+
+class LLMBackend:
+    name = "base"
+
+    def generate(self, prompt):
+        raise NotImplementedError
+
+    def stream(self, prompt):
+        """Yields text chunks; backends without streaming return everything at once."""
+        yield self.generate(prompt)
+
+    async def agenerate(self, prompt):
+        return await asyncio.to_thread(self.generate, prompt)
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, model_name=DEFAULT_MODEL_NAME):
+        import google.generativeai as genai
+        if GOOGLE_API_KEY:
+            genai.configure(api_key=GOOGLE_API_KEY)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt):
+        response = self.model.generate_content(prompt)
+        return response.text
+
+    def stream(self, prompt):
+        response = self.model.generate_content(prompt, stream=True)
+        for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunk without text parts (e.g. safety metadata only)
+                continue
+            if text:
+                yield text
+
+    async def agenerate(self, prompt):
+        response = await self.model.generate_content_async(prompt)
+        return response.text
+
+
+class StubBackend(LLMBackend):
+    """
+    Deterministic offline backend. The same prompt always gives the same output,
+    after a fixed simulated latency (seconds).
+
+    - SPARQL prompts (ending in 'JSON:') get a simple label/facility lookup for the question.
+    - Answer prompts get a one-line summary of the data block.
+    """
+    name = "stub"
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def generate(self, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(prompt)
+
+    async def agenerate(self, prompt):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(prompt)
+
+    def _respond(self, prompt):
+        self.calls += 1
+        if prompt.rstrip().endswith("JSON:"):
+            return json.dumps(self._sparql_for(prompt), ensure_ascii=False)
+        m = re.search(r"And found this data:\s*(.*?)\n\s*Task:", prompt, re.S)
+        data = m.group(1).strip() if m else ""
+        if not data or data == "No results found.":
+            return "(stub) 검색 결과가 없습니다."
+        rows = max(len(data.splitlines()) - 1, 0)
+        return f"(stub) 검색 결과 {rows}건을 찾았습니다."
+
+    @staticmethod
+    def _sparql_for(prompt):
+        matches = re.findall(r'User Question: "(.*)"', prompt)
+        question = matches[-1] if matches else ""
+        bldg = re.search(r"(\d+(?:-\d+)?)\s*동", question)
+        if bldg:
+            label = f"{bldg.group(1)}동"
+            return {
+                "reasoning": f"(stub) Look up building '{label}' and its facilities.",
+                "sparql": (f"SELECT ?bldg ?facLabel WHERE {{ ?bldg rdfs:label '{label}' . "
+                           "OPTIONAL { ?bldg :hasFacility ?f . ?f rdfs:label ?facLabel } }"),
+            }
+        words = [w for w in re.findall(r"[0-9A-Za-z가-힣]+", question) if len(w) > 1]
+        keyword = words[0] if words else question[:2]
+        return {
+            "reasoning": f"(stub) Search labels containing '{keyword}'.",
+            "sparql": (f"SELECT ?s ?label WHERE {{ ?s rdfs:label ?label . "
+                       f"FILTER(REGEX(?label, '{keyword}', 'i')) }} LIMIT 20"),
+        }
+
+
+# HTTP statuses worth another attempt (plus every 5xx)
+TRANSIENT_STATUS = {408, 429}
+
+
+def is_transient(error):
+    """
+    Rate limits, server errors, timeouts and dropped connections. A bad key, a blocked
+    prompt (ValueError) or a programming error fails the same way on every attempt.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    # google.api_core errors carry the HTTP status as .code (gRPC errors have a .code() method)
+    status = getattr(error, "code", None)
+    status = getattr(error, "status_code", None if callable(status) else status)
+    return isinstance(status, int) and (status in TRANSIENT_STATUS or 500 <= status < 600)
+
+
+def call_with_retry(fn, retries=3, backoff=0.5):
+    """fn() with exponential backoff (backoff, 2*backoff, ...) between attempts on transient errors."""
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == retries or not is_transient(e):
+                raise
+            delay = backoff * (2 ** attempt)
+            logger.warning("LLM call failed (%s); retrying in %.1fs", e, delay)
+            time.sleep(delay)
+
+
+async def acall_with_retry(coro_fn, retries=3, backoff=0.5):
+    """Async version of call_with_retry; coro_fn() must return a fresh awaitable."""
+    for attempt in range(retries + 1):
+        try:
+            return await coro_fn()
+        except Exception as e:
+            if attempt == retries or not is_transient(e):
+                raise
+            delay = backoff * (2 ** attempt)
+            logger.warning("LLM call failed (%s); retrying in %.1fs", e, delay)
+            await asyncio.sleep(delay)
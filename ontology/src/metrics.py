@@ -0,0 +1,139 @@
+"""
+Per-stage instrumentation for GraphAgent.
+
+Every process_query call gets a query record (question, per-stage durations,
+prompt sizes, row counts, cache hits). Records are emitted as one JSON log line
+each (logger "graph_agent.metrics") and aggregated in memory for the
+Performance page: rolling p50/p95 per stage and the slowest recent queries.
+"""
+import contextlib
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+# Handlers and levels are left to the entry point (app.py logs these at INFO to stderr)
+logger = logging.getLogger("graph_agent.metrics")
+logger.addHandler(logging.NullHandler())
+
+# Record of the query being processed in this thread / asyncio task
+_current_record = contextvars.ContextVar("current_query_record", default=None)
+
+
+def estimate_tokens(text):
+    """
+    Rough LLM token estimate without a tokenizer (no network call):
+    ~4 ASCII characters per token, ~1.5 Hangul/other characters per token.
+    """
+    if not text:
+        return 0
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    other_chars = len(text) - ascii_chars
+    return int(round(ascii_chars / 4 + other_chars / 1.5))
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class Metrics:
+    def __init__(self, window=500, emit_logs=True):
+        self.window = window
+        self.emit_logs = emit_logs
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=window))  # stage -> durations (ms)
+        self._counters = defaultdict(int)
+        self._recent = deque(maxlen=window)  # finished query records
+
+    # --- recording ---
+
+    @contextlib.contextmanager
+    def query(self, question, kind="sync"):
+        """Scope of one process_query call; yields the record being filled."""
+        record = {"question": question, "kind": kind, "ts": time.time(), "stages": {}}
+        token = _current_record.set(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record["error"] = str(e)
+            raise
+        finally:
+            record["total_ms"] = (time.perf_counter() - start) * 1000
+            _current_record.reset(token)
+            self._finish(record)
+
+    @contextlib.contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._samples[stage].append(ms)
+            record = _current_record.get()
+            if record is not None:
+                record["stages"][stage] = record["stages"].get(stage, 0.0) + ms
+
+    def annotate(self, **fields):
+        """Attaches fields (prompt size, rows, cache hit...) to the current query record."""
+        record = _current_record.get()
+        if record is not None:
+            record.update(fields)
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self._counters[name] += n
+
+    def _finish(self, record):
+        with self._lock:
+            self._samples["total"].append(record["total_ms"])
+            self._counters["queries"] += 1
+            if "error" in record:
+                self._counters["errors"] += 1
+            self._recent.append(record)
+        if self.emit_logs:
+            logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+    # --- aggregation (Performance page) ---
+
+    def stage_stats(self):
+        """[{stage, n, p50_ms, p95_ms, max_ms}] over the rolling window."""
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+        return [
+            {
+                "stage": stage,
+                "n": len(values),
+                "p50_ms": _percentile(values, 0.50),
+                "p95_ms": _percentile(values, 0.95),
+                "max_ms": values[-1] if values else 0.0,
+            }
+            for stage, values in samples.items()
+        ]
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def slowest(self, n=10):
+        with self._lock:
+            records = list(self._recent)
+        return sorted(records, key=lambda r: r["total_ms"], reverse=True)[:n]
+
+    def recent(self, n=20):
+        with self._lock:
+            return list(self._recent)[-n:][::-1]
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counters.clear()
+            self._recent.clear()
@@ -0,0 +1,64 @@
+"""
+Multi-version concurrency for the GraphAgent shared by every Streamlit session.
+
+A GraphVersion is one published state: the graph view (base + delta, see overlay.py)
+plus the indexes derived from it, which are built lazily. A published version is
+never modified:
+
+    - readers pin the latest version for a whole process_query (GraphAgent.pinned),
+      so every step of one answer sees the same graph
+    - writers fork the latest version under a lock, apply their triples to the fork
+      (indexes that are patched in place are copied first, once per fork) and publish
+      it by swapping a single reference
+
+A chat query therefore never sees half of a maintenance change and never waits for one.
+"""
+import contextvars
+
+# Indexes derived from a version's graph (GraphAgent attributes of the same name)
+DERIVED = ("_templates", "_router", "_travel", "_labels", "_spatial", "_sections", "_schedule", "_access",
+           "_network", "_schema")
+
+# Version pinned by the current thread / asyncio task
+_pinned = contextvars.ContextVar("pinned_graph_version", default=None)
+
+
+class GraphVersion:
+    def __init__(self, owner, g, store, version):
+        self.owner = owner  # the GraphAgent publishing it
+        self.g = g
+        self.store = store
+        self.version = version
+        for name in DERIVED:
+            setattr(self, name, None)
+        self._owned = set()  # derived indexes already copied by this (unpublished) fork
+
+    def fork(self):
+        """Writable copy: own delta, indexes shared until written (see writable)."""
+        g, store = self.store.fork()
+        new = GraphVersion(self.owner, g, store, self.version)
+        for name in DERIVED:
+            setattr(new, name, getattr(self, name))
+        return new
+
+    def writable(self, name):
+        """Derived index `name`, copied on first write so published versions stay untouched."""
+        value = getattr(self, name)
+        if value is not None and name not in self._owned:
+            value = value.copy()
+            setattr(self, name, value)
+            self._owned.add(name)
+        return value
+
+
+def pinned_version(owner):
+    version = _pinned.get()
+    return version if version is not None and version.owner is owner else None
+
+
+def pin(version):
+    return _pinned.set(version)
+
+
+def unpin(token):
+    _pinned.reset(token)
@@ -0,0 +1,124 @@
+"""
+Copy-on-write view over the loaded knowledge graph.
+
+OverlayStore wraps the graph loaded from the snapshot/TTL (the base, never written)
+and keeps only the maintenance changes as a delta: triples added on top of the base
+and base triples removed. `Graph(store=OverlayStore(base))` answers SPARQL over
+base + delta, so there is one copy of the data instead of a live graph plus a
+pristine copy. With an empty delta, triples() hands out the base store's iterator
+unchanged.
+"""
+from rdflib import Graph
+from rdflib.store import Store
+
+
+def _matches(triple, pattern):
+    return all(want is None or want == have for have, want in zip(triple, pattern))
+
+
+class OverlayStore(Store):
+    context_aware = False
+    formula_aware = False
+    graph_aware = False
+    transaction_aware = False
+
+    def __init__(self, base):
+        super().__init__()
+        self.base = base  # rdflib Graph, read only
+        self._base_store = base.store
+        self.added = set()
+        self.removed = set()
+        self._added_by = ({}, {}, {})  # subject / predicate / object -> {triple}
+
+    # --- delta ---
+
+    def add(self, triple, context=None, quoted=False):
+        if triple in self.removed:
+            self.removed.discard(triple)
+        elif triple not in self.added and not self._in_base(triple):
+            self.added.add(triple)
+            for index, term in zip(self._added_by, triple):
+                index.setdefault(term, set()).add(triple)
+        super().add(triple, context, quoted)
+
+    def remove(self, pattern, context=None):
+        for triple in [t for t, _ in self.triples(pattern)]:
+            if triple in self.added:
+                self.added.discard(triple)
+                for index, term in zip(self._added_by, triple):
+                    index[term].discard(triple)
+                    if not index[term]:
+                        del index[term]
+            else:
+                self.removed.add(triple)
+        super().remove(pattern, context)
+
+    def fork(self):
+        """Same base, copy of the delta: (graph, store)."""
+        store = OverlayStore(self.base)
+        store.added, store.removed = set(self.added), set(self.removed)
+        store._added_by = tuple({term: set(ts) for term, ts in index.items()} for index in self._added_by)
+        return _graph(store), store
+
+    def reset(self):
+        """Drops every change; the view is the base graph again."""
+        self.added.clear()
+        self.removed.clear()
+        for index in self._added_by:
+            index.clear()
+
+    def _in_base(self, triple):
+        return triple in self.base
+
+    def _added_matching(self, pattern):
+        for index, term in zip(self._added_by, pattern):
+            if term is not None:
+                return [t for t in index.get(term, ()) if _matches(t, pattern)]
+        return list(self.added)
+
+    # --- reads ---
+
+    def triples(self, pattern, context=None):
+        base = self._base_store.triples(pattern, self.base)
+        if not self.added and not self.removed:
+            return base
+        return self._overlay_triples(base, pattern)
+
+    def _overlay_triples(self, base, pattern):
+        removed = self.removed
+        for triple, contexts in base:
+            if triple not in removed:
+                yield triple, contexts
+        for triple in self._added_matching(pattern):
+            yield triple, iter(())
+
+    def __len__(self, context=None):
+        return len(self.base) + len(self.added) - len(self.removed)
+
+    def contexts(self, triple=None):
+        return iter(())
+
+    # --- namespaces are shared with the base ---
+
+    def bind(self, prefix, namespace, override=True):
+        return self._base_store.bind(prefix, namespace, override=override)
+
+    def namespace(self, prefix):
+        return self._base_store.namespace(prefix)
+
+    def prefix(self, namespace):
+        return self._base_store.prefix(namespace)
+
+    def namespaces(self):
+        return self._base_store.namespaces()
+
+
+def _graph(store):
+    # Prefixes are already bound in the base store
+    return Graph(store=store, identifier=store.base.identifier, bind_namespaces="none")
+
+
+def overlay_graph(base):
+    """Graph view of base + an empty delta: (graph, store)."""
+    store = OverlayStore(base)
+    return _graph(store), store
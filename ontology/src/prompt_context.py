@@ -0,0 +1,163 @@
+"""
+Question-specific context for the LLM prompts.
+
+Instead of every predicate, ten arbitrary labels and all rules/examples, the SPARQL
+prompt gets:
+
+    entities    labels mentioned in the question (LabelIndex.mentions) with their URI/class
+    predicates  the predicates around those entities plus the ones of the detected topics
+    rules       the rule blocks of the detected topics (time / accessibility / route)
+    examples    the competency examples of those topics
+
+A question with no linked entity and no topic gets the full context. Result frames are
+cut to MAX_ROWS rows (long cells shortened) plus a one-line summary before they reach
+the answer prompt.
+"""
+from rdflib import Namespace
+
+from schema import summary_items
+from templates import (TemplateMatcher, FACILITY_KEYWORDS, ROUTE_WORDS, NEAR_WORDS, WHEELCHAIR_WORDS,
+                       END_WORDS, START_WORDS, BEFORE_WORDS, AFTER_WORDS, FOLLOW_WORDS)
+
+BASE_URI = "http://snu.ac.kr/barrier-free/"
+NS = Namespace(BASE_URI)
+
+MAX_ENTITIES = 8       # distinct mentioned labels
+MAX_URIS_PER_LABEL = 3  # e.g. the sections sharing one course title
+MAX_ROWS = 20
+MAX_CELL_CHARS = 60
+
+TOPIC_WORDS = {
+    "time": END_WORDS + START_WORDS + BEFORE_WORDS + AFTER_WORDS + FOLLOW_WORDS + ["시간", "요일", "공강"],
+    "access": WHEELCHAIR_WORDS + [w for _, words in FACILITY_KEYWORDS.values() for w in words]
+              + ["시설", "어디서", "들어야", "위험"],
+    "route": ROUTE_WORDS + NEAR_WORDS + ["거리", "미터"],
+}
+TOPIC_PREDICATES = {
+    "time": [":title", ":StartTime", ":EndTime", ":startMinute", ":endMinute", ":dayMask", ":dayOfWeek",
+             ":isHeldAt"],
+    "access": [":title", ":isHeldAt", ":isLocatedIn", ":hasFacility", ":hasHazard"],
+    "route": [":isEndpointOf", ":distance", ":getLat", ":getLong", ":hasHazard"],
+}
+ALWAYS_PREDICATES = [":instanceOf"]
+
+RULES = {
+    "time": """1. **TIME (수업 시간)**
+   - `:StartTime`, `:EndTime`: Predicates holding time as "HH:mm" strings (e.g., "09:00", "14:50").
+   - **Comparison:** Use string comparison `FILTER(?start >= "10:00")`.
+   - **Logic:** "Ends before 10" -> `?s :EndTime ?end . FILTER(?end < "10:00")`.
+   - **Numeric:** `:startMinute`, `:endMinute` are integer minutes since midnight (10:00 -> 600);
+     `:dayMask` is a weekday bitmask (월=1, 화=2, 수=4, 목=8, 금=16).""",
+    "access": """2. **ACCESSIBILITY (휠체어/이동약자)**
+   - **Reference:** Wheelchair users need `Lift` (F_002) or `Ramp` (F_003).
+   - **Hazards:** `Curb` (H_001), `Steep` (H_004) are bad.
+   - **Strategy:** When asked "where to take a class" for wheelchair, check the Building's facilities using `:hasFacility`.
+   - **Pattern:** `OPTIONAL { ?bldg :hasFacility ?fac . ?fac rdfs:label ?facLabel }` to show what is available.""",
+    "route": """3. **ROUTES (경로)**
+   - **Entity:** `:Route` (Class `C004`).
+   - **Direction:** `Building` --[:isEndpointOf]--> `Route`. (e.g., `?bldg :isEndpointOf ?route`)
+   - **Strategy:** "How to go from A to B" -> DO NOT write SPARQL. A routing engine finds multi-hop,
+     wheelchair-accessible paths. Return `"route": {"from": "<building label>", "to": "<building label>"}`
+     instead of `"sparql"`.
+   - **Numbers:** `:distance` (metres), `:getLat`, `:getLong` are xsd:float literals, e.g. `FILTER(?dist < 300)`.""",
+    "search": """4. **SEARCH STRATEGY**
+   - **Labels:** ALWAYS search against `rdfs:label` using `FILTER(REGEX(?label, 'keyword', 'i'))`.
+   - **URIs:** NEVER assume keywords exist in the URI.""",
+}
+
+EXAMPLES = {
+    "time": """Q1. "10시 전에 끝나는 '수학1' 수업 있어?"
+-> {
+    "reasoning": "Find '수학1' courses. Check their :EndTime. Filter where EndTime < '10:00'.",
+    "sparql": "SELECT ?courseName ?classRoom ?endTime WHERE { ?course :title '수학1' ; rdfs:label ?courseName ; :EndTime ?endTime ; :isHeldAt ?room . ?room rdfs:label ?classRoom . FILTER(?endTime < '10:00') }"
+   }""",
+    "access": """Q2. "휠체어 타는데 '수학1' 어디서 들어야 해?"
+-> {
+    "reasoning": "Find '수학1' rooms and their buildings. Then OPTIONALLY retrieve facility labels to see if they have 'Lift' or 'Ramp'.",
+    "sparql": "SELECT ?bldgName ?facLabel WHERE { ?course :title '수학1' ; :isHeldAt ?room . ?room :isLocatedIn ?bldg . ?bldg rdfs:label ?bldgName . OPTIONAL { ?bldg :hasFacility ?fac . ?fac rdfs:label ?facLabel } }"
+   }""",
+    "route": """Q3. "25동에서 500동 어떻게 가?"
+-> {
+    "reasoning": "Route question from 25동 to 500동. Delegate to the routing engine.",
+    "route": {"from": "25동", "to": "500동"}
+   }""",
+}
+
+
+def _short(uri):
+    return str(uri).replace(BASE_URI, ":")
+
+
+def detect_topics(question):
+    """Rule/example topics the question touches, in RULES order."""
+    topics = [t for t, words in TOPIC_WORDS.items() if any(w in question.lower() for w in words)]
+    if "time" not in topics and (TemplateMatcher.find_time(question) or TemplateMatcher.find_day(question) is not None):
+        topics.insert(0, "time")
+    return topics
+
+
+def link_entities(g, label_index, question, limit=MAX_ENTITIES):
+    """[(label, [uri], class of the first uri)] for the labels mentioned in the question."""
+    linked = []
+    for label in label_index.mentions(question)[:limit]:
+        uris = label_index.resolve(str(label))
+        if uris:
+            linked.append((str(label), uris, g.value(uris[0], NS.instanceOf)))
+    return linked
+
+
+def _entity_line(label, uris, cls):
+    shown = ", ".join(_short(u) for u in uris[:MAX_URIS_PER_LABEL])
+    more = f" 외 {len(uris) - MAX_URIS_PER_LABEL}개" if len(uris) > MAX_URIS_PER_LABEL else ""
+    kind = f" ({_short(cls)})" if cls is not None else ""
+    return f'"{label}" = {shown}{more}{kind}'
+
+
+def sparql_context(g, label_index, question, schema_summary, sample_labels, focused=True):
+    """
+    {"schema", "labels", "rules", "examples", "focused", "entities"} for the SPARQL prompt;
+    the full context when focused=False or nothing in the question could be linked.
+    """
+    topics = detect_topics(question) if focused else []
+    entities = link_entities(g, label_index, question) if focused else []
+    if not topics and not entities:
+        return {"schema": schema_summary, "labels": sample_labels,
+                "rules": "\n\n".join(RULES.values()), "examples": "\n\n".join(EXAMPLES.values()),
+                "focused": False, "entities": []}
+
+    wanted = set(ALWAYS_PREDICATES)
+    for topic in topics:
+        wanted.update(TOPIC_PREDICATES[topic])
+    for _, uris, _ in entities:
+        for uri in uris[:MAX_URIS_PER_LABEL]:
+            wanted.update(_short(p) for p, _ in g.predicate_objects(uri))
+            wanted.update(_short(p) for _, p in g.subject_predicates(uri))
+    predicates = [p for p in summary_items(schema_summary, "Predicates") if p in wanted]
+    classes = summary_items(schema_summary, "Classes")
+    schema = f"Predicates: {', '.join(predicates)}\nClasses: {', '.join(classes)}"
+    labels = "\n".join(_entity_line(*entity) for entity in entities) or sample_labels
+    rules = [RULES[t] for t in topics] + [RULES["search"]]
+    examples = [EXAMPLES[t] for t in topics] or list(EXAMPLES.values())
+    return {"schema": schema, "labels": labels, "rules": "\n\n".join(rules),
+            "examples": "\n\n".join(examples), "focused": True, "entities": entities}
+
+
+def frame_context(df, max_rows=MAX_ROWS, max_cell=MAX_CELL_CHARS):
+    """
+    Result rows for the answer prompt: (text, truncated). At most max_rows rows with cells
+    cut to max_cell characters, plus the total row count and distinct values per column
+    (max_rows=None: every row).
+    """
+    if df is None or df.empty:
+        return "No results found.", False
+    if max_rows is None:
+        max_rows = len(df)
+    shown = df.head(max_rows).astype(str)
+    for col in shown.columns:
+        shown[col] = shown[col].map(lambda v: v if len(v) <= max_cell else v[:max_cell] + "…")
+    text = shown.to_string(index=False)
+    truncated = len(df) > max_rows
+    if truncated:
+        distinct = ", ".join(f"{col} {df[col].astype(str).nunique()}종" for col in df.columns)
+        text += f"\n... 전체 {len(df)}행 중 {max_rows}행만 표시 (열별 고유값: {distinct})"
+    return text, truncated
@@ -0,0 +1,108 @@
+"""
+Prepared-query and result caches for GraphAgent.execute_query.
+
+- Compiled queries (rdflib prepareQuery: parse + algebra) keyed by normalized SPARQL text.
+- Result DataFrames keyed by (normalized SPARQL, graph version); a graph mutation
+  bumps the version, so stale results are never served.
+"""
+import re
+import threading
+from collections import OrderedDict
+
+from rdflib.plugins.sparql import prepareQuery
+
+# Quoted string literals and IRIs are kept verbatim; elsewhere comments are dropped
+# and whitespace is collapsed (a '#' comment would otherwise swallow the rest of the query)
+_STRING_RE = re.compile(r'("""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\'|"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'|<[^<>"{}|^`\\\s]*>)')
+# Scanned left to right: a quote inside a comment does not open a literal,
+# a '#' inside a literal or IRI does not start a comment
+_LEXICAL_RE = re.compile(_STRING_RE.pattern + r"|#[^\n]*")
+
+
+# rdflib's SPARQL parser (pyparsing) keeps global state and is not thread-safe
+_PARSE_LOCK = threading.Lock()
+
+
+def prepare_sparql(sparql, init_ns=None):
+    with _PARSE_LOCK:
+        return prepareQuery(sparql, initNs=init_ns or {})
+
+
+def run_sparql(g, sparql, **kwargs):
+    """g.query for a SPARQL string, parsed under the parser lock (safe from any thread)."""
+    return g.query(prepare_sparql(sparql, dict(g.namespaces())), **kwargs)
+
+
+def strip_comments(sparql):
+    """The query without its '#' comments (literals and IRIs untouched)."""
+    return _LEXICAL_RE.sub(lambda m: m.group(1) if m.group(1) is not None else " ", sparql)
+
+
+def normalize_sparql(sparql):
+    parts = _STRING_RE.split(strip_comments(sparql).strip())
+    for i in range(0, len(parts), 2):
+        parts[i] = " ".join(parts[i].split())
+    return "".join(parts).strip()
+
+
+class QueryCache:
+    def __init__(self, max_prepared=256, max_results=512):
+        self.max_prepared = max_prepared
+        self.max_results = max_results
+        self._prepared = OrderedDict()  # normalized sparql -> prepared Query
+        self._results = OrderedDict()   # (normalized sparql, version) -> DataFrame
+        self._latest_version = None
+        self._lock = threading.Lock()
+        self._stats = {"prepared_hits": 0, "prepared_misses": 0, "result_hits": 0, "result_misses": 0}
+
+    def prepare(self, key, init_ns):
+        """Returns the compiled query for a normalized SPARQL string (raises on syntax errors)."""
+        with self._lock:
+            query = self._prepared.get(key)
+            if query is not None:
+                self._prepared.move_to_end(key)
+                self._stats["prepared_hits"] += 1
+                return query
+            self._stats["prepared_misses"] += 1
+        query = prepare_sparql(key, init_ns)
+        with self._lock:
+            self._prepared[key] = query
+            while len(self._prepared) > self.max_prepared:
+                self._prepared.popitem(last=False)
+        return query
+
+    def get_result(self, key, version):
+        with self._lock:
+            df = self._results.get((key, version))
+            if df is None:
+                self._stats["result_misses"] += 1
+                return None
+            self._results.move_to_end((key, version))
+            self._stats["result_hits"] += 1
+            return df
+
+    def put_result(self, key, version, df):
+        with self._lock:
+            if self._latest_version is None or version > self._latest_version:
+                # Results for older graph versions can never be hit again
+                self._latest_version = version
+                for old in [k for k in self._results if k[1] < version]:
+                    del self._results[old]
+            self._results[(key, version)] = df
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["prepared_entries"] = len(self._prepared)
+            stats["result_entries"] = len(self._results)
+        for kind in ("prepared", "result"):
+            total = stats[f"{kind}_hits"] + stats[f"{kind}_misses"]
+            stats[f"{kind}_hit_rate"] = stats[f"{kind}_hits"] / total if total else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._prepared.clear()
+            self._results.clear()
@@ -0,0 +1,325 @@
+"""
+In-memory routing over the :Route (C004) entities.
+
+Each Route links two buildings (`?bldg :isEndpointOf ?route`) and carries a
+`:distance`; RouteGraph turns those triples into an adjacency list and answers
+multi-hop shortest-path queries with A* (haversine distance between the
+buildings' getLat/getLong as heuristic).
+
+Accessibility mode (wheelchair users):
+    - skips routes and buildings with a Curb (H_001) or Steep (H_004) hazard
+    - only passes through buildings that have a Lift (F_002) or Ramp (F_003)
+
+TravelMatrix holds the accessible all-pairs distances (+ next hop) as NumPy
+arrays for O(1) transfer lookups; it is stored in the graph snapshot and patched
+in place when a building's Lift/Ramp is toggled.
+"""
+import copy
+import heapq
+import math
+from collections import defaultdict
+
+import numpy as np
+from rdflib import Namespace, RDFS, URIRef
+
+BASE_URI = "http://snu.ac.kr/barrier-free/"
+NS = Namespace(BASE_URI)
+
+ACCESS_FACILITIES = frozenset([NS.F_002, NS.F_003])  # Lift, Ramp
+BLOCKING_HAZARDS = frozenset([NS.H_001, NS.H_004])   # Curb, Steep
+HAZARD_NAMES = {"H_001": "턱", "H_002": "횡단보도", "H_003": "볼라드", "H_004": "급경사"}
+
+# Triples whose change invalidates a RouteGraph
+ROUTING_PREDICATES = frozenset([NS.isEndpointOf, NS.distance, NS.getLat, NS.getLong,
+                                NS.hasFacility, NS.hasHazard])
+
+
+def to_float(term):
+    """xsd:float literal (or any numeric literal) -> float; None if missing or not a number"""
+    try:
+        return float(term)
+    except (TypeError, ValueError):
+        return None
+
+
+def haversine_m(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371000 * math.asin(math.sqrt(h))
+
+
+def local_name(uri):
+    return str(uri).rsplit("/", 1)[-1]
+
+
+class RouteGraph:
+    def __init__(self, g):
+        self.labels = {}
+        self.coords = {}
+        self.facilities = defaultdict(set)
+        self.hazards = defaultdict(set)  # route or building -> hazard URIs
+        self.routes = {}  # route -> (endpoints, distance)
+        self.adj = defaultdict(list)  # building -> [(neighbour, route, distance)]
+
+        endpoints = defaultdict(list)
+        for bldg, route in g.subject_objects(NS.isEndpointOf):
+            endpoints[route].append(bldg)
+        for route, bldgs in endpoints.items():
+            dist = to_float(g.value(route, NS.distance))
+            if dist is None or len(bldgs) < 2:
+                continue
+            self.routes[route] = (tuple(bldgs), dist)
+            for i, a in enumerate(bldgs):
+                for b in bldgs[i + 1:]:
+                    self.adj[a].append((b, route, dist))
+                    self.adj[b].append((a, route, dist))
+
+        for bldg in g.subjects(NS.instanceOf, NS.C001):
+            lat, lon = to_float(g.value(bldg, NS.getLat)), to_float(g.value(bldg, NS.getLong))
+            if lat is not None and lon is not None:
+                self.coords[bldg] = (lat, lon)
+        for node in list(self.adj) + list(self.routes):
+            label = g.value(node, RDFS.label)
+            self.labels[node] = str(label) if label is not None else local_name(node)
+        self._by_name = {}
+        for node in self.adj:
+            self._by_name.setdefault(self.labels[node], node)
+            self._by_name.setdefault(local_name(node), node)
+        for s, fac in g.subject_objects(NS.hasFacility):
+            self.facilities[s].add(fac)
+        for s, hazard in g.subject_objects(NS.hasHazard):
+            self.hazards[s].add(hazard)
+
+        # Scale the heuristic so it never overestimates (route distance >= scale * straight line)
+        ratios = [dist / haversine_m(self.coords[a], self.coords[b])
+                  for (bldgs, dist) in self.routes.values()
+                  for a, b in [bldgs[:2]]
+                  if a in self.coords and b in self.coords and self.coords[a] != self.coords[b]]
+        self.heuristic_scale = min([1.0] + ratios)
+
+    def copy(self):
+        """Copy whose facilities can be patched without touching this one."""
+        new = copy.copy(self)
+        new.facilities = defaultdict(set, {b: set(f) for b, f in self.facilities.items()})
+        return new
+
+    def find(self, label):
+        """Building URI by rdfs:label ('25동') or local name ('N003')."""
+        if isinstance(label, URIRef):
+            return label if label in self.adj else None
+        return self._by_name.get(label)
+
+    # --- accessibility ---
+
+    def building_ok(self, bldg):
+        return bool(self.facilities[bldg] & ACCESS_FACILITIES) and not self.hazards[bldg] & BLOCKING_HAZARDS
+
+    def route_ok(self, route):
+        return not self.hazards[route] & BLOCKING_HAZARDS
+
+    def accessible_neighbours(self, bldg):
+        if not self.building_ok(bldg):
+            return
+        for nbr, route, dist in self.adj[bldg]:
+            if self.route_ok(route) and self.building_ok(nbr):
+                yield nbr, route, dist
+
+    # --- search ---
+
+    def _heuristic(self, node, goal):
+        if node in self.coords and goal in self.coords:
+            return self.heuristic_scale * haversine_m(self.coords[node], self.coords[goal])
+        return 0.0
+
+    def shortest_path(self, src, dst, accessible=False):
+        """
+        A* from building src to dst. Returns None if unreachable, else
+            {"distance", "accessible", "buildings": [uri...], "hops": [{route, from, to, distance, hazards}]}
+        """
+        if src not in self.adj or dst not in self.adj:
+            return None
+        if accessible and not (self.building_ok(src) and self.building_ok(dst)):
+            return None
+        if src == dst:
+            return {"distance": 0.0, "accessible": accessible, "buildings": [src], "hops": []}
+
+        best = {src: 0.0}
+        prev = {}
+        heap = [(self._heuristic(src, dst), 0.0, str(src), src)]
+        while heap:
+            _, cost, _, node = heapq.heappop(heap)
+            if node == dst:
+                break
+            if cost > best[node]:
+                continue
+            for nbr, route, dist in self.adj[node]:
+                if accessible and not (self.route_ok(route) and self.building_ok(nbr)):
+                    continue
+                new_cost = cost + dist
+                if new_cost < best.get(nbr, math.inf):
+                    best[nbr] = new_cost
+                    prev[nbr] = (node, route, dist)
+                    heapq.heappush(heap, (new_cost + self._heuristic(nbr, dst), new_cost, str(nbr), nbr))
+        if dst not in best:
+            return None
+
+        hops = []
+        node = dst
+        while node != src:
+            parent, route, dist = prev[node]
+            hops.append({"route": route, "from": parent, "to": node, "distance": dist,
+                         "hazards": sorted(local_name(h) for h in self.hazards[route])})
+            node = parent
+        hops.reverse()
+        return {
+            "distance": best[dst],
+            "accessible": accessible,
+            "buildings": [src] + [h["to"] for h in hops],
+            "hops": hops,
+        }
+
+
+class TravelMatrix:
+    """
+    Accessible all-pairs shortest distances between the routed buildings.
+        dist[i, j]  metres (inf if no accessible path)
+        nxt[i, j]   index of the next building after i on the path i -> j (-1 if none)
+    """
+
+    def __init__(self, nodes, dist, nxt, accessible):
+        self.nodes = list(nodes)
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+        self.dist = dist
+        self.nxt = nxt
+        self.accessible = accessible  # building_ok per node when last computed
+
+    @classmethod
+    def from_router(cls, router):
+        nodes = sorted(router.adj, key=str)
+        index = {node: i for i, node in enumerate(nodes)}
+        n = len(nodes)
+        dist = np.full((n, n), np.inf)
+        np.fill_diagonal(dist, 0.0)
+        for a in nodes:
+            for b, _, d in router.accessible_neighbours(a):
+                i, j = index[a], index[b]
+                dist[i, j] = min(dist[i, j], d)
+        nxt = np.where(np.isfinite(dist), np.arange(n)[None, :], -1).astype(np.int32)
+
+        # Floyd-Warshall, one vectorized relaxation per intermediate building
+        for k in range(n):
+            via = dist[:, k, None] + dist[None, k, :]
+            better = via < dist
+            if better.any():
+                dist = np.where(better, via, dist)
+                nxt = np.where(better, nxt[:, k, None], nxt)
+        accessible = np.array([router.building_ok(node) for node in nodes], dtype=bool)
+        return cls(nodes, dist, nxt, accessible)
+
+    def copy(self):
+        return TravelMatrix(self.nodes, self.dist.copy(), self.nxt.copy(), self.accessible.copy())
+
+    # --- persistence (stored in the snapshot meta) ---
+
+    def to_state(self):
+        return {"nodes": [str(n) for n in self.nodes], "dist": self.dist, "nxt": self.nxt,
+                "accessible": self.accessible}
+
+    @classmethod
+    def from_state(cls, state):
+        # Copies: update_building patches the arrays in place, the state must stay pristine
+        return cls([URIRef(n) for n in state["nodes"]], state["dist"].copy(), state["nxt"].copy(),
+                   state["accessible"].copy())
+
+    # --- lookups ---
+
+    def distance(self, a, b):
+        i, j = self.index.get(a), self.index.get(b)
+        if i is None or j is None:
+            return math.inf
+        return float(self.dist[i, j])
+
+    def path(self, a, b):
+        """Buildings on the accessible shortest path a -> b ([] if unreachable)."""
+        i, j = self.index.get(a), self.index.get(b)
+        if i is None or j is None or not np.isfinite(self.dist[i, j]):
+            return []
+        path = [i]
+        while i != j:
+            i = int(self.nxt[i, j])
+            path.append(i)
+        return [self.nodes[k] for k in path]
+
+    # --- incremental updates ---
+
+    def _single_source(self, router, src):
+        """Dijkstra over the accessible edges -> (dist row, first hop row, parent row)."""
+        n = len(self.nodes)
+        dist = np.full(n, np.inf)
+        first = np.full(n, -1, dtype=np.int32)
+        parent = np.full(n, -1, dtype=np.int32)
+        s = self.index[src]
+        dist[s], first[s], parent[s] = 0.0, s, s
+        heap = [(0.0, s)]
+        while heap:
+            cost, i = heapq.heappop(heap)
+            if cost > dist[i]:
+                continue
+            for nbr, _, d in router.accessible_neighbours(self.nodes[i]):
+                j = self.index.get(nbr)
+                if j is None or cost + d >= dist[j]:
+                    continue
+                dist[j] = cost + d
+                parent[j] = i
+                first[j] = j if i == s else first[i]
+                heapq.heappush(heap, (dist[j], j))
+        return dist, first, parent
+
+    def _set_source(self, router, node):
+        """Recomputes row and column `node` (paths are symmetric)."""
+        i = self.index[node]
+        dist, first, parent = self._single_source(router, node)
+        self.dist[i, :] = dist
+        self.dist[:, i] = dist
+        self.nxt[i, :] = first
+        # From j towards i, the next building is j's parent in the tree rooted at i
+        self.nxt[:, i] = parent
+
+    def update_building(self, router, bldg):
+        """
+        Call after a facility toggle on `bldg`. Only recomputes when its accessibility
+        flipped, and then only the rows/columns whose shortest paths can change.
+        Returns the number of recomputed rows.
+        """
+        b = self.index.get(bldg)
+        if b is None:
+            return 0
+        ok = router.building_ok(bldg)
+        if ok == self.accessible[b]:
+            return 0
+        self.accessible[b] = ok
+
+        if ok:
+            # Newly usable: distances only shrink; new shortest paths go through b
+            self._set_source(router, bldg)
+            via = self.dist[:, b, None] + self.dist[None, b, :]
+            better = via < self.dist
+            self.dist = np.where(better, via, self.dist)
+            self.nxt = np.where(better, self.nxt[:, b, None], self.nxt)
+            return 1
+
+        # Closed: only sources with some shortest path through b are affected
+        through = np.isclose(self.dist[:, b, None] + self.dist[None, b, :], self.dist) & np.isfinite(self.dist)
+        through[:, b] = False
+        np.fill_diagonal(through, False)
+        affected = np.flatnonzero(through.any(axis=1))
+        self.dist[b, :] = np.inf
+        self.dist[:, b] = np.inf
+        self.dist[b, b] = 0.0
+        self.nxt[b, :] = -1
+        self.nxt[:, b] = -1
+        self.nxt[b, b] = b
+        for i in affected:
+            if i != b:
+                self._set_source(router, self.nodes[i])
+        return len(affected)
@@ -0,0 +1,125 @@
+"""
+Numeric time model and per-weekday interval index for course sections.
+
+build_graph.py materializes, next to the "HH:mm" StartTime/EndTime strings:
+    :startMinute / :endMinute   xsd:integer minutes since midnight (09:50 -> 590)
+    :dayMask                    xsd:integer weekday bitmask (월=1, 화=2, 수=4, ... 일=64)
+
+ScheduleIndex keeps, for every weekday, the sections sorted by start and by end
+minute, so "ends before X", "starts after X", "starts right after course Y" (Q7)
+and "classes on Monday between A and B" (Q8) are binary searches, not scans.
+"""
+import bisect
+
+WEEKDAYS = ["월", "화", "수", "목", "금", "토", "일"]
+
+
+def parse_minutes(hhmm):
+    """'9:00' / '09:00' -> 540"""
+    try:
+        hour, minute = str(hhmm).strip().split(":")[:2]
+        return int(hour) * 60 + int(minute)
+    except ValueError:
+        return None
+
+
+def parse_days(value):
+    """'월,수' -> [0, 2]; also accepts single dayOfWeek literals ('수')"""
+    return sorted({WEEKDAYS.index(ch) for ch in str(value) if ch in WEEKDAYS})
+
+
+def day_mask(days):
+    """[0, 2] -> 5"""
+    mask = 0
+    for day in days:
+        mask |= 1 << day
+    return mask
+
+
+def days_from_mask(mask):
+    """5 -> [0, 2]"""
+    return [day for day in range(len(WEEKDAYS)) if mask >> day & 1]
+
+
+def format_minutes(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class ScheduleIndex:
+    """
+    sections_by_title: {title: [Section]} (see timetable.load_sections).
+    Every query returns Sections ordered by (start, end, uri).
+    """
+
+    def __init__(self, sections_by_title):
+        self.sections = [s for group in sections_by_title.values() for s in group]
+        self.by_uri = {s.uri: s for s in self.sections}
+        self.by_title = sections_by_title
+        self._starts = []  # per weekday: ([start minutes], [Section]) sorted by start
+        self._ends = []  # per weekday: ([end minutes], [Section]) sorted by end
+        for day in range(len(WEEKDAYS)):
+            on_day = [s for s in self.sections if day in s.days]
+            by_start = sorted(on_day, key=lambda s: (s.start, s.end, str(s.uri)))
+            by_end = sorted(on_day, key=lambda s: (s.end, s.start, str(s.uri)))
+            self._starts.append(([s.start for s in by_start], by_start))
+            self._ends.append(([s.end for s in by_end], by_end))
+
+    @staticmethod
+    def _days(day):
+        return range(len(WEEKDAYS)) if day is None else [day]
+
+    @staticmethod
+    def _finish(found, title):
+        unique = {s.uri: s for s in found if title is None or s.title == title}
+        return sorted(unique.values(), key=lambda s: (s.start, s.end, str(s.uri)))
+
+    def ends_before(self, minute, day=None, title=None):
+        """Sections with end < minute (on `day`, or on any weekday)."""
+        found = []
+        for d in self._days(day):
+            keys, sections = self._ends[d]
+            found.extend(sections[:bisect.bisect_left(keys, minute)])
+        return self._finish(found, title)
+
+    def starts_after(self, minute, day=None, title=None):
+        """Sections with start >= minute."""
+        found = []
+        for d in self._days(day):
+            keys, sections = self._starts[d]
+            found.extend(sections[bisect.bisect_left(keys, minute):])
+        return self._finish(found, title)
+
+    def within(self, day, lo=0, hi=24 * 60, title=None):
+        """Sections on `day` that fit entirely in [lo, hi] (e.g. a free period)."""
+        keys, sections = self._starts[day]
+        candidates = sections[bisect.bisect_left(keys, lo):bisect.bisect_right(keys, hi)]
+        return self._finish([s for s in candidates if s.end <= hi], title)
+
+    def right_after(self, before, max_gap=60, title=None):
+        """
+        Sections starting within max_gap minutes after one of the `before` sections ends,
+        on a day they share (Q7). Returns [(before_section, next_section)].
+        """
+        pairs = []
+        for b in before:
+            for d in b.days:
+                keys, sections = self._starts[d]
+                lo, hi = bisect.bisect_left(keys, b.end), bisect.bisect_right(keys, b.end + max_gap)
+                for s in sections[lo:hi]:
+                    if s.uri != b.uri and (title is None or s.title == title):
+                        pairs.append((b, s))
+        seen = set()
+        unique = []
+        for b, s in pairs:
+            if (b.uri, s.uri) not in seen:
+                seen.add((b.uri, s.uri))
+                unique.append((b, s))
+        return sorted(unique, key=lambda p: (p[1].start, str(p[0].uri), str(p[1].uri)))
+
+
+def values_clause(var, uris):
+    """Pre-filtered SPARQL bindings: VALUES ?var { <uri> ... }"""
+    if not uris:
+        # rdflib rejects an empty VALUES block
+        return "FILTER(false)"
+    return f"VALUES ?{var} {{ {' '.join(f'<{u}>' for u in uris)} }}"
@@ -0,0 +1,51 @@
+"""Graph introspection used to build the SPARQL prompt (cached per graph version)."""
+import re
+
+from query_cache import run_sparql
+
+BASE_URI = "http://snu.ac.kr/barrier-free/"
+
+
+def schema_summary(g):
+    """Introspects the graph to find used predicates and classes."""
+    # Get all predicates
+    q = """
+    SELECT DISTINCT ?p WHERE {
+        ?s ?p ?o .
+    }
+    """
+    preds = [str(row.p).replace(BASE_URI, ":") for row in run_sparql(g, q) if BASE_URI in str(row.p)]
+
+    # Get Sample classes (if 'a' or 'rdf:type' is used)
+    q_cls = """
+    SELECT DISTINCT ?type WHERE {
+        ?s a ?type .
+    }
+    """
+    classes = [str(row.type).replace(BASE_URI, ":") for row in run_sparql(g, q_cls) if BASE_URI in str(row.type)]
+
+    return f"Predicates: {', '.join(preds)}\nClasses: {', '.join(classes)}"
+
+
+def summary_items(summary, name):
+    """Items of the 'Name: a, b, c' line of the schema summary."""
+    m = re.search(rf"^{name}:\s*(.*)$", summary, re.MULTILINE)
+    return [item.strip() for item in m.group(1).split(",") if item.strip()] if m else []
+
+
+def sample_labels(g):
+    """Fetches a few sample labels to help the LLM understand the data content."""
+    try:
+        q = "SELECT DISTINCT ?label WHERE { ?s rdfs:label ?label } LIMIT 10"
+        labels = [str(row.label) for row in run_sparql(g, q)]
+        return ", ".join(labels)
+    except Exception:
+        return "No labels found."
+
+
+def introspect(g):
+    """Everything the prompt needs from the graph, in one dict (stored in the snapshot)."""
+    return {
+        "summary": schema_summary(g),
+        "labels": sample_labels(g),
+    }
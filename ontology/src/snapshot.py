@@ -0,0 +1,110 @@
+import hashlib
+import mmap
+import os
+import pickle
+
+from rdflib import Graph
+
+# Snapshot file layout:
+#   MAGIC \n <sha256 of source TTL> \n <build manifest digest, or empty> \n <pickled payload>
+# The header lets us detect a stale snapshot without unpickling the graph.
+SNAPSHOT_MAGIC = b"KGSNAP2"
+SNAPSHOT_SUFFIX = ".snapshot.pkl"
+
+
+def snapshot_path(ttl_path):
+    """data/knowledge_graph.ttl -> data/knowledge_graph.snapshot.pkl"""
+    root, _ = os.path.splitext(ttl_path)
+    return root + SNAPSHOT_SUFFIX
+
+
+def file_hash(path):
+    """SHA-256 of the file content (used to key the snapshot to its TTL)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def write_snapshot(g, ttl_path, meta=None):
+    """
+    Pickles the in-memory graph (store + indexes) next to the TTL.
+    meta["manifest"] (build_graph.py's manifest digest) is also written to the header.
+    """
+    path = snapshot_path(ttl_path)
+    meta = meta or {}
+    payload = {"graph": g, "meta": meta}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(SNAPSHOT_MAGIC + b"\n")
+        f.write(file_hash(ttl_path).encode("ascii") + b"\n")
+        f.write(meta.get("manifest", "").encode("ascii") + b"\n")
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    # Atomic replace so a concurrent reader never sees a half-written file
+    os.replace(tmp_path, path)
+    return path
+
+
+def _read_header(f):
+    """(TTL hash, manifest digest), or None if f isn't a snapshot."""
+    if f.readline().rstrip(b"\n") != SNAPSHOT_MAGIC:
+        return None
+    ttl_hash = f.readline().rstrip(b"\n").decode("ascii")
+    manifest = f.readline().rstrip(b"\n").decode("ascii")
+    return ttl_hash, manifest
+
+
+def is_current(ttl_path, manifest):
+    """True if the TTL and its snapshot exist and the snapshot was built from both this TTL and manifest."""
+    path = snapshot_path(ttl_path)
+    if not (os.path.exists(ttl_path) and os.path.exists(path)):
+        return False
+    with open(path, "rb") as f:
+        header = _read_header(f)
+    return header == (file_hash(ttl_path), manifest)
+
+
+def load_snapshot(ttl_path):
+    """
+    Loads the snapshot for ttl_path in one pass over the memory-mapped file.
+    Returns (graph, meta), or None if the snapshot is missing or stale.
+    """
+    path = snapshot_path(ttl_path)
+    if not os.path.exists(path):
+        return None
+    expected = file_hash(ttl_path)
+    with open(path, "rb") as f:
+        header = _read_header(f)
+        if header is None or header[0] != expected:
+            return None
+        offset = f.tell()
+        # Unpickled straight from the mapped pages: no bytes copy of the payload
+        # (the graph itself is still rebuilt in memory)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                memoryview(mm) as view, view[offset:] as data:
+            payload = pickle.loads(data)
+    return payload["graph"], payload.get("meta", {})
+
+
+def load_graph(ttl_path):
+    """
+    Returns (graph, meta, from_snapshot).
+    Falls back to parsing the TTL (and refreshes the snapshot) on a miss.
+    """
+    try:
+        loaded = load_snapshot(ttl_path)
+    except Exception as e:
+        print(f"Ignoring unreadable snapshot: {e}")
+        loaded = None
+    if loaded is not None:
+        g, meta = loaded
+        return g, meta, True
+
+    g = Graph()
+    g.parse(ttl_path, format="turtle")
+    try:
+        write_snapshot(g, ttl_path)
+    except OSError as e:
+        print(f"Could not write snapshot: {e}")
+    return g, {}, False
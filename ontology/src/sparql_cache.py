@@ -0,0 +1,141 @@
+"""
+Persistent cache: normalized user question -> generated {reasoning, sparql}.
+
+Backed by a local SQLite file so it survives process restarts and is shared
+by every Streamlit worker on the machine. Entries are evicted by TTL and,
+once the cache is full, least-recently-used first.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# Common Korean postpositions (조사), longest first so '에서' wins over '에'
+KOREAN_PARTICLES = sorted([
+    "에서부터", "에서", "으로", "부터", "까지", "에게", "한테", "이랑", "하고",
+    "랑", "은", "는", "이", "가", "을", "를", "에", "의", "도", "로", "와", "과", "만",
+], key=len, reverse=True)
+
+
+def _strip_particle(token, vocabulary=frozenset()):
+    # Known words stay whole: '경사로' (ramp) is not '경사' (slope) + '로'
+    if token in vocabulary:
+        return token
+    for particle in KOREAN_PARTICLES:
+        # Keep at least two characters of stem ('나이' stays '나이')
+        if token.endswith(particle) and len(token) - len(particle) >= 2:
+            return token[:-len(particle)]
+    return token
+
+
+def normalize_question(question, vocabulary=frozenset()):
+    """
+    '500동에 엘리베이터 있어?' and ' 500동에  엘리베이터  있어 ' -> '500동 엘리베이터 있어'
+    Unicode/width normalization, lowercase, punctuation and quotes removed,
+    whitespace collapsed and trailing particles stripped from each word
+    (except the words in `vocabulary`, e.g. the graph's labels).
+    """
+    text = unicodedata.normalize("NFKC", question).lower()
+    # Punctuation -> space (keep '-' inside ids like 43-1동)
+    text = re.sub(r"[^\w\s-]", " ", text)
+    text = re.sub(r"(?<!\w)-|-(?!\w)", " ", text)
+    tokens = [_strip_particle(tok, vocabulary) for tok in text.split()]
+    return " ".join(tokens)
+
+
+class SparqlCache:
+    def __init__(self, path, max_entries=2000, ttl_seconds=7 * 24 * 3600, namespace="", vocabulary=frozenset()):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Prefix for keys, e.g. the prompt version, so prompt changes don't reuse old queries
+        self.namespace = namespace
+        # Lowercase words kept whole in the keys (see normalize_question)
+        self.vocabulary = frozenset(vocabulary)
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS sparql_cache (
+                    key TEXT PRIMARY KEY,
+                    question TEXT,
+                    reasoning TEXT,
+                    sparql TEXT,
+                    created REAL,
+                    last_access REAL,
+                    hits INTEGER DEFAULT 0
+                )""")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_sparql_cache_access ON sparql_cache(last_access)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_stats (name TEXT PRIMARY KEY, value INTEGER)")
+
+    def _key(self, question):
+        return f"{self.namespace}|{normalize_question(question, self.vocabulary)}"
+
+    def _count(self, name, n=1):
+        self._conn.execute(
+            "INSERT INTO cache_stats(name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, n))
+
+    def get(self, question):
+        """Returns {'reasoning', 'sparql'} or None on a miss."""
+        key = self._key(question)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT reasoning, sparql, created FROM sparql_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[2] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM sparql_cache WHERE key = ?", (key,))
+                self._count("expired")
+                row = None
+            if row is None:
+                self._count("misses")
+                return None
+            self._conn.execute(
+                "UPDATE sparql_cache SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self._count("hits")
+        return {"reasoning": row[0], "sparql": row[1]}
+
+    def put(self, question, result):
+        key = self._key(question)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sparql_cache(key, question, reasoning, sparql, created, last_access, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (key, question, result.get("reasoning", ""), result.get("sparql", ""), now, now))
+            # TTL, then LRU eviction
+            self._conn.execute("DELETE FROM sparql_cache WHERE created < ?", (now - self.ttl_seconds,))
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM sparql_cache").fetchone()
+            overflow = size - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM sparql_cache WHERE key IN "
+                    "(SELECT key FROM sparql_cache ORDER BY last_access LIMIT ?)", (overflow,))
+                self._count("evictions", overflow)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM cache_stats").fetchall())
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM sparql_cache").fetchone()
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        total = hits + misses
+        return {
+            "entries": size,
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "expired": counters.get("expired", 0),
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sparql_cache")
+            self._conn.execute("DELETE FROM cache_stats")
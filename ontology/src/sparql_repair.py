@@ -0,0 +1,248 @@
+"""
+Local validation and repair of the generator's output before it is executed.
+
+The LLM's reply goes through three steps, each fixing what it can locally:
+
+    parse_llm_json  JSON wrapped in prose/code fences, control characters in strings,
+                    or a bare query with no JSON at all
+    SparqlRepairer  quoting (typographic quotes, unquoted HH:mm times and Korean
+                    literals, quoted numbers in comparisons), missing/unknown prefixes,
+                    unknown `:` terms (aliases such as :locatedIn -> :isLocatedIn, near
+                    spellings of known predicates, class/facility names by label);
+                    then parses the query with rdflib
+    repair_prompt   what is left (a syntax error, a term that cannot be mapped) gets
+                    one targeted LLM round trip with the error and the known predicates
+
+Every fix is recorded ("fixes") so the perf log shows what the generator gets wrong.
+"""
+import difflib
+import json
+import re
+
+from rdflib import Namespace, OWL, RDF, RDFS, XSD
+
+from label_index import normalize_label
+from query_cache import _STRING_RE, prepare_sparql, strip_comments
+
+BASE_URI = "http://snu.ac.kr/barrier-free/"
+NS = Namespace(BASE_URI)
+
+# Names the generator uses for the graph's predicates (see the old Q2 example)
+ALIASES = {
+    "locatedIn": "isLocatedIn",
+    "located": "isLocatedIn",
+    "inBuilding": "isLocatedIn",
+    "heldAt": "isHeldAt",
+    "isHeldIn": "isHeldAt",
+    "heldIn": "isHeldAt",
+    "facility": "hasFacility",
+    "hasFacilities": "hasFacility",
+    "hazard": "hasHazard",
+    "hasHazards": "hasHazard",
+    "endpointOf": "isEndpointOf",
+    "hasRoute": "isEndpointOf",
+    "type": "instanceOf",
+    "startTime": "StartTime",
+    "endTime": "EndTime",
+    "courseName": "title",
+    "name": "title",
+    "lat": "getLat",
+    "latitude": "getLat",
+    "long": "getLong",
+    "lng": "getLong",
+    "longitude": "getLong",
+    "length": "distance",
+}
+# Declared in the query when the graph does not bind them (execute_query uses the graph's)
+STANDARD_PREFIXES = {"": BASE_URI, "rdf": str(RDF), "rdfs": str(RDFS), "xsd": str(XSD), "owl": str(OWL)}
+# Terms of other vocabularies written with the base prefix
+FOREIGN = {"label": RDFS.label}
+CLOSE_MATCH_CUTOFF = 0.85
+
+_JSON_OBJECT_RE = re.compile(r"\{[\s\S]*\}")
+_QUERY_START_RE = re.compile(r"\b(PREFIX|SELECT|ASK|CONSTRUCT|DESCRIBE)\b", re.IGNORECASE)
+_PREFIX_DECL_RE = re.compile(r"PREFIX\s+([A-Za-z][\w\-.]*)?:\s*<([^>]*)>", re.IGNORECASE)
+# pfx:local outside literals/IRIs; not a variable, not inside a longer name
+_TERM_RE = re.compile(r"(?<![\w?$:%\-])([A-Za-z][\w\-]*)?:((?:[\w\-]|%[0-9A-Fa-f]{2})+)")
+_TIME_RE = re.compile(r"(?<![\w:'\"])(\d{1,2}):(\d{2})(?![\w:'\"])")
+_BARE_HANGUL_RE = re.compile(r"(?<![\w?$:%'\"])([\w\-]*[가-힣][\w\-]*)")
+_QUOTED_NUMBER_RE = re.compile(r"(<=|>=|!=|<|>|=)(\s*)[\"'](-?\d+(?:\.\d+)?)[\"']")
+_SHORT_TIME_RE = re.compile(r"([\"'])(\d):(\d{2})\1")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+
+def parse_llm_json(text):
+    """
+    The generator's reply as a dict: JSON (fenced or inside prose), or
+    {"reasoning", "sparql"} for a bare query. Returns (result, fixes); result is
+    None when there is neither JSON nor a query in the text.
+    """
+    text = text.replace("```json", "").replace("```sparql", "").replace("```", "").strip()
+    try:
+        return json.loads(text), []
+    except ValueError:
+        pass
+    m = _JSON_OBJECT_RE.search(text)
+    if m:
+        try:
+            # strict=False: raw newlines/tabs inside the query string
+            return json.loads(m.group(0), strict=False), ["json_extracted"]
+        except ValueError:
+            pass
+    m = _QUERY_START_RE.search(text)
+    if m:
+        return {"reasoning": "", "sparql": text[m.start():].strip()}, ["bare_query"]
+    return None, []
+
+
+class SparqlRepairer:
+    """
+    predicates: local names of the graph's `:` predicates (schema summary);
+    namespaces: the graph's (prefix, namespace) bindings; g / label_index: to check
+    that a `:` resource exists and to map class/facility names to it.
+    """
+
+    def __init__(self, g, label_index, predicates, namespaces):
+        self.g = g
+        self.label_index = label_index
+        self.predicates = list(predicates)
+        self.bound = {p: str(n) for p, n in namespaces}
+        self.namespaces = {**STANDARD_PREFIXES, **self.bound}
+        self._lower = {p.lower(): p for p in self.predicates}
+
+    def repair(self, sparql):
+        """
+        (sparql, fixes, error): the repaired query, the fixes applied and the problem
+        left (None when the query parses and every `:` term is known).
+        """
+        fixes = []
+        # Comments go first: the passes below would quote/rewrite the words in them
+        sparql = self._fix_quoting(strip_comments(sparql), fixes)
+        sparql, unknown = self._fix_terms(sparql, fixes)
+        sparql = self._fix_prefixes(sparql, fixes)
+        fixes = list(dict.fromkeys(fixes))
+        if unknown:
+            return sparql, fixes, f"Unknown terms: {', '.join(unknown)}"
+        try:
+            prepare_sparql(sparql, self.bound)
+        except Exception as e:
+            return sparql, fixes, f"Syntax error: {e}"
+        return sparql, fixes, None
+
+    # --- outside literals ---
+
+    @staticmethod
+    def _map_code(sparql, fn):
+        """Applies fn to the parts of the query outside string literals and IRIs."""
+        parts = _STRING_RE.split(sparql)
+        for i in range(0, len(parts), 2):
+            parts[i] = fn(parts[i])
+        return "".join(parts)
+
+    def _fix_quoting(self, sparql, fixes):
+        fixed = sparql.translate(_SMART_QUOTES)
+        if fixed != sparql:
+            fixes.append("smart_quotes")
+
+        def code(part):
+            new = _TIME_RE.sub(lambda m: f'"{int(m.group(1)):02d}:{m.group(2)}"', part)
+            new = _BARE_HANGUL_RE.sub(lambda m: f"'{m.group(1)}'", new)
+            return new
+
+        quoted = self._map_code(fixed, code)
+        if quoted != fixed:
+            fixes.append("unquoted_literal")
+        # FILTER(?dist < "300"): a string never compares with the xsd:float values
+        unquoted = _QUOTED_NUMBER_RE.sub(r"\1\2\3", quoted)
+        if unquoted != quoted:
+            fixes.append("quoted_number")
+        # '9:00' sorts after '10:00' as a string; :StartTime/:EndTime are "HH:mm"
+        padded = _SHORT_TIME_RE.sub(r"\g<1>0\2:\3\1", unquoted)
+        if padded != unquoted:
+            fixes.append("time_padding")
+        return padded
+
+    def _fix_terms(self, sparql, fixes):
+        unknown = []
+        declared = {m.group(1) or "": m.group(2) for m in _PREFIX_DECL_RE.finditer(sparql)}
+
+        def term(m):
+            prefix, local = m.group(1) or "", m.group(2)
+            ns = declared.get(prefix, self.namespaces.get(prefix))
+            if ns is not None and ns != BASE_URI:
+                return m.group(0)
+            if ns is None:
+                # snu:/ex:/bf: ... for the graph's own namespace
+                fixes.append(f"prefix {prefix}: -> :")
+            new = self._known(local)
+            if new is None:
+                unknown.append(f":{local}")
+                return f":{local}"
+            if new != f":{local}":
+                fixes.append(f":{local} -> {new}")
+            return new
+
+        def code(part):
+            # PREFIX declarations are kept as they are
+            pieces = re.split(r"(PREFIX\s+[\w\-.]*:)", part, flags=re.IGNORECASE)
+            for i in range(0, len(pieces), 2):
+                pieces[i] = _TERM_RE.sub(term, pieces[i])
+            return "".join(pieces)
+
+        return self._map_code(sparql, code), sorted(set(unknown))
+
+    def _known(self, local):
+        """The term to write for :local, or None when it cannot be mapped."""
+        if local in self.predicates or self._exists(NS[local]):
+            return f":{local}"
+        if local in FOREIGN:
+            return f"<{FOREIGN[local]}>"
+        alias = ALIASES.get(local)
+        if alias in self.predicates:
+            return f":{alias}"
+        if local.lower() in self._lower:
+            return f":{self._lower[local.lower()]}"
+        close = difflib.get_close_matches(local, self.predicates, n=1, cutoff=CLOSE_MATCH_CUTOFF)
+        if close:
+            return f":{close[0]}"
+        # :Course -> :C005, :Lift -> :F_002 (an entity whose label is exactly the name)
+        uris = [u for u in self.label_index.resolve(local)
+                if any(normalize_label(l) == normalize_label(local) for l in self.g.objects(u, RDFS.label))]
+        if len(uris) == 1 and str(uris[0]).startswith(BASE_URI):
+            return f":{str(uris[0])[len(BASE_URI):]}"
+        return None
+
+    def _exists(self, uri):
+        return (uri, None, None) in self.g or (None, None, uri) in self.g
+
+    def _fix_prefixes(self, sparql, fixes):
+        """Declares the standard prefixes the query uses and neither it nor the graph declares."""
+        declared = {m.group(1) or "" for m in _PREFIX_DECL_RE.finditer(sparql)}
+        used = {m.group(1) or "" for part in _STRING_RE.split(sparql)[::2] for m in _TERM_RE.finditer(part)}
+        missing = sorted(p for p in used - declared - set(self.bound) if p in self.namespaces)
+        if not missing:
+            return sparql
+        fixes.append("prefixes " + ", ".join(f"{p}:" for p in missing))
+        header = "".join(f"PREFIX {p}: <{self.namespaces[p]}>\n" for p in missing)
+        return header + sparql
+
+
+def repair_prompt(user_query, sparql, error, predicates):
+    """One targeted repair request for a query the local repairs could not fix."""
+    return f"""
+        The following SPARQL query for an RDF Knowledge Graph failed validation.
+        NamespacePrefix: : <{BASE_URI}>
+        Prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+
+        Known predicates: {', '.join(':' + p for p in predicates)}
+
+        User Question: "{user_query}"
+        Query:
+        {sparql}
+
+        Problem: {error}
+
+        Return only the corrected query as JSON {{"reasoning": "...", "sparql": "..."}}.
+        Use only the known predicates; search names with rdfs:label or :title.
+        JSON:
+        """
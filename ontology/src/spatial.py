@@ -0,0 +1,106 @@
+"""
+Uniform grid over the building coordinates (:getLat / :getLong, xsd:float).
+
+Coordinates are projected to local metres (equirectangular around the campus
+centre, exact enough at campus scale) and bucketed into CELL_M x CELL_M cells.
+iter_nearest() scans rings of cells outwards and only hands out a building once
+no unvisited cell can hold anything closer.
+"""
+import heapq
+import itertools
+import math
+
+from rdflib import Namespace
+
+from routing import haversine_m, to_float
+
+BASE_URI = "http://snu.ac.kr/barrier-free/"
+NS = Namespace(BASE_URI)
+
+CELL_M = 200.0
+M_PER_DEG_LAT = 110574.0
+M_PER_DEG_LON = 111320.0  # at the equator; scaled by cos(latitude)
+
+# Triples whose change invalidates a SpatialGrid
+SPATIAL_PREDICATES = frozenset([NS.getLat, NS.getLong, NS.instanceOf])
+
+
+def building_coords(g):
+    """{building URI: (lat, lon)} for every :C001 with numeric coordinates."""
+    coords = {}
+    for bldg in g.subjects(NS.instanceOf, NS.C001):
+        lat, lon = to_float(g.value(bldg, NS.getLat)), to_float(g.value(bldg, NS.getLong))
+        if lat is not None and lon is not None:
+            coords[bldg] = (lat, lon)
+    return coords
+
+
+class SpatialGrid:
+    def __init__(self, coords, cell_m=CELL_M):
+        self.coords = dict(coords)
+        self.cell_m = cell_m
+        lats = [lat for lat, _ in self.coords.values()] or [0.0]
+        self.lat0 = sum(lats) / len(lats)
+        self._lon_scale = M_PER_DEG_LON * math.cos(math.radians(self.lat0))
+        self.cells = {}  # (ix, iy) -> [building URI]
+        for node, point in self.coords.items():
+            self.cells.setdefault(self._cell(point), []).append(node)
+        xs, ys = [ix for ix, _ in self.cells] or [0], [iy for _, iy in self.cells] or [0]
+        self._bounds = (min(xs), max(xs), min(ys), max(ys))
+
+    @classmethod
+    def from_graph(cls, g, cell_m=CELL_M):
+        return cls(building_coords(g), cell_m)
+
+    def __len__(self):
+        return len(self.coords)
+
+    def _xy(self, point):
+        lat, lon = point
+        return lon * self._lon_scale, (lat - self.lat0) * M_PER_DEG_LAT
+
+    def _cell(self, point):
+        x, y = self._xy(point)
+        return int(math.floor(x / self.cell_m)), int(math.floor(y / self.cell_m))
+
+    def _ring(self, cx, cy, r):
+        if r == 0:
+            yield cx, cy
+            return
+        for dx in range(-r, r + 1):
+            yield cx + dx, cy - r
+            yield cx + dx, cy + r
+        for dy in range(-r + 1, r):
+            yield cx - r, cy + dy
+            yield cx + r, cy + dy
+
+    def _point(self, where):
+        return where if isinstance(where, tuple) else self.coords.get(where)
+
+    # --- queries ---
+
+    def iter_nearest(self, where, accept=None):
+        """
+        Buildings by increasing straight-line distance from `where` (a building URI or a
+        (lat, lon) pair), lazily: yields (building, metres). accept(building) -> bool filters.
+        """
+        point = self._point(where)
+        if point is None or not self.cells:
+            return
+        cx, cy = self._cell(point)
+        x0, x1, y0, y1 = self._bounds
+        span = max(cx - x0, x1 - cx, cy - y0, y1 - cy, 0)
+        pending = []  # heap of (metres, uri str, building) seen but not yet yielded
+        for r in range(span + 1):
+            for cell in self._ring(cx, cy, r):
+                for node in self.cells.get(cell, ()):
+                    if node != where and (accept is None or accept(node)):
+                        heapq.heappush(pending, (haversine_m(point, self.coords[node]), str(node), node))
+            # Cells in ring r+1 are at least r cell widths away
+            while pending and (pending[0][0] <= r * self.cell_m or r == span):
+                dist, _, node = heapq.heappop(pending)
+                yield node, dist
+
+    def nearest(self, where, k=1, accept=None):
+        """k closest buildings to `where`: [(building, metres)], closest first."""
+        return list(itertools.islice(self.iter_nearest(where, accept), k))
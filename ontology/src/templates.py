@@ -0,0 +1,444 @@
+"""
+Template fast path: recognizes the common question shapes (see generate_sparql's
+competency questions) and answers them with pre-compiled SPARQL + a Korean
+answer template, without calling the LLM.
+
+    Q1  course time filter      "10시 전에 끝나는 '수학1' 수업 있어?"
+    Q2  course place/facilities "휠체어 타는데 '수학1' 어디서 들어야 해?"
+    Q7  course right after      "'베리타스 실천' 끝나고 바로 들을 수 있는 '수학1' 분반은?"  (schedule index)
+    Q8  accessible on a day     "월요일 공강 때 휠체어로 갈 수 있는 건물 내의 다른 수업은?"  (schedule + accessibility index)
+    Q3  building-to-building    "25동에서 500동 어떻게 가?"   (routing engine, no SPARQL)
+    Q5  nearest facility        "24동 근처인데 장애인 화장실 있는 건물 어디야?"  (spatial grid + travel matrix)
+    Q9  course combination      "'대학글쓰기1'과 '수학연습1' 시간 안 겹치는 조합"  (timetable solver)
+    +   facility check          "500동에 엘리베이터 있어?"
+"""
+import re
+
+from rdflib import Literal, URIRef
+
+from query_cache import run_sparql
+from schedule import WEEKDAYS
+
+BASE_URI = "http://snu.ac.kr/barrier-free/"
+
+# Facility id -> (Korean display name, keywords that refer to it)
+FACILITY_KEYWORDS = {
+    "F_001": ("장애인 화장실", ["장애인화장실", "화장실", "wc"]),
+    "F_002": ("엘리베이터", ["엘리베이터", "승강기", "엘베", "lift"]),
+    "F_003": ("경사로", ["경사로", "ramp"]),
+    "F_004": ("자동문", ["자동문", "autodoor"]),
+}
+
+# Parameterized SPARQL; slots are bound with initBindings at execution time.
+# A "#VALUES" line is where GraphAgent splices in the sections pre-filtered by the
+# schedule index (VALUES ?course {...}); left alone it is just a comment.
+VALUES_SLOT = "#VALUES"
+TEMPLATES = {
+    "course_end_before": """
+        SELECT ?courseName ?classRoom ?startTime ?endTime WHERE {
+            #VALUES
+            ?course :title ?title ; rdfs:label ?courseName ;
+                    :StartTime ?startTime ; :EndTime ?endTime ; :isHeldAt ?room .
+            ?room rdfs:label ?classRoom .
+            FILTER(?endTime < ?limit)
+        } ORDER BY ?endTime ?classRoom
+    """,
+    "course_start_after": """
+        SELECT ?courseName ?classRoom ?startTime ?endTime WHERE {
+            #VALUES
+            ?course :title ?title ; rdfs:label ?courseName ;
+                    :StartTime ?startTime ; :EndTime ?endTime ; :isHeldAt ?room .
+            ?room rdfs:label ?classRoom .
+            FILTER(?startTime >= ?limit)
+        } ORDER BY ?startTime ?classRoom
+    """,
+    "course_place": """
+        SELECT ?course ?classRoom ?bldgName ?startTime ?endTime
+               (GROUP_CONCAT(DISTINCT ?facLabel; separator=", ") AS ?facilities) WHERE {
+            ?course :title ?title ; :isHeldAt ?room .
+            ?room rdfs:label ?classRoom ; :isLocatedIn ?bldg .
+            ?bldg rdfs:label ?bldgName .
+            OPTIONAL { ?course :StartTime ?startTime ; :EndTime ?endTime }
+            OPTIONAL { ?bldg :hasFacility ?fac . ?fac rdfs:label ?facLabel }
+        } GROUP BY ?course ?classRoom ?bldgName ?startTime ?endTime
+          ORDER BY ?bldgName ?classRoom ?startTime
+    """,
+    "course_list": """
+        SELECT ?course ?courseName ?classRoom ?startTime ?endTime WHERE {
+            #VALUES
+            ?course rdfs:label ?courseName ; :StartTime ?startTime ; :EndTime ?endTime ; :isHeldAt ?room .
+            ?room rdfs:label ?classRoom .
+        } ORDER BY ?startTime ?classRoom
+    """,
+    "facility_check": """
+        SELECT ?bldgName ?hasFacility WHERE {
+            ?bldg rdfs:label ?bldgName ; :instanceOf :C001 .
+            BIND(EXISTS { ?bldg :hasFacility ?fac } AS ?hasFacility)
+        }
+    """,
+}
+
+TIMETABLE_WORDS = ["조합", "시간표", "겹치", "둘 다", "모두 들", "같이 들"]
+FOLLOW_WORDS = ["끝나고", "끝난 후", "끝난 뒤", "끝난 다음", "이어서"]
+NEAR_WORDS = ["근처", "가까운", "가까이", "주변", "근방", "제일 가까", "가장 가까"]
+ROUTE_WORDS = ["어떻게 가", "가는 길", "가는 법", "경로", "이동", "길 알려", "가려면", "까지"]
+PLACE_WORDS = ["어디", "어느", "건물", "강의실", "들어야"]
+WHEELCHAIR_WORDS = ["휠체어", "이동약자", "장애"]
+END_WORDS = ["끝나", "종료", "마치"]
+START_WORDS = ["시작"]
+BEFORE_WORDS = ["전에", "전까지", "이전", "까지"]
+AFTER_WORDS = ["이후", "후에", "부터", "넘어서", "지나서"]
+
+DAY_LIST_LIMIT = 20  # sections listed in the Q8 answer
+
+_DAY_RE = re.compile(r"([월화수목금토일])요일")
+_HOUR_RE = re.compile(r"(오전|오후)?\s*(\d{1,2})\s*시(?:\s*(\d{1,2})\s*분|\s*(반))?")
+_BUILDING_RE = re.compile(r"(\d+(?:-\d+)?)\s*동")
+
+
+def _compact(text):
+    return re.sub(r"[\s'\"‘’“”]", "", text).lower()
+
+
+def _contains_any(text, words):
+    return any(w in text for w in words)
+
+
+def _josa(word, with_batchim, without_batchim):
+    """Picks the particle by the last syllable: _josa('500동', '을', '를') -> '500동을'"""
+    last = word[-1] if word else ""
+    if "가" <= last <= "힣":
+        has_batchim = (ord(last) - ord("가")) % 28 != 0
+    else:
+        # Digits/latin: read the way Koreans usually pronounce them
+        has_batchim = last in "013678lmnLMN"
+    return word + (with_batchim if has_batchim else without_batchim)
+
+
+def _hhmm(hour, minute=0):
+    return f"{hour:02d}:{minute:02d}"
+
+
+class TemplateMatcher:
+    """Slot filler over the entity labels in the graph (course titles, building labels)."""
+
+    def __init__(self, g):
+        # course alias (compacted) -> title literal; e.g. '베리타스실천' -> '베리타스 실천: 평등의 물리학'
+        self.course_aliases = {}
+        for row in run_sparql(g, "SELECT DISTINCT ?title WHERE { ?c :title ?title }"):
+            title = str(row.title)
+            self.course_aliases[_compact(title)] = title
+            short = title.split(":")[0].strip()
+            self.course_aliases.setdefault(_compact(short), title)
+        # Longest alias first so '수학연습1' wins over '수학1'-like prefixes
+        self._course_keys = sorted(self.course_aliases, key=len, reverse=True)
+
+        self.building_labels = set()
+        for row in run_sparql(g, "SELECT DISTINCT ?label WHERE { ?b :instanceOf :C001 ; rdfs:label ?label }"):
+            self.building_labels.add(str(row.label))
+
+    # --- entity recognition ---
+
+    def find_courses(self, question):
+        compact = _compact(question)
+        found = []
+        for key in self._course_keys:
+            pos = compact.find(key)
+            if pos >= 0:
+                title = self.course_aliases[key]
+                if title not in [t for _, t in found]:
+                    found.append((pos, title))
+                # Blank out the match so shorter aliases inside it don't match again
+                compact = compact[:pos] + "\0" * len(key) + compact[pos + len(key):]
+        return [t for _, t in sorted(found)]
+
+    def find_buildings(self, question):
+        found = []
+        for m in _BUILDING_RE.finditer(question):
+            label = f"{m.group(1)}동"
+            if label in self.building_labels and label not in found:
+                found.append(label)
+        return found
+
+    @staticmethod
+    def find_facility(question):
+        text = question.lower()
+        for fac_id, (_, keywords) in FACILITY_KEYWORDS.items():
+            if _contains_any(text, keywords):
+                return fac_id
+        return None
+
+    @staticmethod
+    def find_day(question):
+        """'월요일' -> 0"""
+        m = _DAY_RE.search(question)
+        return WEEKDAYS.index(m.group(1)) if m else None
+
+    @staticmethod
+    def find_time(question):
+        m = _HOUR_RE.search(question)
+        if not m:
+            return None
+        hour = int(m.group(2))
+        minute = int(m.group(3)) if m.group(3) else (30 if m.group(4) else 0)
+        if m.group(1) == "오후" and hour < 12:
+            hour += 12
+        elif m.group(1) is None and 1 <= hour <= 6:
+            # "3시" during class hours means 15:00
+            hour += 12
+        if hour > 23 or minute > 59:
+            return None
+        return _hhmm(hour, minute)
+
+    # --- intent matching ---
+
+    def match(self, question):
+        """Returns a match dict {intent, template, sparql, bindings, slots, reasoning} or None."""
+        buildings = self.find_buildings(question)
+        courses = self.find_courses(question)
+        facility = self.find_facility(question)
+
+        # Q3: building-to-building route
+        if len(buildings) >= 2 and not courses and _contains_any(question, ROUTE_WORDS):
+            a, b = buildings[0], buildings[1]
+            return self._make("route", None, {}, {"from": a, "to": b},
+                              f"Shortest accessible path from {a} to {b} over :Route (routing engine).")
+
+        # Q9: conflict-free, reachable combination of several courses
+        if len(courses) >= 2 and _contains_any(question, TIMETABLE_WORDS):
+            return self._make("timetable", None, {}, {"titles": courses},
+                              f"Search conflict-free, reachable combinations of {', '.join(courses)} "
+                              "(timetable solver).")
+
+        # Q7: sections of one course that start right after another course ends
+        if len(courses) == 2 and _contains_any(question, FOLLOW_WORDS):
+            before, title = courses
+            return self._make("course_after", "course_list", {}, {"before": before, "title": title},
+                              f"Sections of '{title}' starting within an hour after '{before}' ends "
+                              "on the same day, reachable by wheelchair (schedule index).")
+
+        # Q5: closest building with a facility, from where the user is
+        if len(buildings) == 1 and facility and not courses and _contains_any(question, NEAR_WORDS):
+            return self._make("nearest_facility", None, {}, {"building": buildings[0], "facility": facility},
+                              f"Closest buildings to {buildings[0]} with :hasFacility {facility}, "
+                              "ranked by accessible route distance (spatial grid + travel matrix).")
+
+        # Facility check on one building
+        if len(buildings) == 1 and facility and not courses and "있" in question:
+            fac_uri = URIRef(BASE_URI + facility)
+            return self._make("facility_check", "facility_check",
+                              {"bldgName": Literal(buildings[0]), "fac": fac_uri},
+                              {"building": buildings[0], "facility": facility},
+                              f"Check whether {buildings[0]} :hasFacility {facility}.")
+
+        # Q8: classes on a weekday held in wheelchair-accessible buildings
+        day = self.find_day(question)
+        if day is not None and not courses and not buildings and _contains_any(question, WHEELCHAIR_WORDS):
+            return self._make("day_accessible", "course_list", {}, {"day": day},
+                              f"Sections on {WEEKDAYS[day]}요일 held in buildings with a Lift/Ramp and "
+                              "no Curb/Steep hazard, best accessibility score first (schedule + accessibility index).")
+
+        if len(courses) != 1:
+            return None
+        title = courses[0]
+
+        # Q1: course time filter
+        limit = self.find_time(question)
+        if limit:
+            if _contains_any(question, START_WORDS) or _contains_any(question, AFTER_WORDS):
+                name, op = "course_start_after", ">="
+                field = "StartTime"
+            elif _contains_any(question, END_WORDS) or _contains_any(question, BEFORE_WORDS):
+                name, op = "course_end_before", "<"
+                field = "EndTime"
+            else:
+                return None
+            return self._make(name, name, {"title": Literal(title), "limit": Literal(limit)},
+                              {"title": title, "limit": limit},
+                              f"Find '{title}' sections and filter :{field} {op} '{limit}'.")
+
+        # Q2: where is the course held (+ building facilities)
+        if _contains_any(question, PLACE_WORDS):
+            return self._make("course_place", "course_place", {"title": Literal(title)},
+                              {"title": title, "wheelchair": _contains_any(question, WHEELCHAIR_WORDS)},
+                              f"Find '{title}' rooms and their buildings, with the buildings' facilities.")
+        return None
+
+    @staticmethod
+    def _make(intent, template, bindings, slots, reasoning):
+        return {
+            "intent": intent,
+            "template": template,
+            "sparql": TEMPLATES[template] if template else None,
+            "bindings": bindings,
+            "slots": slots,
+            "reasoning": f"(template: {intent}) {reasoning}",
+        }
+
+
+def display_sparql(match):
+    """Template text with its bindings listed, for the '근거 데이터 & SPARQL' expander."""
+    if match["intent"] == "route":
+        return route_display(match["slots"]["from"], match["slots"]["to"])
+    if match["intent"] == "timetable":
+        return timetable_display(match["slots"]["titles"])
+    if match["intent"] == "nearest_facility":
+        return nearest_display(match["slots"]["building"], match["slots"]["facility"])
+    lines = [f"# ?{k} = {v.n3()}" for k, v in match["bindings"].items()]
+    body = "\n".join(line[8:] if line.startswith("        ") else line
+                     for line in match["sparql"].strip("\n").splitlines())
+    return "\n".join(lines + [body])
+
+
+def route_display(src, dst):
+    return f"# routing engine (A*, accessible first)\n# shortest_path('{src}', '{dst}')"
+
+
+def timetable_display(titles):
+    return f"# timetable solver (bitmask DFS, ranked by transfer distance + gap)\n# plan_timetable({titles!r})"
+
+
+def nearest_display(building, facility):
+    return (f"# spatial grid + accessible travel matrix (plain routes as fallback)\n"
+            f"# nearest('{building}', ['{facility}'])")
+
+
+def _facility_names(facilities):
+    names = []
+    label_to_id = {"wc": "F_001", "lift": "F_002", "ramp": "F_003", "autodoor": "F_004"}
+    for label in [f.strip() for f in str(facilities).split(",") if f.strip()]:
+        fac_id = label_to_id.get(label.lower())
+        names.append(FACILITY_KEYWORDS[fac_id][0] if fac_id else label)
+    return names
+
+
+def render_route(src, dst, df):
+    """Answer for a routing-engine result frame (see GraphAgent.route_frame)."""
+    if df is None or df.empty:
+        return (f"{_josa(src, '과', '와')} {_josa(dst, '을', '를')} "
+                "잇는 경로 정보를 찾지 못했습니다.")
+    total = round(df["dist"].astype(float).sum(), 2)
+    if len(df) == 1:
+        answer = f"다음과 같은 경로가 있습니다 (거리: {total:g} m)."
+    else:
+        stops = [df.iloc[0]["fromName"]] + list(df["toName"])
+        answer = f"다음과 같은 경로가 있습니다 (거리: {total:g} m, {' → '.join(stops)})."
+    if not bool(df.iloc[0]["accessible"]):
+        hazards = sorted({h for hs in df["hazards"] for h in str(hs).split(", ") if h})
+        answer = ("턱이나 급경사 없이 엘리베이터/경사로가 있는 건물만 지나는 경로는 찾지 못했습니다. "
+                  "일반 경로를 안내합니다.\n" + answer)
+        if hazards:
+            answer += f"\n주의: 이 경로에는 {', '.join(hazards)} 구간이 있습니다."
+    return answer
+
+
+def render_nearest(building, facility, df):
+    """Answer for a nearest-facility frame (see GraphAgent.nearest_frame)."""
+    name = FACILITY_KEYWORDS[facility][0]
+    if df is None or df.empty:
+        return f"{building} 근처에서 {_josa(name, '이', '가')} 있는 건물을 찾지 못했습니다."
+    first = df.iloc[0]
+    if first["bldgName"] == building:
+        answer = f"{building}에 바로 {_josa(name, '이', '가')} 있습니다."
+    else:
+        answer = (f"{building}에서 가장 가까운, {_josa(name, '이', '가')} 있는 건물은 {first['bldgName']}입니다 "
+                  f"(경로 {first['dist']:g} m).")
+    if not bool(first["accessible"]):
+        answer = ("휠체어로 갈 수 있는 경로로는 찾지 못해 일반 경로 기준으로 안내합니다.\n" + answer)
+    lines = []
+    for _, r in df.iterrows():
+        hazard = f", 주의: {r['hazards']}" if r["hazards"] else ""
+        lines.append(f"- {r['bldgName']}: {r['dist']:g} m ({r['path']}{hazard})")
+    return answer + "\n" + "\n".join(lines)
+
+
+def render_timetable(titles, df):
+    """Answer for a timetable solver frame (see GraphAgent.timetable_frame)."""
+    names = ", ".join(f"'{t}'" for t in titles)
+    if df is None or df.empty:
+        return f"{names} 수업을 시간이 겹치지 않고 휠체어로 이동 가능하게 조합하는 방법을 찾지 못했습니다."
+    lines = [f"{names} 수업의 추천 조합입니다."]
+    for option, rows in df.groupby("option", sort=True):
+        first = rows.iloc[0]
+        lines.append(f"\n**조합 {option}** (이동 거리 {first['transfer_m']:g} m, 공강 {first['gap_min']}분)")
+        for _, r in rows.iterrows():
+            alt = f" (같은 시간 다른 분반: {r['alternatives']})" if r["alternatives"] else ""
+            lines.append(f"- {r['title']}: {r['days']} {r['time']} {r['room']}{alt}")
+    return "\n".join(lines)
+
+
+def render_answer(match, df):
+    """Korean answer for a template match (replaces generate_answer on the fast path)."""
+    slots = match["slots"]
+    intent = match["intent"]
+    if df is not None and "Error" in df.columns:
+        return "죄송합니다. 검색 중 오류가 발생했습니다. 잠시 후 다시 시도해 주세요."
+    empty = df is None or df.empty
+
+    if intent == "route":
+        return render_route(slots["from"], slots["to"], df)
+
+    if intent == "timetable":
+        return render_timetable(slots["titles"], df)
+
+    if intent == "nearest_facility":
+        return render_nearest(slots["building"], slots["facility"], df)
+
+    if intent == "course_after":
+        if empty:
+            return (f"'{slots['before']}' 수업이 끝나고 바로 이어서 들을 수 있는 "
+                    f"'{slots['title']}' 분반은 찾지 못했습니다.")
+        lines = [f"- {r['classRoom']} ({r['startTime']}~{r['endTime']})" for _, r in df.iterrows()]
+        return (f"'{slots['before']}' 수업이 끝나고 1시간 안에 시작하고 휠체어로 이동 가능한 "
+                f"'{slots['title']}' 분반은 {len(df)}개 있습니다.\n" + "\n".join(lines))
+
+    if intent == "day_accessible":
+        day = f"{WEEKDAYS[slots['day']]}요일"
+        if empty:
+            return f"{day}에 휠체어로 갈 수 있는 건물에서 열리는 수업은 찾지 못했습니다."
+        rows = df.sort_values(["startTime", "classRoom"])
+        lines = [f"- {r['startTime']}~{r['endTime']} {r['courseName']} ({r['classRoom']})"
+                 for _, r in rows.head(DAY_LIST_LIMIT).iterrows()]
+        if len(df) > DAY_LIST_LIMIT:
+            lines.append(f"- 외 {len(df) - DAY_LIST_LIMIT}개")
+        return (f"{day}에 엘리베이터나 경사로가 있고 턱·급경사가 없는 건물에서 열리는 수업은 "
+                f"{len(df)}개 있습니다.\n" + "\n".join(lines))
+
+    if intent == "facility_check":
+        name = FACILITY_KEYWORDS[slots["facility"]][0]
+        has = not empty and str(df.iloc[0]["hasFacility"]).lower() == "true"
+        if has:
+            return f"네, {slots['building']}에는 {_josa(name, '이', '가')} 있습니다."
+        return f"아니요, 현재 {slots['building']}에는 {name} 정보가 없습니다."
+
+    if intent in ("course_end_before", "course_start_after"):
+        hour_text = slots["limit"]
+        cond = f"{hour_text} 이전에 끝나는" if intent == "course_end_before" else f"{hour_text} 이후에 시작하는"
+        if empty:
+            return f"{cond} '{slots['title']}' 수업은 찾지 못했습니다."
+        lines = [f"- {r['classRoom']} ({r['startTime']}~{r['endTime']})" for _, r in df.iterrows()]
+        return f"{cond} '{slots['title']}' 수업은 {len(df)}개 있습니다.\n" + "\n".join(lines)
+
+    if intent == "course_place":
+        if empty:
+            return f"'{slots['title']}' 수업의 강의실 정보를 찾지 못했습니다."
+        lines = []
+        accessible_bldgs = set()
+        for _, r in df.iterrows():
+            facs = _facility_names(r.get("facilities", ""))
+            time_text = f" {r['startTime']}~{r['endTime']}" if r.get("startTime") not in (None, "None", "") else ""
+            fac_text = f" - 편의시설: {', '.join(facs)}" if facs else " - 편의시설 정보 없음"
+            lines.append(f"- {r['classRoom']}{time_text}{fac_text}")
+            # Section scores (GraphAgent._score_frame) also rule out Curb/Steep hazards
+            ok = r["accessible"] if "accessible" in df.columns else ("엘리베이터" in facs or "경사로" in facs)
+            if ok:
+                accessible_bldgs.add(r["bldgName"])
+        answer = f"'{slots['title']}' 수업은 다음 강의실에서 열립니다.\n" + "\n".join(lines)
+        if slots.get("wheelchair"):
+            if accessible_bldgs:
+                answer += f"\n\n휠체어로는 엘리베이터나 경사로가 있는 {', '.join(sorted(accessible_bldgs))} 강의실을 추천합니다."
+            else:
+                answer += "\n\n엘리베이터나 경사로가 확인된 건물이 없어 수강 전 확인이 필요합니다."
+        return answer
+
+    return "요청하신 정보를 찾지 못했습니다."
@@ -0,0 +1,282 @@
+"""
+Timetable combination solver (competency question 9).
+
+Every course section (C005) becomes a bitmask of 5-minute slots: one block of
+SLOTS_PER_DAY bits per weekday, packed into a single Python int, so two sections
+overlap iff `a.mask & b.mask`. The solver picks one section per required title
+with a depth-first search:
+
+    - most-constrained title first (fewest sections compatible with the partial mask)
+    - forward checking: backtrack as soon as a remaining title has no compatible section
+    - consecutive classes on a day must be reachable in the break (accessible distance);
+      an unreachable pair can never be fixed by a class in between (triangle inequality),
+      so it is pruned right away
+    - sections with the same days/time/building are searched once (the others are
+      reported as alternatives)
+    - branch and bound: transfer metres only grow as classes are added
+
+Results are ranked by the accessible transfer distance between consecutive
+classes, plus GAP_WEIGHT metres per idle minute between them.
+"""
+import heapq
+import math
+import time
+import urllib.parse
+
+from rdflib import Namespace, RDFS
+
+from schedule import WEEKDAYS, parse_minutes, parse_days, days_from_mask, format_minutes
+
+BASE_URI = "http://snu.ac.kr/barrier-free/"
+NS = Namespace(BASE_URI)
+DAYS_PREDICATE = NS[urllib.parse.quote("수업 요일")]
+# Triples whose change invalidates the loaded sections
+SECTION_PREDICATES = frozenset([NS.instanceOf, NS.title, NS.startMinute, NS.endMinute, NS.dayMask,
+                                NS.StartTime, NS.EndTime, DAYS_PREDICATE, NS.dayOfWeek,
+                                NS.isHeldAt, NS.isLocatedIn, NS.isHeldAt_BuildingLabel, RDFS.label])
+
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+WHEELCHAIR_M_PER_MIN = 50  # ~3 km/h
+GAP_WEIGHT = 5.0  # metres of transfer one idle minute is worth
+TIME_LIMIT = 1.0  # search budget in seconds; results are marked incomplete when it runs out
+
+
+def slot_mask(days, start, end):
+    block = 0
+    for slot in range(start // SLOT_MINUTES, -(-end // SLOT_MINUTES)):
+        block |= 1 << slot
+    mask = 0
+    for day in days:
+        mask |= block << (day * SLOTS_PER_DAY)
+    return mask
+
+
+class Section:
+    __slots__ = ("uri", "title", "days", "start", "end", "mask", "room", "building", "building_label", "key",
+                 "day_bits")
+
+    def __init__(self, uri, title, days, start, end, room, building, building_label):
+        self.uri = uri
+        self.title = title
+        self.days = days
+        self.start = start
+        self.end = end
+        self.mask = slot_mask(days, start, end)
+        self.day_bits = sum(1 << d for d in days)
+        self.room = room
+        self.building = building
+        self.building_label = building_label
+        self.key = None  # dense id assigned by TimetableSolver (transfer memo)
+
+    @property
+    def days_text(self):
+        return ",".join(WEEKDAYS[d] for d in self.days)
+
+    @property
+    def time_text(self):
+        return f"{format_minutes(self.start)}~{format_minutes(self.end)}"
+
+
+def load_sections(g):
+    """Course sections with a title, time and weekdays -> {title: [Section]}"""
+    by_title = {}
+    for course in g.subjects(NS.instanceOf, NS.C005):
+        title = g.value(course, NS.title)
+        # Typed minutes / weekday mask from build_graph.py; older graphs only have the strings
+        start, end, mask = (g.value(course, NS.startMinute), g.value(course, NS.endMinute),
+                            g.value(course, NS.dayMask))
+        start = int(start) if start is not None else parse_minutes(g.value(course, NS.StartTime))
+        end = int(end) if end is not None else parse_minutes(g.value(course, NS.EndTime))
+        if mask is not None:
+            days = days_from_mask(int(mask))
+        else:
+            days_value = g.value(course, DAYS_PREDICATE)
+            days = parse_days(days_value) if days_value is not None else []
+        if not days:
+            days = sorted({d for v in g.objects(course, NS.dayOfWeek) for d in parse_days(v)})
+        if title is None or start is None or end is None or end <= start or not days:
+            continue
+        room = g.value(course, NS.isHeldAt)
+        building = g.value(room, NS.isLocatedIn) if room is not None else None
+        room_label = g.value(room, RDFS.label) if room is not None else None
+        if building is not None:
+            bldg_label = g.value(building, RDFS.label)
+        else:
+            bldg_label = g.value(course, NS.isHeldAt_BuildingLabel)
+        by_title.setdefault(str(title), []).append(Section(
+            course, str(title), days, start, end,
+            str(room_label) if room_label is not None else "",
+            building, str(bldg_label) if bldg_label is not None else ""))
+    for sections in by_title.values():
+        sections.sort(key=lambda s: (s.days, s.start, str(s.uri)))
+    return by_title
+
+
+class TimetableSolver:
+    """
+    distance(a, b): accessible distance in metres between two building URIs
+    (inf if unreachable), e.g. TravelMatrix.distance.
+    """
+
+    def __init__(self, sections_by_title, distance, speed=WHEELCHAIR_M_PER_MIN, gap_weight=GAP_WEIGHT):
+        self.sections = sections_by_title
+        self.distance = distance
+        self.speed = speed
+        self.gap_weight = gap_weight
+        # Transfers are looked up hundreds of thousands of times per search; memoize them
+        # by dense section ids instead of hashing rdflib terms every time
+        self._transfers = {}
+        for key, section in enumerate(s for group in sections_by_title.values() for s in group):
+            section.key = key
+
+    def _transfer(self, a, b):
+        """(metres, idle minutes) from class a to the next class b on the same day, or None if unreachable."""
+        pair = (a.key, b.key)
+        if pair in self._transfers:
+            return self._transfers[pair]
+        gap = b.start - a.end
+        if a.building == b.building:
+            result = (0.0, gap)
+        else:
+            dist = math.inf
+            if a.building is not None and b.building is not None:
+                dist = self.distance(a.building, b.building)
+            result = (dist, gap) if math.isfinite(dist) and dist <= gap * self.speed else None
+        self._transfers[pair] = result
+        return result
+
+    def _insert_cost(self, day_lists, section):
+        """(transfer metres, gap minutes) added by `section`; None if a transfer becomes impossible."""
+        d_dist, d_gap = 0.0, 0
+        for day in section.days:
+            prev = nxt = None
+            for c in day_lists[day]:
+                if c.end <= section.start:
+                    prev = c
+                elif c.start >= section.end:
+                    nxt = c
+                    break
+            if prev is not None and nxt is not None:
+                old = self._transfer(prev, nxt)
+                d_dist -= old[0]
+                d_gap -= old[1]
+            for a, b in ((prev, section), (section, nxt)):
+                if a is None or b is None:
+                    continue
+                t = self._transfer(a, b)
+                if t is None:
+                    return None
+                d_dist += t[0]
+                d_gap += t[1]
+        return d_dist, d_gap
+
+    @staticmethod
+    def _group(sections):
+        """Sections that are interchangeable for the search -> (representative, [alternatives])"""
+        groups = {}
+        for s in sections:
+            groups.setdefault((tuple(s.days), s.start, s.end, s.building), []).append(s)
+        return [(group[0], group[1:]) for group in groups.values()]
+
+    def solve(self, titles, k=3, time_limit=TIME_LIMIT):
+        """
+        Best k conflict-free, reachable combinations (one section per title):
+            {"combos": [{"score", "transfer_m", "gap_min", "sections": [Section],
+                         "alternatives": {section uri: [Section]}}],
+             "missing": [titles without sections], "complete": bool, "nodes": int}
+        """
+        titles = list(dict.fromkeys(titles))
+        missing = [t for t in titles if not self.sections.get(t)]
+        if missing:
+            return {"combos": [], "missing": missing, "complete": True, "nodes": 0}
+
+        options = {t: self._group(self.sections[t]) for t in titles}
+        alternatives = {rep.uri: alts for groups in options.values() for rep, alts in groups}
+        best = []  # k best so far, max-heap on score: (-score, seq, combo)
+        state = {"nodes": 0, "seq": 0}
+        deadline = time.perf_counter() + time_limit
+        day_lists = [[] for _ in WEEKDAYS]
+
+        def bound():
+            return -best[0][0] if len(best) >= k else math.inf
+
+        def record(chosen, dist, gap):
+            score = dist + self.gap_weight * gap
+            if score >= bound():
+                return
+            state["seq"] += 1
+            ordered = sorted(chosen, key=lambda s: (s.days, s.start))
+            combo = {"score": score, "transfer_m": dist, "gap_min": gap, "sections": ordered,
+                     "alternatives": {s.uri: alternatives[s.uri] for s in ordered if alternatives[s.uri]}}
+            heapq.heappush(best, (-score, state["seq"], combo))
+            if len(best) > k:
+                heapq.heappop(best)
+
+        def fits_for(title, mask):
+            fits = []
+            for rep, _ in options[title]:
+                if rep.mask & mask:
+                    continue
+                delta = self._insert_cost(day_lists, rep)
+                if delta is not None:
+                    fits.append((delta[0] + self.gap_weight * delta[1], delta, rep))
+            return fits
+
+        def refit(fits, added, mask):
+            """Fits after `added` was placed: drop overlaps, re-cost only options on the same weekdays."""
+            out = []
+            for f in fits:
+                rep = f[2]
+                if rep.mask & mask:
+                    continue
+                if rep.day_bits & added.day_bits:
+                    delta = self._insert_cost(day_lists, rep)
+                    if delta is None:
+                        continue
+                    f = (delta[0] + self.gap_weight * delta[1], delta, rep)
+                out.append(f)
+            return out
+
+        def search(fits_by_title, mask, chosen, dist, gap):
+            """fits_by_title: remaining title -> [(score delta, (d_dist, d_gap), section)] that fit now"""
+            state["nodes"] += 1
+            if state["nodes"] % 256 == 0 and time.perf_counter() > deadline:
+                return False
+            if not fits_by_title:
+                record(chosen, dist, gap)
+                return True
+
+            # Forward checking: every remaining title needs a section that fits the partial schedule.
+            # Branch on the most constrained one; the largest per-title minimum bounds dist from below.
+            lower = 0.0
+            title = None
+            for t, fits in fits_by_title.items():
+                if not fits:
+                    return True
+                lower = max(lower, min(f[1][0] for f in fits))
+                if title is None or len(fits) < len(fits_by_title[title]):
+                    title = t
+            if dist + lower >= bound():
+                return True
+
+            for _, (d_dist, d_gap), s in sorted(fits_by_title[title], key=lambda f: f[0]):
+                if dist + d_dist >= bound():
+                    continue
+                for day in s.days:
+                    day_lists[day].append(s)
+                    day_lists[day].sort(key=lambda c: c.start)
+                chosen.append(s)
+                new_mask = mask | s.mask
+                rest = {t: refit(fits, s, new_mask) for t, fits in fits_by_title.items() if t != title}
+                ok = search(rest, new_mask, chosen, dist + d_dist, gap + d_gap)
+                chosen.pop()
+                for day in s.days:
+                    day_lists[day].remove(s)
+                if not ok:
+                    return False
+            return True
+
+        complete = search({t: fits_for(t, 0) for t in titles}, 0, [], 0.0, 0)
+        combos = [c for _, _, c in sorted(best, key=lambda x: -x[0])]
+        return {"combos": combos, "missing": [], "complete": complete, "nodes": state["nodes"]}
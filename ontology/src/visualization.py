@@ -0,0 +1,278 @@
+"""
+Knowledge graph visualization (pyvis / vis.js) for the Visualization page.
+
+NetworkView collects every node and edge in one pass over the triples (properties for
+the hover text included) instead of one SPARQL query per node, and keeps them in
+dicts so the network is rendered without pyvis' linear duplicate checks. It is a
+per-version index of GraphAgent: pages are rendered once per graph version, and a
+facility toggle patches the affected edge/node into a copy instead of rebuilding
+(see GraphAgent.network_page).
+
+The browser never gets the whole graph, only one of two bounded pages:
+    overview  buildings, facilities and routes; rooms are collapsed into their building
+              and courses into their room unless that building/room is expanded
+    focus     the k-hop neighbourhood of one building / room / course
+Both are cut at MAX_NODES nodes (closest to the top of the hierarchy / the focus first).
+"""
+from collections import defaultdict, deque
+
+from rdflib import Namespace, RDFS, URIRef
+from pyvis.network import Network
+
+# Namespace for RDF operations (Must match graph_agent.py)
+NS = Namespace("http://snu.ac.kr/barrier-free/")
+
+BUILDING = {"color": "#FF6B6B", "shape": "dot", "size": 25}
+ROOM = {"color": "#4ECDC4", "shape": "dot", "size": 15}
+FACILITY = {"color": "#FFE66D", "shape": "diamond", "size": 20}
+ROUTE = {"color": "#95A5A6", "shape": "triangle", "size": 15}
+COURSE = {"color": "#B39DDB", "shape": "square", "size": 10}
+HOVER_MAX_CHARS = 50
+
+MAX_NODES = 300  # per rendered page, whatever the graph size
+FOCUS_HOPS = 2
+MAX_PAGES = 32  # rendered pages kept per view
+MAX_MATCHES = 20  # nodes offered for one typed name (a course title has many sections)
+# Overview priority (lower first) when the page is cut at MAX_NODES
+KIND_RANK = {"building": 0, "facility": 1, "route": 2, "room": 3, "course": 4}
+
+
+def _local(uri):
+    s = str(uri)
+    if "#" in s: return s.split("#")[-1]
+    if "/" in s: return s.split("/")[-1]
+    return s
+
+
+def hover_text(props):
+    """Tooltip for a node from its (predicate, object) pairs: literal values only."""
+    info = []
+    for p, o in props:
+        p_base = _local(p)
+        # 1. Hide instanceOf / type
+        if "instanceof" in p_base.lower() or "type" in p_base.lower():
+            continue
+        # 2. Lat/Long (xsd:float literals)
+        if "Lat" in p_base or "Long" in p_base:
+            label = "위도" if "Lat" in p_base else "경도"
+            info.append(f"{label}: {o}")
+            continue
+        # 3. Filter other Relations
+        if isinstance(o, URIRef):
+            continue
+        o_display = str(o)
+        if len(o_display) > HOVER_MAX_CHARS:
+            o_display = o_display[:HOVER_MAX_CHARS] + "..."
+        info.append(f"{p_base}: {o_display}")
+    return "\n".join(info)
+
+
+class NetworkView:
+    """
+    nodes: {id: vis.js node}, edges: {(from, to): vis.js edge}, both in insertion order
+    (buildings, rooms, facilities, routes, courses).
+    kind: {id: 'building' | 'room' | ...}, parent: room -> building, course -> room.
+    """
+
+    def __init__(self, g):
+        props = defaultdict(list)  # subject -> [(predicate, object)]
+        kinds = defaultdict(set)   # class -> {subject}
+        located, facilities, endpoints, held = [], [], [], []
+        for s, p, o in g:
+            props[s].append((p, o))
+            if p == NS.instanceOf:
+                kinds[o].add(s)
+            elif p == NS.isLocatedIn:
+                located.append((s, o))
+            elif p == NS.hasFacility:
+                facilities.append((s, o))
+            elif p == NS.isEndpointOf:
+                endpoints.append((s, o))
+            elif p == NS.isHeldAt:
+                held.append((s, o))
+        self._props = props
+        self.nodes, self.edges = {}, {}
+        self.kind, self.parent = {}, {}
+        self._pages = {}
+
+        for b in sorted(kinds[NS.C001], key=str):
+            self._add_node(b, BUILDING, "building")
+        for r, b in sorted(located, key=str):
+            if r in kinds[NS.C003] and str(b) in self.nodes:
+                self._add_node(r, ROOM, "room")
+                self._add_edge(r, b, "isLocatedIn")
+                self.parent.setdefault(str(r), str(b))
+        for b, f in sorted(facilities, key=str):
+            self._add_facility(b, f)
+        for b, r in sorted(endpoints, key=str):
+            if r in kinds[NS.C004] and str(b) in self.nodes:
+                self._add_node(r, ROUTE, "route")
+                self._add_edge(b, r, "isEndpointOf")
+        for c, r in sorted(held, key=str):
+            if c in kinds[NS.C005] and self.kind.get(str(r)) == "room":
+                self._add_node(c, COURSE, "course")
+                self._add_edge(c, r, "isHeldAt")
+                self.parent.setdefault(str(c), str(r))
+        self.children = defaultdict(list)
+        for child, parent in self.parent.items():
+            self.children[parent].append(child)
+
+    def _label(self, node):
+        labels = [o for p, o in self._props.get(node, ()) if p in (RDFS.label, NS.title)]
+        return str(min(labels, key=str)) if labels else _local(node)
+
+    def _add_node(self, node, style, kind):
+        if str(node) not in self.nodes:
+            self.nodes[str(node)] = {"id": str(node), "label": self._label(node), "shape": style["shape"],
+                                     "color": style["color"], "size": style["size"],
+                                     "title": hover_text(self._props.get(node, ()))}
+            self.kind[str(node)] = kind
+
+    def _add_edge(self, src, dst, title, color=None):
+        edge = {"from": str(src), "to": str(dst), "title": title}
+        if color:
+            edge["color"] = color
+        self.edges.setdefault((str(src), str(dst)), edge)
+
+    def _add_facility(self, bldg, fac):
+        # Facilities are shown only when labeled, and attached to a shown building
+        if str(bldg) in self.nodes and any(p == RDFS.label for p, _ in self._props.get(fac, ())):
+            self._add_node(fac, FACILITY, "facility")
+            self._add_edge(bldg, fac, "hasFacility", FACILITY["color"])
+
+    # --- incremental updates (GraphAgent._on_mutation) ---
+
+    def copy(self):
+        new = NetworkView.__new__(NetworkView)
+        new._props = self._props  # shared: only :hasFacility changes are patched, others rebuild
+        new.parent, new.children = self.parent, self.children
+        new.nodes, new.edges, new.kind = dict(self.nodes), dict(self.edges), dict(self.kind)
+        new._pages = {}
+        return new
+
+    def update(self, triple, present):
+        """
+        Applies a (bldg :hasFacility fac) change to the nodes/edges.
+        Returns the diff: {"nodes": {"added", "removed"}, "edges": {"added", "removed"}}.
+        """
+        bldg, _, fac = triple
+        nodes, edges = set(self.nodes), set(self.edges)
+        if present:
+            self._add_facility(bldg, fac)
+        else:
+            self.edges.pop((str(bldg), str(fac)), None)
+            if str(fac) in self.nodes and not any(dst == str(fac) for _, dst in self.edges):
+                del self.nodes[str(fac)]
+                del self.kind[str(fac)]
+        self._pages = {}
+        return {"nodes": {"added": sorted(set(self.nodes) - nodes), "removed": sorted(nodes - set(self.nodes))},
+                "edges": {"added": sorted(set(self.edges) - edges), "removed": sorted(edges - set(self.edges))}}
+
+    # --- bounded pages ---
+
+    def _visible(self, node, expanded):
+        parent = self.parent.get(node)
+        while parent is not None:
+            if parent not in expanded:
+                return False
+            parent = self.parent.get(parent)
+        return True
+
+    def overview(self, expanded=(), max_nodes=MAX_NODES):
+        """
+        Level-of-detail elements: rooms/courses only under the `expanded` buildings/rooms,
+        collapsed ones counted on their parent. Returns (nodes, edges, hidden node count).
+        """
+        expanded = set(expanded)
+        ids = sorted((n for n in self.nodes if self._visible(n, expanded)), key=lambda n: KIND_RANK[self.kind[n]])
+        hidden = max(0, len(ids) - max_nodes)
+        nodes = []
+        for n in ids[:max_nodes]:
+            node = self.nodes[n]
+            folded = len(self.children.get(n, ())) if n not in expanded else 0
+            if folded:
+                node = dict(node, label=f"{node['label']} (+{folded})",
+                            title=f"{node['title']}\n펼치면 {folded}개 더 보기".lstrip("\n"))
+            nodes.append(node)
+        return nodes, self._edges_among(nodes), hidden
+
+    def focus(self, center, hops=FOCUS_HOPS, max_nodes=MAX_NODES):
+        """Nodes within `hops` edges of `center` (nearest first), as overview() returns."""
+        if center not in self.nodes:
+            return [], [], 0
+        adjacency = defaultdict(list)
+        for src, dst in self.edges:
+            adjacency[src].append(dst)
+            adjacency[dst].append(src)
+        depth, queue = {center: 0}, deque([center])
+        while queue:
+            n = queue.popleft()
+            if depth[n] < hops:
+                for m in adjacency[n]:
+                    if m not in depth:
+                        depth[m] = depth[n] + 1
+                        queue.append(m)
+        ids = list(depth)  # BFS order: by hop count
+        nodes = [self.nodes[n] for n in ids[:max_nodes]]
+        nodes[0] = dict(nodes[0], borderWidth=4, size=nodes[0]["size"] + 10)
+        return nodes, self._edges_among(nodes), max(0, len(ids) - max_nodes)
+
+    def _edges_among(self, nodes):
+        shown = {n["id"] for n in nodes}
+        return [e for (src, dst), e in self.edges.items() if src in shown and dst in shown]
+
+    def page(self, expanded=(), focus=None, hops=FOCUS_HOPS, max_nodes=MAX_NODES):
+        """Rendered overview/focus page, cached: {"html", "nodes", "edges", "hidden"}."""
+        key = (tuple(sorted(expanded)), focus, hops, max_nodes)
+        page = self._pages.get(key)
+        if page is None:
+            if focus is not None:
+                nodes, edges, hidden = self.focus(focus, hops, max_nodes)
+            else:
+                nodes, edges, hidden = self.overview(expanded, max_nodes)
+            page = {"html": render_html(self.network(nodes, edges)),
+                    "nodes": len(nodes), "edges": len(edges), "hidden": hidden}
+            self._pages[key] = page
+            if len(self._pages) > MAX_PAGES:
+                del self._pages[next(iter(self._pages))]
+        return page
+
+    def matching(self, uris, kinds=None, expandable=False, limit=MAX_MATCHES):
+        """
+        [(id, label)] of the nodes among `uris` (e.g. LabelIndex.resolve of a typed name),
+        of the given kinds / with collapsed children only, at most `limit` of them.
+        """
+        found = []
+        for uri in uris:
+            n = str(uri)
+            if n in self.nodes and (kinds is None or self.kind[n] in kinds) \
+                    and (not expandable or self.children.get(n)):
+                parent = self.parent.get(n)
+                label = self.nodes[n]["label"]
+                # Sections share their title: tell them apart by room
+                found.append((n, f"{label} ({self.nodes[parent]['label']})" if parent else label))
+        return found[:limit]
+
+    # --- rendering ---
+
+    def network(self, nodes=None, edges=None):
+        net = Network(height="600px", width="100%", bgcolor="#ffffff", font_color="black", notebook=False)
+        # Filled directly: add_node/add_edge scan every existing node/edge for duplicates
+        net.nodes = list(self.nodes.values()) if nodes is None else list(nodes)
+        net.edges = list(self.edges.values()) if edges is None else list(edges)
+        net.node_ids = [n["id"] for n in net.nodes]
+        net.node_map = {n["id"]: n for n in net.nodes}
+        return net
+
+    def html(self, **page):
+        return self.page(**page)["html"]
+
+
+def build_network(g):
+    """Builds the pyvis network (buildings, rooms, facilities, routes) for the current graph."""
+    return NetworkView(g).network()
+
+
+def render_html(net):
+    """HTML page for the network (rendered in memory, nothing written to disk)."""
+    return net.generate_html()
@@ -1,4 +1,8 @@
-from src.graph_agent import GraphAgent
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+from graph_agent import GraphAgent
 
 def test_manual():
     print("Initializing Agent...")
@@ -0,0 +1,30 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+from build_graph import build_knowledge_graph, DATA_DIR
+from snapshot import load_snapshot, snapshot_path, write_snapshot
+
+CSV_DIR = os.path.join(DATA_DIR, "csv")
+
+
+def test_noop_build_returns_early(tmp_path, capsys):
+    ttl = str(tmp_path / "kg.ttl")
+    build_knowledge_graph(CSV_DIR, ttl)
+    mtime = os.path.getmtime(snapshot_path(ttl))
+    capsys.readouterr()
+    build_knowledge_graph(CSV_DIR, ttl)
+    assert "up to date" in capsys.readouterr().out
+    assert os.path.getmtime(snapshot_path(ttl)) == mtime
+    assert "travel" in load_snapshot(ttl)[1]
+
+
+def test_snapshot_without_manifest_is_rebuilt(tmp_path, capsys):
+    ttl = str(tmp_path / "kg.ttl")
+    build_knowledge_graph(CSV_DIR, ttl)
+    # As load_graph writes it after a TTL parse: no schema, travel matrix or manifest digest
+    write_snapshot(load_snapshot(ttl)[0], ttl)
+    capsys.readouterr()
+    build_knowledge_graph(CSV_DIR, ttl)
+    assert "up to date" not in capsys.readouterr().out
+    assert "travel" in load_snapshot(ttl)[1]
@@ -0,0 +1,65 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+from graph_agent import GraphAgent, NS
+from llm_backend import StubBackend
+
+# The writer toggles both facilities of this building in one apply_changes,
+# so a reader must always see both of them or neither
+BLDG = NS.N003
+PAIR = [(BLDG, NS.hasFacility, NS.F_002), (BLDG, NS.hasFacility, NS.F_003)]
+QUESTIONS = ["25동에 엘리베이터 있어?", "43-1동에서 25동까지 휠체어로 가는 길 알려줘"]
+
+
+def test_concurrency(readers=4, seconds=5):
+    print("Initializing Agent...")
+    agent = GraphAgent(backend=StubBackend(), sparql_cache_path="/tmp/test_concurrency.sqlite",
+                       journal_path="/tmp/test_concurrency.journal")
+    stop = threading.Event()
+    errors, reads, writes = [], [0] * readers, [0]
+
+    def read(i):
+        while not stop.is_set():
+            try:
+                with agent.pinned():
+                    version = agent.version
+                    present = [t in agent.g for t in PAIR]
+                    assert present[0] == present[1], f"half-applied change: {present}"
+                    agent.process_query(QUESTIONS[reads[i] % len(QUESTIONS)])
+                    assert agent.version == version, "version changed under a pinned reader"
+                    router = agent.get_router()
+                    assert (NS.F_002 in router.facilities[BLDG]) == present[0], "stale router"
+                reads[i] += 1
+            except Exception as e:
+                errors.append(repr(e))
+                stop.set()
+
+    def write():
+        on = False
+        while not stop.is_set():
+            agent.apply_changes(added=PAIR if on else (), removed=() if on else PAIR)
+            on = not on
+            writes[0] += 1
+            time.sleep(0.001)
+
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+    threads.append(threading.Thread(target=write))
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    agent.reset_changes()
+
+    print(f"{sum(reads)} queries ({sum(reads) / elapsed:.0f}/s) with {writes[0]} writes in {elapsed:.1f}s")
+    print(f"Errors: {errors[:3] or 'none'}")
+    assert not errors
+
+if __name__ == "__main__":
+    test_concurrency()
@@ -0,0 +1,64 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+from rdflib import Namespace
+from journal import Journal
+
+NS = Namespace("http://snu.ac.kr/barrier-free/")
+LIFT = (NS.N003, NS.hasFacility, NS.F_002)
+RAMP = (NS.N003, NS.hasFacility, NS.F_003)
+WC = (NS.N002, NS.hasFacility, NS.F_001)
+
+
+def test_replay_folds_to_last_operation(tmp_path):
+    journal = Journal(str(tmp_path / "kg.journal"))
+    journal.log_changes(added=[], removed=[LIFT, RAMP])
+    journal.log_changes(added=[LIFT], removed=[])
+    journal.log_report({"text": "25동 엘리베이터 고장", "ts": 1.0})
+    journal.close()
+    added, removed, reports = Journal(journal.path).replay()
+    assert added == [LIFT] and removed == [RAMP]
+    assert reports == [{"text": "25동 엘리베이터 고장", "ts": 1.0}]
+
+
+def test_reset_drops_earlier_changes(tmp_path):
+    journal = Journal(str(tmp_path / "kg.journal"))
+    journal.log_changes(added=[], removed=[LIFT])
+    journal.log_reset()
+    journal.log_changes(added=[], removed=[WC])
+    journal.close()
+    assert Journal(journal.path).replay() == ([], [WC], [])
+
+
+def test_torn_tail_is_dropped_and_truncated(tmp_path):
+    journal = Journal(str(tmp_path / "kg.journal"))
+    journal.log_changes(added=[], removed=[LIFT])
+    journal.close()
+    size = os.path.getsize(journal.path)
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"op": "change", "added": [], "removed": [["<http://snu')  # crash mid-write
+    replayed = Journal(journal.path)
+    assert replayed.replay() == ([], [LIFT], [])
+    assert os.path.getsize(journal.path) == size
+    # Appends after the truncation replay normally
+    replayed.log_changes(added=[], removed=[RAMP])
+    replayed.close()
+    assert Journal(journal.path).replay() == ([], [LIFT, RAMP], [])
+
+
+def test_checkpoint_replaces_history(tmp_path):
+    journal = Journal(str(tmp_path / "kg.journal"), compact_every=3)
+    journal.log_changes(added=[], removed=[LIFT])
+    journal.log_changes(added=[], removed=[RAMP])
+    journal.log_report({"text": "경사로 파손", "ts": 2.0})
+    assert journal.needs_compaction
+    journal.compact(added=[], removed=[LIFT, RAMP], reports=[{"text": "경사로 파손", "ts": 2.0}])
+    assert not journal.needs_compaction
+    journal.log_changes(added=[LIFT], removed=[])
+    journal.close()
+    with open(journal.path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+    replayed = Journal(journal.path)
+    assert replayed.replay() == ([LIFT], [RAMP], [{"text": "경사로 파손", "ts": 2.0}])
+    assert replayed.records == 2
@@ -0,0 +1,78 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+from rdflib import Graph, Literal, Namespace, RDFS
+from label_index import LabelIndex, rewrite_label_filters
+
+NS = Namespace("http://snu.ac.kr/barrier-free/")
+
+
+def index():
+    g = Graph()
+    g.add((NS.N003, RDFS.label, Literal("25동")))
+    g.add((NS.N002, RDFS.label, Literal("24동")))
+    g.add((NS.F_002, RDFS.label, Literal("lift")))
+    g.add((NS["10101"], NS.title, Literal("수학1")))
+    g.add((NS["10201"], NS.title, Literal("수학연습1")))
+    return LabelIndex(g)
+
+
+def test_regex_on_label_becomes_values():
+    sparql = "SELECT ?b WHERE { ?b rdfs:label ?name . FILTER(REGEX(?name, '25동', 'i')) }"
+    rewritten, count = rewrite_label_filters(sparql, index())
+    assert count == 1
+    assert rewritten == "SELECT ?b WHERE { ?b rdfs:label ?name . VALUES ?name { \"25동\" } }"
+
+
+def test_substring_matches_every_label():
+    sparql = "SELECT ?c WHERE { ?c :title ?t . FILTER(REGEX(STR(?t), \"수학\")) }"
+    rewritten, count = rewrite_label_filters(sparql, index())
+    assert count == 1 and 'VALUES ?t { "수학1" "수학연습1" }' in rewritten
+
+
+def test_case_folded():
+    rewritten, _ = rewrite_label_filters("SELECT ?f WHERE { ?f rdfs:label ?l . FILTER(REGEX(?l, 'LIFT', 'i')) }",
+                                         index())
+    assert 'VALUES ?l { "lift" }' in rewritten
+
+
+def test_keeps_regex_semantics():
+    idx = index()
+    # Case-sensitive without 'i'
+    rewritten, _ = rewrite_label_filters("SELECT ?f WHERE { ?f rdfs:label ?l . FILTER(REGEX(?l, 'Lift')) }", idx)
+    assert "FILTER(false)" in rewritten
+    rewritten, _ = rewrite_label_filters("SELECT ?f WHERE { ?f rdfs:label ?l . FILTER(REGEX(?l, 'lif')) }", idx)
+    assert 'VALUES ?l { "lift" }' in rewritten
+    # No whitespace normalization, with or without 'i'
+    rewritten, _ = rewrite_label_filters("SELECT ?b WHERE { ?b rdfs:label ?l . FILTER(REGEX(?l, '25 동', 'i')) }", idx)
+    assert "FILTER(false)" in rewritten
+
+
+def test_no_match_is_false():
+    rewritten, count = rewrite_label_filters(
+        "SELECT ?b WHERE { ?b rdfs:label ?l . FILTER(REGEX(?l, '도서관')) }", index())
+    assert count == 1 and "FILTER(false)" in rewritten
+
+
+def test_left_alone():
+    idx = index()
+    # Real regex syntax
+    sparql = "SELECT ?b WHERE { ?b rdfs:label ?l . FILTER(REGEX(?l, '^25')) }"
+    assert rewrite_label_filters(sparql, idx) == (sparql, 0)
+    # Variable not bound to a label
+    sparql = "SELECT ?b WHERE { ?b :EndTime ?e . FILTER(REGEX(?e, '10')) }"
+    assert rewrite_label_filters(sparql, idx) == (sparql, 0)
+    # Nothing for the index to narrow on
+    sparql = "SELECT ?b WHERE { ?b rdfs:label ?l . FILTER(REGEX(?l, ' ')) }"
+    assert rewrite_label_filters(sparql, idx) == (sparql, 0)
+
+
+def test_resolve_tracks_mutations():
+    idx = index()
+    assert idx.resolve("25동") == [NS.N003]
+    copy = idx.copy()
+    idx.remove(NS.N003, Literal("25동"))
+    idx.add(NS.N004, Literal("26동"))
+    assert idx.resolve("25동") == [] and idx.resolve("26동") == [NS.N004]
+    assert copy.resolve("25동") == [NS.N003] and copy.resolve("26동") == []
@@ -0,0 +1,57 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+from google.api_core import exceptions as google_exceptions
+from llm_backend import acall_with_retry, call_with_retry, is_transient
+
+
+def failing(errors):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+    return fn, calls
+
+
+def test_transient_errors():
+    assert is_transient(google_exceptions.ResourceExhausted("quota"))
+    assert is_transient(google_exceptions.ServiceUnavailable("busy"))
+    assert is_transient(TimeoutError())
+    assert not is_transient(google_exceptions.PermissionDenied("bad key"))
+    assert not is_transient(ValueError("blocked by safety"))
+    assert not is_transient(AttributeError("'NoneType' object has no attribute 'generate'"))
+
+
+def test_retries_transient_then_succeeds(caplog, capsys):
+    fn, calls = failing([google_exceptions.ResourceExhausted("quota"), TimeoutError()])
+    assert call_with_retry(fn, retries=3, backoff=0) == "ok"
+    assert len(calls) == 3
+    # Reported through logging, not stdout
+    assert [r.name for r in caplog.records] == ["llm_backend", "llm_backend"]
+    assert capsys.readouterr().out == ""
+
+
+def test_non_transient_fails_fast():
+    fn, calls = failing([ValueError("blocked")])
+    with pytest.raises(ValueError):
+        call_with_retry(fn, retries=3, backoff=10)
+    assert len(calls) == 1
+
+
+def test_async_non_transient_fails_fast():
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        raise google_exceptions.PermissionDenied("bad key")
+
+    with pytest.raises(google_exceptions.PermissionDenied):
+        asyncio.run(acall_with_retry(fn, retries=3, backoff=10))
+    assert len(calls) == 1
@@ -0,0 +1,25 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+from rdflib import Literal
+from graph_agent import GraphAgent, NS
+from llm_backend import StubBackend
+
+
+def test_pinned_reader_keeps_its_schema(tmp_path):
+    agent = GraphAgent(backend=StubBackend(), sparql_cache_path=str(tmp_path / "cache.sqlite"),
+                       journal_path=str(tmp_path / "kg.journal"))
+    triple = (NS.N003, NS.newPredicate, Literal("x"))
+    with agent.pinned():
+        version, schema = agent.version, agent.get_schema_summary()
+        writer = threading.Thread(target=lambda: agent.apply_changes(added=[triple]))
+        writer.start()
+        writer.join()
+        assert agent.version == version
+        assert agent.get_schema_summary() is schema
+        assert ":newPredicate" not in schema
+    assert ":newPredicate" in agent.get_schema_summary()
+    agent.reset_changes()
+    assert ":newPredicate" not in agent.get_schema_summary()
@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+from query_cache import normalize_sparql, prepare_sparql, strip_comments
+from rdflib import Namespace
+
+NS = Namespace("http://snu.ac.kr/barrier-free/")
+
+
+def test_quote_inside_comment():
+    sparql = "SELECT ?b WHERE {\n  # buildings with a 'Lift'\n  ?b :hasFacility :F_002 }"
+    key = normalize_sparql(sparql)
+    assert key == "SELECT ?b WHERE { ?b :hasFacility :F_002 }"
+    prepare_sparql(key, {"": NS})
+
+
+def test_hash_inside_literal_and_iri():
+    sparql = "SELECT ?x WHERE { ?x ?p 'a # b' . <http://x/#frag> ?p ?o } # trailing"
+    assert strip_comments(sparql).rstrip() == "SELECT ?x WHERE { ?x ?p 'a # b' . <http://x/#frag> ?p ?o }"
+    assert "'a # b'" in normalize_sparql(sparql)
+
+
+def test_empty_literal_kept():
+    assert strip_comments('SELECT ?x WHERE { ?x ?p "" }') == 'SELECT ?x WHERE { ?x ?p "" }'
+
+
+def test_whitespace_and_comments_share_a_key():
+    a = "SELECT ?b\nWHERE {  ?b :hasFacility :F_002 }"
+    b = "SELECT ?b WHERE { # it's a lift\n ?b :hasFacility :F_002 }"
+    assert normalize_sparql(a) == normalize_sparql(b)
+
+
+def test_literal_whitespace_distinguishes_keys():
+    assert normalize_sparql("SELECT * WHERE { ?s ?p 'a  b' }") != normalize_sparql("SELECT * WHERE { ?s ?p 'a b' }")
@@ -0,0 +1,93 @@
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+from rdflib import Graph, Literal, Namespace, RDFS, XSD
+from routing import ACCESS_FACILITIES, RouteGraph, TravelMatrix
+
+NS = Namespace("http://snu.ac.kr/barrier-free/")
+
+
+def campus(n=14, extra_routes=10, seed=7):
+    """Random connected campus: n buildings, a spanning tree of routes plus extra ones."""
+    rng = random.Random(seed)
+    g = Graph()
+    bldgs = [NS[f"N{i:03d}"] for i in range(n)]
+    for i, b in enumerate(bldgs):
+        g.add((b, NS.instanceOf, NS.C001))
+        g.add((b, RDFS.label, Literal(f"{i}동")))
+        g.add((b, NS.getLat, Literal(37.45 + rng.random() * 0.01, datatype=XSD.float)))
+        g.add((b, NS.getLong, Literal(126.95 + rng.random() * 0.01, datatype=XSD.float)))
+        if rng.random() < 0.7:
+            g.add((b, NS.hasFacility, rng.choice([NS.F_002, NS.F_003])))
+    pairs = [(rng.randrange(i), i) for i in range(1, n)]
+    pairs += [tuple(rng.sample(range(n), 2)) for _ in range(extra_routes)]
+    for k, (a, b) in enumerate(pairs):
+        route = NS[f"R_{k:03d}"]
+        g.add((bldgs[a], NS.isEndpointOf, route))
+        g.add((bldgs[b], NS.isEndpointOf, route))
+        g.add((route, NS.distance, Literal(float(rng.randint(100, 900)), datatype=XSD.float)))
+        if rng.random() < 0.1:
+            g.add((route, NS.hasHazard, NS.H_001))
+    return g, bldgs
+
+
+def assert_same_matrix(patched, fresh):
+    assert patched.nodes == fresh.nodes
+    assert np.array_equal(np.isinf(patched.dist), np.isinf(fresh.dist))
+    finite = np.isfinite(fresh.dist)
+    assert np.allclose(patched.dist[finite], fresh.dist[finite])
+    assert np.array_equal(patched.accessible, fresh.accessible)
+
+
+def assert_paths_match_distances(matrix, router):
+    for a in matrix.nodes:
+        for b in matrix.nodes:
+            path = matrix.path(a, b)
+            if not np.isfinite(matrix.distance(a, b)):
+                assert path == []
+                continue
+            assert path[0] == a and path[-1] == b
+            hops = [min(d for n, _, d in router.accessible_neighbours(x) if n == y) for x, y in zip(path, path[1:])]
+            assert np.isclose(sum(hops), matrix.distance(a, b))
+
+
+def test_update_building_matches_full_recompute():
+    g, bldgs = campus()
+    router = RouteGraph(g)
+    matrix = TravelMatrix.from_router(router)
+    rng = random.Random(3)
+    for _ in range(40):
+        bldg = rng.choice(bldgs)
+        facilities = router.facilities[bldg]
+        # Toggle the building's access (as the Maintenance page does with Lift/Ramp)
+        if facilities & ACCESS_FACILITIES:
+            facilities -= ACCESS_FACILITIES
+        else:
+            facilities.add(NS.F_002)
+        matrix.update_building(router, bldg)
+        assert_same_matrix(matrix, TravelMatrix.from_router(router))
+    assert_paths_match_distances(matrix, router)
+
+
+def test_unchanged_accessibility_recomputes_nothing():
+    g, bldgs = campus()
+    router = RouteGraph(g)
+    matrix = TravelMatrix.from_router(router)
+    bldg = next(b for b in bldgs if router.building_ok(b))
+    router.facilities[bldg].add(NS.F_001)  # a WC does not change accessibility
+    assert matrix.update_building(router, bldg) == 0
+
+
+def test_state_round_trip_is_independent():
+    g, bldgs = campus()
+    router = RouteGraph(g)
+    state = TravelMatrix.from_router(router).to_state()
+    matrix = TravelMatrix.from_state(state)
+    bldg = next(b for b in bldgs if router.building_ok(b))
+    router.facilities[bldg] -= ACCESS_FACILITIES
+    matrix.update_building(router, bldg)
+    assert_same_matrix(TravelMatrix.from_state(state), TravelMatrix.from_router(RouteGraph(g)))
@@ -0,0 +1,28 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+from sparql_cache import SparqlCache, normalize_question
+
+VOCABULARY = {"경사로", "25동", "엘리베이터"}
+
+
+def test_particles_and_spacing():
+    assert normalize_question("500동에 엘리베이터 있어?") == "500동 엘리베이터 있어"
+    assert normalize_question(" 500동에  엘리베이터  있어 ") == "500동 엘리베이터 있어"
+    assert normalize_question("43-1동에서 출발") == "43-1동 출발"
+
+
+def test_vocabulary_word_not_stripped():
+    ramp = normalize_question("25동에 경사로 있어?", VOCABULARY)
+    slope = normalize_question("25동에 경사 있어?", VOCABULARY)
+    assert ramp != slope
+    assert slope == normalize_question("25동에 경사가 있어?", VOCABULARY)
+
+
+def test_cache_keeps_ramp_and_slope_apart(tmp_path):
+    cache = SparqlCache(str(tmp_path / "cache.sqlite"), vocabulary=VOCABULARY)
+    cache.put("25동에 경사로 있어?", {"reasoning": "ramp", "sparql": "ASK { :N003 :hasFacility :F_003 }"})
+    assert cache.get("25동에 경사 있어?") is None
+    assert cache.get("25동에 경사가 있어?") is None
+    assert cache.get("25동에 경사로 있어")["reasoning"] == "ramp"
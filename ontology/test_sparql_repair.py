@@ -0,0 +1,98 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+from rdflib import Graph, Literal, Namespace, RDFS
+from label_index import LabelIndex
+from sparql_repair import SparqlRepairer, parse_llm_json
+
+NS = Namespace("http://snu.ac.kr/barrier-free/")
+PREDICATES = ["instanceOf", "title", "isHeldAt", "isLocatedIn", "hasFacility", "EndTime", "distance"]
+
+
+def repairer():
+    g = Graph()
+    g.bind("", NS)
+    g.bind("rdfs", RDFS)
+    g.add((NS.C001, RDFS.label, Literal("Building")))
+    g.add((NS.N003, RDFS.label, Literal("25동")))
+    g.add((NS.N003, NS.instanceOf, NS.C001))
+    g.add((NS.F_002, RDFS.label, Literal("lift")))
+    g.add((NS.N003, NS.hasFacility, NS.F_002))
+    g.add((NS.R101, NS.isLocatedIn, NS.N003))
+    g.add((NS["10101"], NS.title, Literal("수학1")))
+    g.add((NS["10101"], NS.isHeldAt, NS.R101))
+    g.add((NS["10101"], NS.EndTime, Literal("09:50")))
+    return SparqlRepairer(g, LabelIndex(g), PREDICATES, g.namespaces()), g
+
+
+def test_valid_query_untouched():
+    r, _ = repairer()
+    sparql = "SELECT ?b WHERE { ?b rdfs:label '25동' ; :hasFacility :F_002 }"
+    assert r.repair(sparql) == (sparql, [], None)
+
+
+def test_comment_with_korean_and_quotes():
+    r, g = repairer()
+    sparql = "SELECT ?b WHERE { ?b rdfs:label '25동' } # 25동 찾기\n"
+    fixed, fixes, error = r.repair(sparql)
+    assert error is None and fixes == []
+    assert "찾기" not in fixed
+    sparql = "SELECT ?b WHERE {\n  # buildings with a 'Lift'\n  ?b :hasFacility :F_002 }"
+    fixed, fixes, error = r.repair(sparql)
+    assert error is None and fixes == []
+    assert len(list(g.query(fixed))) == 1
+
+
+def test_alias_predicate():
+    r, g = repairer()
+    fixed, fixes, error = r.repair("SELECT ?b WHERE { ?c :title '수학1' ; :isHeldAt ?r . ?r :locatedIn ?b }")
+    assert error is None
+    assert ":locatedIn -> :isLocatedIn" in fixes
+    assert [str(row.b) for row in g.query(fixed)] == [str(NS.N003)]
+
+
+def test_unquoted_literals():
+    r, g = repairer()
+    fixed, fixes, error = r.repair("SELECT ?c WHERE { ?c :title 수학1 ; :EndTime ?e . FILTER(?e < 10:00) }")
+    assert error is None and "unquoted_literal" in fixes
+    assert len(list(g.query(fixed))) == 1
+    fixed, fixes, error = r.repair("SELECT ?c WHERE { ?c :EndTime ?e . FILTER(?e < '9:00') }")
+    assert "time_padding" in fixes and "'09:00'" in fixed
+
+
+def test_quoted_number_and_smart_quotes():
+    r, _ = repairer()
+    fixed, fixes, _ = r.repair('SELECT ?r WHERE { ?r :distance ?d . FILTER(?d < "300") }')
+    assert "quoted_number" in fixes and "?d < 300" in fixed
+    fixed, fixes, error = r.repair("SELECT ?c WHERE { ?c :title “수학1” }")
+    assert error is None and "smart_quotes" in fixes
+
+
+def test_foreign_prefix_and_names_by_label():
+    r, g = repairer()
+    fixed, fixes, error = r.repair("SELECT ?b WHERE { ?b snu:instanceOf snu:Building ; snu:hasFacilty :Lift }")
+    assert error is None
+    assert {":Building -> :C001", ":hasFacilty -> :hasFacility", ":Lift -> :F_002"} <= set(fixes)
+    assert [str(row.b) for row in g.query(fixed)] == [str(NS.N003)]
+
+
+def test_missing_prefix_declared():
+    r, _ = repairer()
+    r.bound.pop("rdfs")
+    fixed, fixes, error = r.repair("SELECT ?b WHERE { ?b rdfs:label '25동' }")
+    assert error is None and fixed.startswith("PREFIX rdfs:")
+
+
+def test_unrecoverable():
+    r, _ = repairer()
+    assert r.repair("SELECT ?b WHERE { ?b :hasElevator ?x }")[2] == "Unknown terms: :hasElevator"
+    assert r.repair("SELECT ?b WHERE { ?b rdfs:label '25동' . ")[2].startswith("Syntax error")
+
+
+def test_parse_llm_json():
+    assert parse_llm_json('{"sparql": "ASK {}"}') == ({"sparql": "ASK {}"}, [])
+    result, fixes = parse_llm_json('Sure:\n```json\n{"sparql": "SELECT ?s\nWHERE { ?s ?p ?o }"}\n```')
+    assert fixes == ["json_extracted"] and result["sparql"].startswith("SELECT")
+    assert parse_llm_json("Here: SELECT ?s WHERE { ?s ?p ?o }")[0]["sparql"] == "SELECT ?s WHERE { ?s ?p ?o }"
+    assert parse_llm_json("I cannot help") == (None, [])
@@ -0,0 +1,30 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+from rdflib import Graph, Literal, Namespace, RDFS
+from templates import TemplateMatcher
+
+NS = Namespace("http://snu.ac.kr/barrier-free/")
+
+
+def matcher():
+    g = Graph()
+    g.bind("", NS)
+    g.add((NS.N003, NS.instanceOf, NS.C001))
+    g.add((NS.N003, RDFS.label, Literal("25동")))
+    g.add((NS["10101"], NS.title, Literal("수학1")))
+    return TemplateMatcher(g)
+
+
+def test_wheelchair_alone_is_not_a_place_question():
+    m = matcher()
+    assert m.match("수학1 휠체어로 가는 길에 위험한 곳 있어?") is None
+    assert m.match("휠체어 타는데 수학1 들을 수 있어?") is None
+
+
+def test_wheelchair_sets_the_place_slot():
+    m = matcher()
+    assert m.match("수학1 어디서 해?")["slots"] == {"title": "수학1", "wheelchair": False}
+    match = m.match("수학1 어디서 해? 휠체어로 갈 수 있어?")
+    assert match["intent"] == "course_place" and match["slots"]["wheelchair"]
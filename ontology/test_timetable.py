@@ -0,0 +1,107 @@
+import itertools
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+from rdflib import Namespace
+from timetable import Section, TimetableSolver
+
+NS = Namespace("http://snu.ac.kr/barrier-free/")
+MON, TUE, WED, THU = 0, 1, 2, 3
+
+# A and B are 300 m apart, C is unreachable from both
+DISTANCES = {frozenset(["A", "B"]): 300.0}
+
+
+def distance(a, b):
+    return DISTANCES.get(frozenset([str(a), str(b)]), math.inf)
+
+
+def section(uri, title, days, start, end, building):
+    return Section(NS[uri], title, days, start, end, f"{building}-101", building, f"{building}동")
+
+
+def uris(combo):
+    return [str(s.uri).rsplit("/", 1)[-1] for s in combo["sections"]]
+
+
+def test_overlapping_sections_never_combined():
+    sections = {"수학": [section("m1", "수학", [MON, WED], 540, 615, "A"),
+                       section("m2", "수학", [TUE, THU], 540, 615, "A")],
+                "물리": [section("p1", "물리", [MON], 600, 690, "A")]}
+    result = TimetableSolver(sections, distance).solve(["수학", "물리"])
+    assert result["complete"]
+    assert [uris(c) for c in result["combos"]] == [["p1", "m2"]]
+
+
+def test_every_section_conflicting_gives_no_combos():
+    sections = {"수학": [section("m1", "수학", [MON], 540, 615, "A")],
+                "물리": [section("p1", "물리", [MON], 570, 660, "A"),
+                       section("p2", "물리", [MON], 600, 690, "B")]}
+    result = TimetableSolver(sections, distance).solve(["수학", "물리"])
+    assert result["combos"] == [] and result["complete"]
+
+
+def test_unreachable_transfers_pruned():
+    sections = {"수학": [section("m1", "수학", [MON], 540, 600, "A")],
+                # 300 m in 5 minutes is too far at 50 m/min; C is unreachable; 10 minutes to B fits
+                "물리": [section("p1", "물리", [MON], 605, 660, "B"),
+                       section("p2", "물리", [MON], 720, 780, "C"),
+                       section("p3", "물리", [MON], 610, 660, "B")]}
+    result = TimetableSolver(sections, distance).solve(["수학", "물리"])
+    assert [uris(c) for c in result["combos"]] == [["m1", "p3"]]
+    assert result["combos"][0]["transfer_m"] == 300.0 and result["combos"][0]["gap_min"] == 10
+
+
+def test_missing_titles_reported():
+    sections = {"수학": [section("m1", "수학", [MON], 540, 600, "A")]}
+    result = TimetableSolver(sections, distance).solve(["수학", "화학"])
+    assert result == {"combos": [], "missing": ["화학"], "complete": True, "nodes": 0}
+
+
+def test_interchangeable_sections_become_alternatives():
+    sections = {"수학": [section("m1", "수학", [MON], 540, 600, "A"),
+                       section("m2", "수학", [MON], 540, 600, "A")]}
+    combo = TimetableSolver(sections, distance).solve(["수학"])["combos"][0]
+    assert uris(combo) == ["m1"] and [s.uri for s in combo["alternatives"][NS.m1]] == [NS.m2]
+
+
+def brute_force(sections_by_title, titles, speed=50, gap_weight=5.0):
+    scores = []
+    for combo in itertools.product(*(sections_by_title[t] for t in titles)):
+        if any(a.mask & b.mask for a, b in itertools.combinations(combo, 2)):
+            continue
+        dist, gap = 0.0, 0
+        for day in range(5):
+            today = sorted((s for s in combo if day in s.days), key=lambda s: s.start)
+            for a, b in zip(today, today[1:]):
+                d = 0.0 if a.building == b.building else distance(a.building, b.building)
+                if not d <= (b.start - a.end) * speed:
+                    break
+                dist += d
+                gap += b.start - a.end
+            else:
+                continue
+            break
+        else:
+            scores.append(dist + gap_weight * gap)
+    return sorted(scores)
+
+
+def test_matches_brute_force():
+    rng = random.Random(11)
+    titles = ["수학", "물리", "화학", "생물"]
+    for _ in range(30):
+        sections = {}
+        for t in titles:
+            # Distinct start times, so no two sections collapse into alternatives
+            starts = rng.sample(range(540, 900, 15), rng.randint(1, 4))
+            sections[t] = [section(f"{t}{i}", t, sorted(rng.sample(range(5), rng.randint(1, 2))),
+                                   start, start + rng.choice([50, 75]), rng.choice("ABC"))
+                           for i, start in enumerate(starts)]
+        result = TimetableSolver(sections, distance).solve(titles, k=3)
+        expected = brute_force(sections, titles)[:3]
+        assert result["complete"]
+        assert [c["score"] for c in result["combos"]] == expected